@@ -1,26 +1,7 @@
 -- SQL script to create tables for a prototype e-commerce PostgreSQL database
-
--- List existing tables 
--- select table_name from information_schema.tables where table_schema = 'public' and table_type = 'BASE TATBLE'
--- Drop all tables 
--- DROP TABLE IF EXISTS products;
--- DROP TABLE IF EXISTS orders;
--- DROP TABLE IF EXISTS orders;
-
--- Forcefully drop tables if they exist, including dependent objects
--- DROP TABLE IF EXISTS public.products CASCADE;
--- DROP TABLE IF EXISTS public.customers CASCADE;
--- DROP TABLE IF EXISTS public.orders CASCADE;
-
-
--- PostgreSQL script to Truncate all data from tables
--- Truncate Table public.products;
--- Truncate Table public.customers;
--- Truncate Table public.orders;
-
+-- Generated by infra/scripts/data_scripts/schema_registry.py; edit the registry, not this file.
 
 -- Create the products table
---DROP TABLE IF EXISTS products;
 CREATE TABLE IF NOT EXISTS products
 (
     id integer,
@@ -28,11 +9,12 @@ CREATE TABLE IF NOT EXISTS products
     price numeric(10,2) NOT NULL,
     category character varying(50),
     brand character varying(50),
-    product_description text);
+    product_description text,
+    PRIMARY KEY (id)
+);
 
 -- Create the customers table
---DROP TABLE IF EXISTS customers;
-CREATE TABLE customers
+CREATE TABLE IF NOT EXISTS customers
 (
     id integer,
     first_name character varying(50),
@@ -43,12 +25,14 @@ CREATE TABLE customers
     email character varying(100),
     phone character varying(20),
     post_address character varying(255),
-    membership character varying(50)
+    membership character varying(50),
+    PRIMARY KEY (id)
 );
+CREATE INDEX IF NOT EXISTS customers_name_idx ON customers (first_name, last_name) INCLUDE (id);
+CREATE INDEX IF NOT EXISTS customers_email_idx ON customers (email) INCLUDE (id);
 
 -- Create the orders table
---DROP TABLE IF EXISTS orders;
-CREATE TABLE orders
+CREATE TABLE IF NOT EXISTS orders
 (
     id integer,
     customer_id integer,
@@ -60,12 +44,15 @@ CREATE TABLE orders
     customer_phone character varying(20),
     order_date date,
     product_id integer,
-    product_name character varying(100) NOT NULL,
+    product_name character varying(100),
     quantity integer,
     unit_price numeric(10,2),
     total numeric(10,2),
     category character varying(50),
     brand character varying(50),
     product_description text,
-    return_status BOOLEAN DEFAULT FALSE
-);
\ No newline at end of file
+    return_status boolean DEFAULT FALSE,
+    PRIMARY KEY (id)
+);
+CREATE INDEX IF NOT EXISTS orders_customer_name_date_idx ON orders (customer_first_name, customer_last_name, order_date);
+CREATE INDEX IF NOT EXISTS orders_customer_id_date_idx ON orders (customer_id, order_date);
@@ -0,0 +1,87 @@
+-- SQL script to create tables for a prototype e-commerce PostgreSQL database
+-- Generated by infra/scripts/data_scripts/schema_registry.py; edit the registry, not this file.
+
+-- Create the products table
+CREATE TABLE IF NOT EXISTS products
+(
+    id integer,
+    product_name character varying(100),
+    price numeric(10,2) NOT NULL,
+    category character varying(50),
+    brand character varying(50),
+    product_description text,
+    PRIMARY KEY (id)
+);
+
+-- Create the customers table
+CREATE TABLE IF NOT EXISTS customers
+(
+    id integer,
+    first_name character varying(50),
+    last_name character varying(50),
+    gender character varying(10),
+    date_of_birth date,
+    age integer,
+    email character varying(100),
+    phone character varying(20),
+    post_address character varying(255),
+    membership character varying(50),
+    PRIMARY KEY (id)
+);
+CREATE INDEX IF NOT EXISTS customers_name_idx ON customers (first_name, last_name) INCLUDE (id);
+CREATE INDEX IF NOT EXISTS customers_email_idx ON customers (email) INCLUDE (id);
+
+-- Create the order_headers table
+CREATE TABLE IF NOT EXISTS order_headers
+(
+    id integer NOT NULL,
+    customer_id integer NOT NULL,
+    order_date date,
+    PRIMARY KEY (id),
+    FOREIGN KEY (customer_id) REFERENCES customers (id)
+);
+CREATE INDEX IF NOT EXISTS order_headers_customer_date_idx ON order_headers (customer_id, order_date) INCLUDE (id);
+
+-- Create the order_lines table
+CREATE TABLE IF NOT EXISTS order_lines
+(
+    id integer NOT NULL,
+    order_id integer NOT NULL,
+    line_number integer NOT NULL,
+    product_id integer NOT NULL,
+    quantity integer,
+    unit_price numeric(10,2),
+    total numeric(10,2),
+    return_status boolean DEFAULT FALSE,
+    PRIMARY KEY (id),
+    UNIQUE (order_id, line_number),
+    FOREIGN KEY (order_id) REFERENCES order_headers (id),
+    FOREIGN KEY (product_id) REFERENCES products (id)
+);
+CREATE INDEX IF NOT EXISTS order_lines_product_id_idx ON order_lines (product_id);
+
+-- Create the orders view, with the columns of the wide orders table
+CREATE OR REPLACE VIEW orders AS
+SELECT
+    h.id AS id,
+    h.customer_id AS customer_id,
+    c.first_name AS customer_first_name,
+    c.last_name AS customer_last_name,
+    c.gender AS customer_gender,
+    c.age AS customer_age,
+    c.email AS customer_email,
+    c.phone AS customer_phone,
+    h.order_date AS order_date,
+    l.product_id AS product_id,
+    p.product_name AS product_name,
+    l.quantity AS quantity,
+    l.unit_price AS unit_price,
+    l.total AS total,
+    p.category AS category,
+    p.brand AS brand,
+    p.product_description AS product_description,
+    l.return_status AS return_status
+FROM order_headers h
+JOIN order_lines l ON l.order_id = h.id
+JOIN customers c ON c.id = h.customer_id
+JOIN products p ON p.id = l.product_id;
@@ -1,121 +1,101 @@
 import psycopg2
-import random
-from datetime import datetime, timedelta
+from psycopg2 import sql
+import argparse
 import os
 import sys
 import getpass
+import time
+import numpy as np
+import pandas as pd
+
+# The generator and the COPY pipeline live next to the deployment scripts in infra/scripts/data_scripts
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'data_scripts'))
+from batch_pipeline import COPY_FORMATS, copy_batches
+from order_generator import (
+    ORDER_TABLE_COLUMNS, ORDER_TABLES, generate_order_batches, generate_orders_in_database, order_table_batches
+)
 
 # Adjust these with your own DB connection info
 dbhost = "customchatbotdbserver.postgres.database.azure.com"
 dbname = "testdb"
 sslmode = "prefer"
 
-dbuser = input('Enter your PostgreSQL DB username: ')
-password = getpass.getpass(prompt='Enter your PostgreSQL password: ')
+def fetch_dataframe(cursor, query):
+    """Run a query and return its rows as a DataFrame with the query's column names."""
+    cursor.execute(query)
+    return pd.DataFrame(cursor.fetchall(), columns=[column[0] for column in cursor.description])
+
+def next_order_id(cursor, layout):
+    """Return the id after the highest order id, so that generated orders never collide with existing ones."""
+    cursor.execute(sql.SQL("SELECT coalesce(max(id), 0) + 1 FROM {}").format(sql.Identifier(ORDER_TABLES[layout][0])))
+    return cursor.fetchone()[0]
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate random orders from the customers and products tables.")
+    parser.add_argument("--mode", choices=["client", "server"], default="client",
+                        help="'client' generates the orders in Python and copies them in; 'server' generates them "
+                             "inside PostgreSQL with INSERT ... SELECT over generate_series.")
+    parser.add_argument("--orders", type=int, default=300, help="Number of orders to generate.")
+    parser.add_argument("--batch-rows", type=int, default=100000,
+                        help="Orders generated per batch; the client holds one batch at a time.")
+    parser.add_argument("--copy-format", choices=COPY_FORMATS, default="csv",
+                        help="Format of the COPY stream in client mode.")
+    parser.add_argument("--seed", type=int, default=None, help="Seed of the random generator (random by default).")
+    parser.add_argument("--layout", choices=sorted(ORDER_TABLES), default="wide",
+                        help="'wide' inserts into the orders table; 'normalized' into order_headers and order_lines.")
+    args = parser.parse_args()
+
+    dbuser = input('Enter your PostgreSQL DB username: ')
+    password = getpass.getpass(prompt='Enter your PostgreSQL password: ')
 
-conn_string = f"host={dbhost} dbname={dbname} user={dbuser} password={password} sslmode={sslmode}"
+    conn_string = f"host={dbhost} dbname={dbname} user={dbuser} password={password} sslmode={sslmode}"
 
-def get_random_date(start_year=2023, end_year=2024):
-    """Generate a random date between start_year-01-01 and end_year-12-31."""
-    start_date = datetime(start_year, 1, 1)
-    end_date = datetime(end_year, 12, 31)
-    delta = (end_date - start_date).days
-    random_days = random.randint(0, delta)
-    return start_date + timedelta(days=random_days)
+    conn = None
+    try:
+        # Connect to the database
+        conn = psycopg2.connect(conn_string)
+        cursor = conn.cursor()
+        print("Connection established")
 
-try:
-    # Connect to the database
-    conn = psycopg2.connect(conn_string)
-    cursor = conn.cursor()
-    print("Connection established")
+        if args.mode == "server":
+            # No customer, product or order rows leave or enter the database
+            start = time.perf_counter()
+            rows = generate_orders_in_database(cursor, args.orders, args.seed, next_order_id(cursor, args.layout),
+                                               layout=args.layout)
+            conn.commit()
+            print(f"Successfully generated {rows} random orders in the database in {time.perf_counter() - start:.2f} s.")
+            return
 
-    # Get all customers
-    cursor.execute("SELECT id, first_name, last_name, gender, age, email, phone FROM public.customers")
-    customers = cursor.fetchall()  # List of (id, first_name, last_name)
+        # Get all customers
+        customers = fetch_dataframe(cursor, "SELECT id, first_name, last_name, gender, age, email, phone FROM public.customers")
 
-    # Get all products
-    cursor.execute("SELECT id, product_name, price, category, brand, product_description FROM public.products")
-    products = cursor.fetchall()  # List of (id, product_name, price, category, brand, product_description)
+        # Get all products
+        products = fetch_dataframe(cursor, "SELECT id, product_name, price, category, brand, product_description FROM public.products")
 
-    if not customers or not products:
-        print("No data found in customers or products table. Please ensure they have rows.")
-        sys.exit(0)
+        if customers.empty or products.empty:
+            print("No data found in customers or products table. Please ensure they have rows.")
+            sys.exit(0)
 
-    orders_to_generate = 300
-    for i in range(orders_to_generate):
-        random_customer = random.choice(customers)
-        random_product = random.choice(products)
-        
-        return_status = 'false'  # Assuming all orders are successful for this example
-        # Unpack the random customer
-        customer_id, customer_first_name, customer_last_name, customer_gender, customer_age, customer_email, customer_phone = random_customer
-        
-        # Unpack the random product
-        product_id, product_name, price, category, brand, product_description = random_product
-        
-        # Generate random quantity and order date
-        quantity = random.randint(1, 5)
-        order_date = get_random_date(2023, 2024)
-        total = price * quantity
-        
-        return_status = 'false'  # Assuming all orders are successful for this example
+        # Orders are drawn in vectorized batches and streamed into a single COPY per table as the server consumes
+        # them. Each table gets its own pass over the generator, with one seed so that the passes agree.
+        seed = args.seed if args.seed is not None else int(np.random.SeedSequence().entropy % 2 ** 63)
+        first_order_id = next_order_id(cursor, args.layout)
+        start = time.perf_counter()
+        for table_name in ORDER_TABLES[args.layout]:
+            batches = generate_order_batches(customers, products, args.orders, args.batch_rows, seed, first_order_id)
+            copy_batches(cursor, table_name, order_table_batches(batches, table_name), ORDER_TABLE_COLUMNS[table_name],
+                         args.copy_format)
+        conn.commit()
+        print(f"Successfully inserted {args.orders} random orders in {time.perf_counter() - start:.2f} s.")
+    except (Exception, psycopg2.DatabaseError) as error:
+        print(f"Error: {error}")
+        if conn:
+            conn.rollback()
+    finally:
+        if conn:
+            cursor.close()
+            conn.close()
+            print("Connection closed")
 
-        order_id = i + 1  # Order ID can be the loop index + 1
-        # Insert into orders table
-        cursor.execute(
-            """
-            INSERT INTO public.orders
-            ( 
-                id,
-                customer_id,
-                customer_first_name,
-                customer_last_name,
-                customer_gender,
-                customer_age,
-                customer_email,
-                customer_phone,
-                order_date,
-                product_id,
-                product_name,
-                quantity,
-                unit_price,
-                total,
-                category,
-                brand,
-                product_description,
-                return_status
-            )
-            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-            """,
-            (
-                order_id,
-                customer_id,
-                customer_first_name,
-                customer_last_name,
-                customer_gender,
-                customer_age,
-                customer_email,
-                customer_phone,
-                order_date,
-                product_id,
-                product_name,
-                quantity,
-                price,
-                total,
-                category,
-                brand,
-                product_description,
-                return_status
-            )
-        )
-    conn.commit()
-    print(f"Successfully inserted {orders_to_generate} random orders.")
-except (Exception, psycopg2.DatabaseError) as error:
-    print(f"Error: {error}")
-    if conn:
-        conn.rollback()
-finally:
-    if conn:
-        cursor.close()
-        conn.close()
-        print("Connection closed")
\ No newline at end of file
+if __name__ == "__main__":
+    main()
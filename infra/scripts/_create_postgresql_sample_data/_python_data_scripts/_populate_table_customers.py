@@ -1,9 +1,24 @@
 import psycopg2
-import pandas as pd
 import urllib.parse
 import os
 import sys
 import getpass
+import argparse
+
+# Shared bulk-load helpers live next to the deployment scripts in infra/scripts/data_scripts
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'data_scripts'))
+from bulk_load import DEFAULT_CHUNK_ROWS, load_table_from_csv
+from load_metrics import MetricsRecorder
+
+# Parse command-line arguments
+parser = argparse.ArgumentParser(description="Populate the customers table from the sample CSV file.")
+parser.add_argument("--chunk-rows", type=int, default=DEFAULT_CHUNK_ROWS,
+                    help="Number of CSV rows read and inserted per batch; bounds peak memory.")
+parser.add_argument("--metrics-file",
+                    help="Append a JSON-lines metrics record per load phase (connect, load, parse, transfer, "
+                         "commit) to this file; '-' writes them to stdout.")
+args = parser.parse_args()
+metrics = MetricsRecorder(args.metrics_file)
 
 # Read URI parameters from the environment
 dbhost = "customchatbotdbserver.postgres.database.azure.com"
@@ -18,7 +33,8 @@ password = getpass.getpass(prompt='Enter your PostgreSQL password: ')
 conn_string = f"host={dbhost} dbname={dbname} user={dbuser} password={password} sslmode={sslmode}"
 
 # Connect to the PostgreSQL server
-conn = psycopg2.connect(conn_string)
+with metrics.phase("connect"):
+    conn = psycopg2.connect(conn_string)
 print("Connection established")
 cursor = conn.cursor()
 
@@ -40,19 +56,16 @@ if not os.path.exists(csv_file_path):
     print(f"CSV file does not exist: {csv_file_path}")
     sys.exit(1)
 
-# Read the CSV file into a DataFrame
-df = pd.read_csv(csv_file_path)
-
-# Insert data into the product table
-for index, row in df.iterrows():
-    cursor.execute(
-        "INSERT INTO customers (id, first_name, last_name, gender, date_of_birth, age, email, phone, post_address, membership) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)",
-        (row['id'], row['first_name'], row['last_name'], row['gender'], row['date_of_birth'], row['age'], row['email'], row['phone'], row['post_address'], row['membership'])
-    )
-
-print("Inserted rows from sample data file into the customers table")
+# Insert data into the customers table with set-based inserts, reading the CSV file one chunk of rows at a time
+with metrics.phase("load", 'customers') as counts:
+    result = load_table_from_csv(cursor, 'customers', csv_file_path, chunk_rows=args.chunk_rows)
+    counts["rows"] = result.rows
+    metrics.record_load(result)
+print(f"Inserted {result}")
 
 # Clean up
-conn.commit()
+with metrics.phase("commit"):
+    conn.commit()
 cursor.close()
-conn.close()
\ No newline at end of file
+conn.close()
+metrics.close()
\ No newline at end of file
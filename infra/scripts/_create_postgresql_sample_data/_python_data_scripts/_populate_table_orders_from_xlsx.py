@@ -4,6 +4,21 @@ import urllib.parse
 import os
 import sys
 import getpass
+import argparse
+
+# Shared bulk-load helpers live next to the deployment scripts in infra/scripts/data_scripts
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'data_scripts'))
+from bulk_load import load_dataframe
+from load_metrics import MetricsRecorder
+from excel_cache import read_excel_cached
+
+# Parse command-line arguments
+parser = argparse.ArgumentParser(description="Populate the orders table from the sample Excel file.")
+parser.add_argument("--metrics-file",
+                    help="Append a JSON-lines metrics record per load phase (connect, read, load, transfer, "
+                         "commit) to this file; '-' writes them to stdout.")
+args = parser.parse_args()
+metrics = MetricsRecorder(args.metrics_file)
 
 # Read URI parameters from the environment
 dbhost = "customchatbotdbserver.postgres.database.azure.com"
@@ -18,7 +33,8 @@ password = getpass.getpass(prompt='Enter your PostgreSQL password: ')
 conn_string = f"host={dbhost} dbname={dbname} user={dbuser} password={password} sslmode={sslmode}"
 
 # Connect to the PostgreSQL server
-conn = psycopg2.connect(conn_string)
+with metrics.phase("connect"):
+    conn = psycopg2.connect(conn_string)
 print("Connection established")
 cursor = conn.cursor()
 
@@ -39,35 +55,24 @@ if not os.path.exists(xlsx_file_path):
     print(f"Excel file does not exist: {xlsx_file_path}")
     sys.exit(1)
 
-# Read the Excel file into a DataFrame, specifying the sheet name
-df = pd.read_excel(xlsx_file_path, sheet_name='orders')
+# Read the Excel file into a DataFrame, specifying the sheet name (cached as Parquet after the first read)
+with metrics.phase("read", 'orders') as counts:
+    df = read_excel_cached(xlsx_file_path, sheet_name='orders')
+    counts["rows"] = len(df)
 
 # Strip whitespace from column names
 df.columns = df.columns.str.strip()
-# Insert data into the orders table
-for index, row in df.iterrows():
-    cursor.execute(
-        "INSERT INTO public.orders (id, customer_id, product_id, quantity, total, order_date, customer_first_name, customer_last_name, unit_price, category, brand, product_description, return_status) "
-        "VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)",
-        (
-            row['id'],
-            row['customer_id'],
-            row['product_id'],
-            row['quantity'],
-            row['total'],
-            row['order_date'],
-            row['customer_first_name'],
-            row['customer_last_name'],
-            row['unit_price'],
-            row['category'],
-            row['brand'],
-            row['product_description'],
-            row['return_status']
-        )
-    )
-print("Inserted rows from sample data file into the orders table")
+
+# Insert data into the orders table with set-based inserts
+with metrics.phase("load", 'orders') as counts:
+    result = load_dataframe(cursor, 'orders', df)
+    counts["rows"] = result.rows
+    metrics.record_load(result)
+print(f"Inserted {result}")
 
 # Commit the transaction and close connections
-conn.commit()
+with metrics.phase("commit"):
+    conn.commit()
 cursor.close()
-conn.close()
\ No newline at end of file
+conn.close()
+metrics.close()
\ No newline at end of file
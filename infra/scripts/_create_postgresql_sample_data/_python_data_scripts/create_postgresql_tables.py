@@ -1,19 +1,18 @@
 import os
+import sys
 import psycopg2
 from psycopg2 import sql
 
+# The table definitions live in the schema registry next to the deployment scripts in infra/scripts/data_scripts
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'data_scripts'))
+from schema_registry import SAMPLE_TABLES, create_indexes_sql, create_table_sql
+
 # Get environment variables
 db_host = os.getenv('DB_HOST')
 db_port = os.getenv('DB_PORT', '5432')
 db_name = os.getenv('DB_NAME')
 db_user = os.getenv('DB_USER')
 db_password = os.getenv('DB_PASSWORD')
-sql_file_path = '../postgresql_db_scripts/db_create_tables.sql'  # Updated path
-
-def execute_sql_file(cursor, sql_file):
-    with open(sql_file, 'r') as file:
-        sql_commands = file.read()
-        cursor.execute(sql_commands)
 
 def main():
     try:
@@ -27,8 +26,11 @@ def main():
         )
         cursor = connection.cursor()
         
-        # Execute the SQL file
-        execute_sql_file(cursor, sql_file_path)
+        # Create the tables and their indexes from the schema registry (same DDL as _postgresql_db_scripts/db_create_tables.sql)
+        for table_name in SAMPLE_TABLES:
+            cursor.execute(create_table_sql(table_name, schema_name=None))
+            for statement in create_indexes_sql(table_name, schema_name=None):
+                cursor.execute(statement)
         
         # Commit the changes
         connection.commit()
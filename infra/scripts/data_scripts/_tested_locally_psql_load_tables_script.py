@@ -1,10 +1,9 @@
 from azure.identity import DefaultAzureCredential
 import psycopg2
-import psycopg2.extras
-from psycopg2 import sql
 import os
-import pandas as pd
 import logging
+import argparse
+from bulk_load import DEFAULT_CHUNK_ROWS, load_table_from_csv, truncate_tables
 
 # Configuration parameters
 key_vault_name = "key_vault_name_place_holder"
@@ -21,29 +20,12 @@ basrUrl = "https://raw.githubusercontent.com/gailzmicrosoft/TestCode/main/" # us
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
-def truncate_tables(cursor, tables):
-    """
-    Truncate the specified tables.
-    """
-    for table in tables:
-        cursor.execute(sql.SQL("TRUNCATE TABLE {}").format(sql.Identifier(table)))
-    logger.info("Tables truncated: %s", ", ".join(tables))
-
-def load_table_from_csv(cursor, table_name, csv_file_path, columns):
-    """
-    Loads data from a CSV file into a specified PostgreSQL table.
-    """
-    df = pd.read_csv(csv_file_path)
-    df.columns = df.columns.str.strip()
-    rows = [tuple(row[col] for col in columns) for index, row in df.iterrows()]
-    insert_query = sql.SQL("INSERT INTO {} ({}) VALUES %s").format(
-        sql.Identifier(table_name),
-        sql.SQL(', ').join(map(sql.Identifier, columns))
-    )
-    psycopg2.extras.execute_values(cursor, insert_query, rows)
-    logger.info("Data loaded into %s table.", table_name)
-
 def main():
+    parser = argparse.ArgumentParser(description="Load the sample CSV files into PostgreSQL (local test copy).")
+    parser.add_argument("--chunk-rows", type=int, default=DEFAULT_CHUNK_ROWS,
+                        help="Number of CSV rows read and sent to the database per batch; bounds peak memory.")
+    args = parser.parse_args()
+
     try:
         # Acquire the access token
         logger.info("Acquiring access token...")
@@ -76,7 +58,8 @@ def main():
         # Load data into the products table
             csv_file_path_products = os.path.join(basrUrl, 'infra/data/postgresql_db_sample_data/products.csv')
             load_table_from_csv(cursor, 'products', csv_file_path_products, 
-                ['id', 'product_name', 'price', 'category', 'brand', 'product_description'])
+                ['id', 'product_name', 'price', 'category', 'brand', 'product_description'],
+                chunk_rows=args.chunk_rows)
             conn.commit()
         except Exception as e:
             logger.error("An error occurred while loading products table: %s", e)
@@ -86,7 +69,8 @@ def main():
         # Load data into the customers table
             csv_file_path_customers = os.path.join(basrUrl, 'infra/data/postgresql_db_sample_data/customers.csv')
             load_table_from_csv(cursor, 'customers', csv_file_path_customers, 
-                ['id', 'first_name', 'last_name', 'gender', 'date_of_birth', 'age', 'email', 'phone', 'post_address', 'membership'])
+                ['id', 'first_name', 'last_name', 'gender', 'date_of_birth', 'age', 'email', 'phone', 'post_address', 'membership'],
+                chunk_rows=args.chunk_rows)
             conn.commit()
         except Exception as e:
             logger.error("An error occurred while loading customers table: %s", e)
@@ -96,7 +80,8 @@ def main():
         # Load data into the orders table
             csv_file_path_orders = os.path.join(basrUrl, 'infra/data/postgresql_db_sample_data/orders.csv')
             load_table_from_csv(cursor, 'orders', csv_file_path_orders, 
-                ['id', 'customer_id', 'product_id', 'quantity', 'total', 'order_date', 'customer_first_name', 'customer_last_name', 'unit_price', 'category', 'brand', 'product_description', 'return_status'])
+                ['id', 'customer_id', 'product_id', 'quantity', 'total', 'order_date', 'customer_first_name', 'customer_last_name', 'unit_price', 'category', 'brand', 'product_description', 'return_status'],
+                chunk_rows=args.chunk_rows)
             conn.commit()
         except Exception as e:
             logger.error("An error occurred while loading orders table: %s", e)
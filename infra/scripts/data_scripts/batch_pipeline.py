@@ -0,0 +1,203 @@
+"""
+Streaming sinks for generated row batches.
+
+Generators such as order_generator.generate_order_batches yield bounded DataFrame batches.
+The sinks here consume them one at a time, so memory stays at one batch however many rows
+are generated:
+
+- copy_batches streams all batches into a table through a single COPY FROM STDIN, encoding
+  the next batch only when the server asks for more data. 'csv' formats the batches with the
+  Arrow CSV writer (C++, no per-value Python objects) when pyarrow is installed; 'binary'
+  uses the PGCOPY encoder of binary_copy.py.
+- write_csv_batches and write_parquet_batches write the batches to a file (CSV compressed as
+  its extension says; Parquet one row group per batch).
+"""
+import io
+import logging
+import time
+
+import pandas as pd
+from psycopg2 import sql
+
+from binary_copy import COPY_HEADER, COPY_TRAILER, encode_rows, table_encoders, type_modifiers
+from bulk_load import LoadResult, registered_table
+from compressed_io import open_output
+from schema_registry import TABLE_SCHEMAS, base_type, pa, pandas_dtype
+
+if pa is not None:
+    import pyarrow.csv
+    import pyarrow.parquet
+
+logger = logging.getLogger(__name__)
+
+# Bytes psycopg2 asks the COPY stream for per read
+COPY_READ_SIZE = 1024 * 1024
+
+# Sink formats of copy_batches
+COPY_FORMATS = ['csv', 'binary']
+
+def arrow_table(df, table_name, columns):
+    """
+    Converts a batch to an Arrow table with the given columns. Date columns of the table
+    (which pandas holds as timestamps) are cast to dates, and decimal columns (inferred with
+    the precision of the batch's values) to the precision and scale of the table's numeric type,
+    so that every batch has the same schema.
+    """
+    table = pa.Table.from_pandas(df[columns], preserve_index=False).replace_schema_metadata(None)
+    schema = TABLE_SCHEMAS.get(registered_table(table_name) or "")
+    if schema:
+        for position, column in enumerate(columns):
+            sql_type = schema.column(column).sql_type
+            field_type = table.schema.field(position).type
+            if base_type(sql_type) == 'date' and pa.types.is_timestamp(field_type):
+                table = table.set_column(position, column, table[column].cast(pa.date32()))
+            elif base_type(sql_type) == 'numeric' and pa.types.is_decimal(field_type) and len(type_modifiers(sql_type)) == 2:
+                table = table.set_column(position, column, table[column].cast(pa.decimal128(*type_modifiers(sql_type))))
+    return table
+
+def csv_fields(values):
+    """
+    Formats a column as CSV fields: NULLs are empty, and empty strings and values with commas,
+    quotes or line breaks are quoted.
+    """
+    values = values.astype(pd.StringDtype("python"))
+    quoted = '"' + values.str.replace('"', '""', regex=False) + '"'
+    needs_quotes = values.str.contains(r'[",\r\n]').fillna(False) | (values == "").fillna(False)
+    return quoted.where(needs_quotes, values).fillna("")
+
+def pandas_csv_bytes(df, table_name, columns, header=False):
+    """
+    Formats a batch as CSV bytes without pyarrow, with the NULL and empty string rules of
+    csv_bytes. Integer columns of the table are written without a fraction (a batch holds them
+    as floats when they have NULLs) and date columns as ISO dates.
+    """
+    schema = TABLE_SCHEMAS.get(registered_table(table_name) or "")
+    fields = []
+    for column in columns:
+        values = df[column].reset_index(drop=True)
+        if schema and pandas_dtype(schema.column(column)) == 'Int64':
+            values = values.astype('Int64')
+        elif schema and base_type(schema.column(column).sql_type) == 'date' and pd.api.types.is_datetime64_any_dtype(values):
+            values = values.dt.strftime('%Y-%m-%d')
+        fields.append(csv_fields(values))
+    lines = fields[0].str.cat(fields[1:], sep=",").tolist() if fields else []
+    if header:
+        lines.insert(0, ",".join(csv_fields(pd.Series(columns))))
+    return "".join(line + "\n" for line in lines).encode("utf-8")
+
+def csv_bytes(df, table_name, columns, header=False):
+    """
+    Formats a batch as CSV bytes that COPY ... (FORMAT csv) reads back unchanged: NULLs are
+    unquoted empty fields and empty strings are quoted.
+    """
+    if pa is None:
+        return pandas_csv_bytes(df, table_name, columns, header)
+    buffer = pa.BufferOutputStream()
+    pa.csv.write_csv(arrow_table(df, table_name, columns), buffer,
+                     pa.csv.WriteOptions(include_header=header))
+    return buffer.getvalue().to_pybytes()
+
+class BatchCopyStream(io.RawIOBase):
+    """
+    Readable byte stream over encoded batches, for cursor.copy_expert(). Batches are pulled
+    from the generator and encoded only when the reader needs more data. Counts the rows and
+    bytes produced and the time spent generating and encoding them.
+    """
+    def __init__(self, batches, encode, header=b"", trailer=b""):
+        super().__init__()
+        self._batches = iter(batches)
+        self._encode = encode
+        self._pending = memoryview(header)
+        self._trailer = trailer
+        self.rows = 0
+        self.bytes = 0
+        self.parse_seconds = 0.0
+
+    def readable(self):
+        return True
+
+    def _fill(self):
+        start = time.perf_counter()
+        while not self._pending and self._batches is not None:
+            df = next(self._batches, None)
+            if df is None:
+                self._batches = None
+                self._pending = memoryview(self._trailer)
+            else:
+                self.rows += len(df)
+                self._pending = memoryview(self._encode(df))
+            self.bytes += len(self._pending)
+        self.parse_seconds += time.perf_counter() - start
+
+    def readinto(self, buffer):
+        if not self._pending:
+            self._fill()
+        size = min(len(buffer), len(self._pending))
+        buffer[:size] = self._pending[:size]
+        self._pending = self._pending[size:]
+        return size
+
+def copy_batches(cursor, table_name, batches, columns, copy_format='csv'):
+    """
+    Streams generated batches into a table with one COPY FROM STDIN. Returns a LoadResult whose
+    parse time is the time spent generating and encoding the batches.
+    """
+    if copy_format == 'binary':
+        encoders = table_encoders(table_name, columns)
+        stream = BatchCopyStream(batches, lambda df: encode_rows(df, columns, encoders), COPY_HEADER, COPY_TRAILER)
+    else:
+        stream = BatchCopyStream(batches, lambda df: csv_bytes(df, table_name, columns))
+    copy_query = sql.SQL("COPY {} ({}) FROM STDIN WITH (FORMAT {})").format(
+        sql.Identifier(table_name),
+        sql.SQL(', ').join(map(sql.Identifier, columns)),
+        sql.SQL(copy_format)
+    )
+    start = time.perf_counter()
+    cursor.copy_expert(copy_query, stream, size=COPY_READ_SIZE)
+    result = LoadResult(table_name, stream.rows, time.perf_counter() - start, stream.parse_seconds, stream.bytes)
+    logger.info("Data generated and copied: %s.", result)
+    return result
+
+def write_csv_batches(batches, output_path, table_name, columns, header=True, compression=None):
+    """
+    Writes batches to a CSV file, with a header row unless header is false, compressed as
+    compression or the extension of output_path says. Returns the number of rows written.
+    """
+    rows = 0
+    with open_output(output_path, compression, binary=True) as f:
+        for df in batches:
+            f.write(csv_bytes(df, table_name, columns, header=header))
+            header = False
+            rows += len(df)
+        if header:
+            f.write(csv_bytes(pd.DataFrame(columns=columns), table_name, columns, header=True))
+    return rows
+
+def write_parquet_batches(batches, output_path, table_name, columns):
+    """
+    Writes batches to a Parquet file, one row group per batch. Requires pyarrow.
+    Returns the number of rows written.
+    """
+    if pa is None:
+        raise RuntimeError("pyarrow is required to write Parquet files: pip install pyarrow")
+    rows = 0
+    writer = None
+    try:
+        for df in batches:
+            table = arrow_table(df, table_name, columns)
+            if writer is None:
+                writer = pa.parquet.ParquetWriter(output_path, table.schema)
+            writer.write_table(table)
+            rows += len(df)
+    finally:
+        if writer is not None:
+            writer.close()
+    return rows
+
+def write_batches(batches, output_path, table_name, columns):
+    """
+    Writes batches to a Parquet file when output_path ends in .parquet, otherwise to a CSV file.
+    """
+    if output_path.endswith(".parquet"):
+        return write_parquet_batches(batches, output_path, table_name, columns)
+    return write_csv_batches(batches, output_path, table_name, columns)
@@ -0,0 +1,264 @@
+"""
+Binary COPY loader for the sample PostgreSQL tables.
+
+With COPY ... (FORMAT csv) the client formats every integer, numeric, date and boolean as
+text and the server parses it back. Here typed DataFrame columns (as read by
+bulk_load.iter_csv_chunks) are encoded straight into the PGCOPY binary format instead: the
+fixed-width types with NumPy record arrays, one column at a time, and text per value.
+
+Supported column types: smallint, integer, bigint, real, double precision, numeric(p,s),
+date, boolean, text / character varying / character, and pgvector's vector(n).
+"""
+import decimal
+import io
+import itertools
+import json
+import logging
+import re
+import struct
+import time
+
+import numpy as np
+import pandas as pd
+from psycopg2 import sql
+
+from bulk_load import DEFAULT_CHUNK_ROWS, TABLE_COLUMNS, LoadResult, iter_csv_chunks, registered_table
+from schema_registry import TABLE_SCHEMAS, base_type
+
+logger = logging.getLogger(__name__)
+
+# Header of a PGCOPY stream: signature, flags and header extension length
+COPY_HEADER = b"PGCOPY\n\xff\r\n\x00" + struct.pack(">ii", 0, 0)
+
+# Field count -1 marks the end of a PGCOPY stream
+COPY_TRAILER = struct.pack(">h", -1)
+
+# Field length -1 is a NULL
+NULL_FIELD = struct.pack(">i", -1)
+
+# Dates are sent as days since the PostgreSQL epoch
+POSTGRES_EPOCH = np.datetime64("2000-01-01", "D")
+
+# Sign values of the binary numeric format
+NUMERIC_POS = 0x0000
+NUMERIC_NEG = 0x4000
+NUMERIC_NAN = 0xC000
+
+# Largest numeric precision encoded from int64 scaled values; wider numerics are encoded per value
+MAX_VECTORIZED_PRECISION = 18
+
+# NumPy type of each fixed-width SQL type, in network byte order
+FIXED_WIDTH_TYPES = {
+    'smallint': '>i2',
+    'integer': '>i4',
+    'bigint': '>i8',
+    'real': '>f4',
+    'double precision': '>f8',
+}
+
+def type_modifiers(sql_type):
+    """
+    Returns the modifiers of a SQL type as integers, e.g. [10, 2] for 'numeric(10,2)'.
+    """
+    match = re.search(r"\(([\d,\s]+)\)", sql_type)
+    return [int(value) for value in match.group(1).split(",")] if match else []
+
+def null_mask(series):
+    return series.isna().to_numpy()
+
+def fixed_width_fields(values, nulls, dtype):
+    """
+    Encodes a NumPy array as length-prefixed binary fields of a fixed-width type.
+    """
+    records = np.empty(len(values), dtype=[('length', '>i4'), ('value', dtype)])
+    records['length'] = records.dtype['value'].itemsize
+    records['value'] = values
+    return split_records(records, nulls)
+
+def split_records(records, nulls):
+    """
+    Splits a record array into one bytes object per record, with NULL_FIELD for the null rows.
+    """
+    buffer = records.tobytes()
+    width = records.dtype.itemsize
+    fields = [buffer[offset:offset + width] for offset in range(0, len(buffer), width)]
+    for row in np.flatnonzero(nulls):
+        fields[row] = NULL_FIELD
+    return fields
+
+def number_fields(series, dtype):
+    nulls = null_mask(series)
+    values = series.to_numpy(dtype='float64' if np.dtype(dtype).kind == 'f' else 'int64', na_value=0)
+    return fixed_width_fields(values, nulls, dtype)
+
+def boolean_fields(series):
+    nulls = null_mask(series)
+    return fixed_width_fields(series.to_numpy(dtype='bool', na_value=False), nulls, '?')
+
+def date_fields(series):
+    nulls = null_mask(series)
+    days = pd.to_datetime(series).to_numpy(dtype='datetime64[D]') - POSTGRES_EPOCH
+    return fixed_width_fields(np.where(nulls, 0, days.astype('int64')), nulls, '>i4')
+
+def scaled_integers(series, scale):
+    """
+    Returns numeric values as int64 multiples of 10**-scale. decimal.Decimal values (as read by
+    bulk_load.iter_csv_chunks) are scaled exactly and rounded half away from zero, as the server
+    rounds; floats (as in generated batches, which round their totals) in floating point.
+    """
+    if series.dtype.kind == 'f':
+        return np.rint(series.to_numpy(dtype='float64', na_value=0.0) * 10 ** scale).astype('int64')
+    quantum = decimal.Decimal(1).scaleb(-scale)
+    return np.array([0 if is_null else int(decimal.Decimal(value).quantize(quantum, decimal.ROUND_HALF_UP).scaleb(scale))
+                     for value, is_null in zip(series.tolist(), null_mask(series))], dtype='int64')
+
+def numeric_fields(series, precision, scale):
+    """
+    Encodes numeric(precision, scale) values. Every value is written with the same number of
+    base-10000 digits (leading and trailing zero digits are stripped by the server), so the
+    whole column is one record array.
+    """
+    nulls = null_mask(series)
+    values = scaled_integers(series, scale)
+    scaled = np.abs(values)
+    if scaled.size and scaled.max() >= 10 ** precision:
+        raise ValueError("numeric(%d,%d) field overflow: %s" % (precision, scale, series.iloc[scaled.argmax()]))
+    integer_digits = max(1, -(-(precision - scale) // 4))
+    fraction_digits = -(-scale // 4)
+    records = np.empty(len(values), dtype=[
+        ('length', '>i4'), ('ndigits', '>i2'), ('weight', '>i2'), ('sign', '>u2'), ('dscale', '>i2'),
+        ('digits', '>i2', (integer_digits + fraction_digits,))
+    ])
+    records['length'] = 8 + 2 * (integer_digits + fraction_digits)
+    records['ndigits'] = integer_digits + fraction_digits
+    records['weight'] = integer_digits - 1
+    records['sign'] = np.where(values < 0, NUMERIC_NEG, NUMERIC_POS)
+    records['dscale'] = scale
+    integer_part, fraction = np.divmod(scaled, 10 ** scale)
+    fraction = fraction * 10 ** (4 * fraction_digits - scale)
+    for digit in range(integer_digits - 1, -1, -1):
+        integer_part, records['digits'][:, digit] = np.divmod(integer_part, 10000)
+    for digit in range(fraction_digits - 1, -1, -1):
+        fraction, records['digits'][:, integer_digits + digit] = np.divmod(fraction, 10000)
+    return split_records(records, nulls)
+
+def encode_numeric(value):
+    """
+    Encodes one decimal.Decimal as a binary numeric field.
+    """
+    if value.is_nan():
+        body = struct.pack(">hhHh", 0, 0, NUMERIC_NAN, 0)
+        return struct.pack(">i", len(body)) + body
+    integer_part, _, fraction = format(abs(value), "f").partition(".")
+    integer_part = integer_part.zfill(-(-len(integer_part) // 4) * 4)
+    padded_fraction = fraction.ljust(-(-len(fraction) // 4) * 4, "0")
+    digits = [int(integer_part[i:i + 4]) for i in range(0, len(integer_part), 4)]
+    weight = len(digits) - 1
+    digits += [int(padded_fraction[i:i + 4]) for i in range(0, len(padded_fraction), 4)]
+    body = struct.pack(">hhHh", len(digits), weight, NUMERIC_NEG if value.is_signed() else NUMERIC_POS, len(fraction))
+    body += struct.pack(">%dh" % len(digits), *digits)
+    return struct.pack(">i", len(body)) + body
+
+def decimal_fields(series):
+    return [NULL_FIELD if is_null else encode_numeric(decimal.Decimal(str(value)))
+            for value, is_null in zip(series.tolist(), null_mask(series))]
+
+def text_fields(series):
+    fields = []
+    for value, is_null in zip(series.tolist(), null_mask(series)):
+        if is_null:
+            fields.append(NULL_FIELD)
+        else:
+            data = str(value).encode("utf-8")
+            fields.append(struct.pack(">i", len(data)) + data)
+    return fields
+
+def vector_fields(series, dimensions=None):
+    """
+    Encodes pgvector values, given as sequences of floats or as '[1,2,3]' text, in the
+    binary format of vector_recv: dimensions, an unused int16, then float4 values.
+    """
+    fields = []
+    for value, is_null in zip(series.tolist(), null_mask(series)):
+        if is_null:
+            fields.append(NULL_FIELD)
+            continue
+        vector = np.asarray(json.loads(value) if isinstance(value, str) else value, dtype='>f4')
+        if dimensions and len(vector) != dimensions:
+            raise ValueError("Expected %d dimensions, not %d" % (dimensions, len(vector)))
+        data = struct.pack(">hh", len(vector), 0) + vector.tobytes()
+        fields.append(struct.pack(">i", len(data)) + data)
+    return fields
+
+def column_encoder(sql_type):
+    """
+    Returns a function encoding a pandas Series of the given SQL type as a list of binary fields.
+    """
+    name = base_type(sql_type).split(".")[-1]
+    if name in FIXED_WIDTH_TYPES:
+        return lambda series: number_fields(series, FIXED_WIDTH_TYPES[name])
+    if name == 'boolean':
+        return boolean_fields
+    if name == 'date':
+        return date_fields
+    if name == 'numeric':
+        modifiers = type_modifiers(sql_type)
+        if len(modifiers) == 2 and modifiers[0] <= MAX_VECTORIZED_PRECISION:
+            return lambda series: numeric_fields(series, *modifiers)
+        return decimal_fields
+    if name in ('text', 'character varying', 'varchar', 'character', 'char'):
+        return text_fields
+    if name == 'vector':
+        modifiers = type_modifiers(sql_type)
+        return lambda series: vector_fields(series, modifiers[0] if modifiers else None)
+    raise ValueError("Binary COPY does not support column type %s" % sql_type)
+
+def encode_rows(df, columns, encoders):
+    """
+    Encodes the rows of a DataFrame as the tuples of a PGCOPY stream (without header and trailer).
+    """
+    field_count = struct.pack(">h", len(columns))
+    fields = [encode(df[column]) for column, encode in zip(columns, encoders)]
+    return b"".join(itertools.chain.from_iterable(zip(itertools.repeat(field_count, len(df)), *fields)))
+
+def table_encoders(table_name, columns):
+    schema = TABLE_SCHEMAS[registered_table(table_name)]
+    return [column_encoder(schema.column(column).sql_type) for column in columns]
+
+def copy_dataframe_binary(cursor, table_name, df, columns, encoders=None):
+    """
+    Sends a DataFrame to a table with one binary COPY. Returns (rows, bytes, encode seconds).
+    """
+    encoders = encoders or table_encoders(table_name, columns)
+    start = time.perf_counter()
+    data = COPY_HEADER + encode_rows(df, columns, encoders) + COPY_TRAILER
+    encode_seconds = time.perf_counter() - start
+    copy_query = sql.SQL("COPY {} ({}) FROM STDIN WITH (FORMAT binary)").format(
+        sql.Identifier(table_name),
+        sql.SQL(', ').join(map(sql.Identifier, columns))
+    )
+    cursor.copy_expert(copy_query, io.BytesIO(data))
+    return len(df), len(data), encode_seconds
+
+def copy_table_binary_from_csv(cursor, table_name, csv_file_path, columns=None, chunk_rows=DEFAULT_CHUNK_ROWS):
+    """
+    Loads a CSV file into a registered table with binary COPY, one COPY per chunk of
+    chunk_rows rows read with the registered column types. Returns a LoadResult; parsing
+    includes the binary encoding.
+    """
+    columns = columns or TABLE_COLUMNS[table_name]
+    encoders = table_encoders(table_name, columns)
+    start = time.perf_counter()
+    total_rows = 0
+    total_bytes = 0
+    transfer_seconds = 0.0
+    for df in iter_csv_chunks(csv_file_path, chunk_rows, table_name, columns):
+        transfer_start = time.perf_counter()
+        rows, size, encode_seconds = copy_dataframe_binary(cursor, table_name, df, columns, encoders)
+        transfer_seconds += time.perf_counter() - transfer_start - encode_seconds
+        total_rows += rows
+        total_bytes += size
+    seconds = time.perf_counter() - start
+    result = LoadResult(table_name, total_rows, seconds, seconds - transfer_seconds, total_bytes)
+    logger.info("Data copied in binary: %s.", result)
+    return result
@@ -0,0 +1,852 @@
+"""
+Shared bulk-load engine for the sample PostgreSQL tables: column mapping per table,
+bounded-memory CSV chunking, and set-based INSERT / COPY loaders.
+Used by psql_load_tables_script.py and the populate_* scripts. Column types and source
+date formats come from schema_registry.py.
+"""
+import csv
+import decimal
+import hashlib
+import io
+import itertools
+import logging
+import os
+import time
+from collections import deque, namedtuple
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import pandas as pd
+import psycopg2
+import psycopg2.extras
+import psycopg2.pool
+from psycopg2 import sql
+
+from compressed_io import compression_of, decompressing_reader
+from http_source import fetch_url, is_url, open_url, read_metadata
+from schema_registry import (
+    TABLE_SCHEMAS, arrow_column_types, date_columns, numeric_columns, pa, pandas_dtypes, value_converters
+)
+
+if pa is not None:
+    import pyarrow.compute
+    import pyarrow.csv
+
+logger = logging.getLogger(__name__)
+
+# Default number of CSV rows read and sent to the database per batch.
+# Peak memory of a load is proportional to this value, not to the file size.
+DEFAULT_CHUNK_ROWS = 10000
+
+# Columns loaded into each table, in insert order. Source files are mapped to these by header name.
+TABLE_COLUMNS = {
+    table_name: list(schema.load_columns) for table_name, schema in TABLE_SCHEMAS.items() if schema.load_columns
+}
+
+# Control table that stores a content hash per loaded row, used by incremental (upsert) loads.
+ROW_HASH_TABLE = 'load_row_hashes'
+
+# Control table that records how many rows of each table a checkpointed load has committed.
+CHECKPOINT_TABLE = 'load_checkpoints'
+
+class LoadResult(namedtuple("LoadResult", ["table_name", "rows", "seconds", "parse_seconds", "bytes"],
+                              defaults=(None, None))):
+    """
+    Row count and wall time of one table load. Loaders that can tell them apart also report
+    the part of the wall time spent parsing the source (the rest is transfer to the server)
+    and the number of bytes sent; both are None otherwise.
+    """
+    @property
+    def rows_per_second(self):
+        return self.rows / self.seconds if self.seconds > 0 else 0.0
+
+    def __str__(self):
+        return "%d rows into %s in %.2f s (%.0f rows/s)" % (
+            self.rows, self.table_name, self.seconds, self.rows_per_second)
+
+# Suffix of the UNLOGGED copy that a staging load fills before swapping it in for the live table.
+STAGING_SUFFIX = '__staging'
+
+# pandas dtypes of the Arrow types read from typed CSV files; keeps integer and boolean columns with nulls typed
+ARROW_PANDAS_TYPES = {} if pa is None else {
+    pa.int64(): pd.Int64Dtype(),
+    pa.bool_(): pd.BooleanDtype(),
+    pa.string(): pd.StringDtype(),
+}
+
+# An index or constraint dropped before a bulk load, with the statements to drop and recreate it.
+# kind is 'foreign_key', 'constraint' (primary key, unique, exclusion) or 'index'.
+IndexDefinition = namedtuple("IndexDefinition", ["table_name", "name", "kind", "drop_sql", "create_sql"])
+
+def truncate_tables(cursor, tables):
+    """
+    Truncate the specified tables, in one statement so that foreign keys between them do not block it.
+    """
+    cursor.execute(sql.SQL("TRUNCATE TABLE {}").format(sql.SQL(', ').join(map(sql.Identifier, tables))))
+    logger.info("Tables truncated: %s", ", ".join(tables))
+
+def registered_table(table_name):
+    """
+    Returns the schema registry name of a table or of its staging copy, or None if it is not registered.
+    """
+    if table_name.endswith(STAGING_SUFFIX):
+        table_name = table_name[:-len(STAGING_SUFFIX)]
+    return table_name if table_name in TABLE_SCHEMAS else None
+
+def open_csv_source(csv_file_path, binary=False):
+    """
+    Opens a local CSV file or a CSV URL as a text stream (or a byte stream with binary),
+    without reading it into memory. URLs are read through the http_source cache, and
+    .csv.gz / .csv.zst sources are decompressed as they are read.
+    """
+    source = open_url(csv_file_path) if is_url(csv_file_path) else open(csv_file_path, "rb")
+    source = decompressing_reader(source, compression_of(csv_file_path))
+    return source if binary else io.TextIOWrapper(source, encoding="utf-8-sig", newline="")
+
+def to_decimals(series):
+    """
+    Converts a column of numeric strings to decimal.Decimal values; missing values stay missing.
+    """
+    return series.astype(object).map(decimal.Decimal, na_action='ignore')
+
+def iter_csv_chunks(csv_file_path, chunk_rows=DEFAULT_CHUNK_ROWS, table_name=None, columns=None):
+    """
+    Yields the rows of a CSV file as DataFrames of at most chunk_rows rows,
+    with whitespace stripped from the column names.
+    For a table in the schema registry the columns are parsed with their registered types
+    (with the Arrow CSV reader when pyarrow is installed), numeric columns as decimal.Decimal
+    values, and only `columns` are read; otherwise pandas infers the types of all columns.
+    """
+    table_name = registered_table(table_name) if table_name else None
+    if table_name and pa is not None:
+        yield from iter_arrow_csv_chunks(csv_file_path, chunk_rows, table_name, columns)
+        return
+    dtypes = pandas_dtypes(table_name, columns) if table_name else None
+    dates = date_columns(table_name, columns) if table_name else {}
+    numerics = numeric_columns(table_name, columns) if table_name else []
+    usecols = None
+    if table_name and columns:
+        wanted = set(columns)
+        usecols = lambda name: name.strip() in wanted
+    with open_csv_source(csv_file_path) as source:
+        string_columns = {col: 'string' for col in itertools.chain(dates, numerics)}
+        for df in pd.read_csv(source, chunksize=chunk_rows, dtype=dtypes and dict(dtypes, **string_columns),
+                              usecols=usecols):
+            df.columns = df.columns.str.strip()
+            for col, date_format in dates.items():
+                df[col] = pd.to_datetime(df[col], format=date_format or '%Y-%m-%d').dt.date
+            for col in numerics:
+                df[col] = to_decimals(df[col])
+            yield df
+
+def iter_arrow_csv_chunks(csv_file_path, chunk_rows, table_name, columns=None):
+    """
+    Typed variant of iter_csv_chunks for registered tables, reading with the streaming Arrow CSV reader.
+    """
+    columns = columns or TABLE_SCHEMAS[table_name].column_names
+    dates = date_columns(table_name, columns)
+    numerics = numeric_columns(table_name, columns)
+    convert_options = pa.csv.ConvertOptions(
+        column_types=arrow_column_types(table_name, columns),
+        include_columns=columns,
+        strings_can_be_null=True,
+        timestamp_parsers=sorted(set(date_format for date_format in dates.values() if date_format)) or None,
+    )
+
+    def to_dataframe(table):
+        for col, date_format in dates.items():
+            if date_format:
+                table = table.set_column(table.schema.get_field_index(col), col,
+                                         pa.compute.cast(table[col], pa.date32()))
+        df = table.to_pandas(types_mapper=ARROW_PANDAS_TYPES.get)
+        for col in numerics:
+            df[col] = to_decimals(df[col])
+        return df
+
+    with open_csv_source(csv_file_path, binary=True) as source:
+        reader = pa.csv.open_csv(source, convert_options=convert_options)
+        pending = []
+        pending_rows = 0
+        for batch in reader:
+            pending.append(batch)
+            pending_rows += batch.num_rows
+            while pending_rows >= chunk_rows:
+                table = pa.Table.from_batches(pending)
+                yield to_dataframe(table.slice(0, chunk_rows))
+                rest = table.slice(chunk_rows)
+                pending = rest.to_batches()
+                pending_rows = rest.num_rows
+        if pending_rows:
+            yield to_dataframe(pa.Table.from_batches(pending))
+
+def csv_column_indexes(header, columns):
+    """
+    Returns the positions of the requested columns in a CSV header row.
+    """
+    header = [name.strip() for name in header]
+    missing = [col for col in columns if col not in header]
+    if missing:
+        raise ValueError("CSV source is missing columns: %s" % ", ".join(missing))
+    return [header.index(col) for col in columns]
+
+class CsvColumnStream(io.TextIOBase):
+    """
+    Read-only text stream that re-emits rows from a csv.reader with only the requested columns,
+    in the requested order, so it can be passed to cursor.copy_expert().
+    Rows are converted lazily as COPY asks for more data. When max_rows is set the stream
+    ends after that many rows and the reader can be passed to the next stream.
+    converters optionally gives, per output column, a function applied to its values (see
+    schema_registry.value_converters).
+    """
+    def __init__(self, reader, indexes, max_rows=None, converters=None):
+        self._reader = reader
+        self._indexes = indexes
+        self._converters = list(enumerate(converters)) if converters and any(converters) else None
+        self._max_rows = max_rows
+        self._line = io.StringIO()
+        self._writer = csv.writer(self._line, lineterminator="\n")
+        self._pending = ""
+        self.rows = 0
+        self.bytes = 0
+        self.parse_seconds = 0.0
+        self.exhausted = False
+
+    def readable(self):
+        return True
+
+    def _next_line(self):
+        if self._max_rows is not None and self.rows >= self._max_rows:
+            return None
+        row = next(self._reader, None)
+        if row is None:
+            self.exhausted = True
+            return None
+        self._line.seek(0)
+        self._line.truncate()
+        values = [row[i] for i in self._indexes]
+        if self._converters:
+            for position, convert in self._converters:
+                if convert:
+                    values[position] = convert(values[position])
+        self._writer.writerow(values)
+        self.rows += 1
+        return self._line.getvalue()
+
+    def read(self, size=-1):
+        start = time.perf_counter()
+        parts = [self._pending]
+        length = len(self._pending)
+        while size < 0 or length < size:
+            line = self._next_line()
+            if line is None:
+                break
+            parts.append(line)
+            length += len(line)
+            self.bytes += len(line.encode("utf-8"))
+        data = "".join(parts)
+        self.parse_seconds += time.perf_counter() - start
+        if size < 0 or length <= size:
+            self._pending = ""
+            return data
+        self._pending = data[size:]
+        return data[:size]
+
+def insert_dataframe(cursor, table_name, df, columns=None):
+    """
+    Inserts the rows of a DataFrame into a table with set-based multi-row INSERT statements.
+    Missing values are sent as NULL. Returns the number of rows inserted.
+    """
+    columns = columns or TABLE_COLUMNS[table_name]
+    insert_query = sql.SQL("INSERT INTO {} ({}) VALUES %s").format(
+        sql.Identifier(table_name),
+        sql.SQL(', ').join(map(sql.Identifier, columns))
+    )
+    values = df[columns].astype(object)
+    values = values.where(values.notna(), None)
+    psycopg2.extras.execute_values(cursor, insert_query, values.itertuples(index=False, name=None), page_size=1000)
+    return len(values)
+
+def load_dataframe(cursor, table_name, df, columns=None):
+    """
+    Loads an in-memory DataFrame into a table and returns a LoadResult.
+    """
+    start = time.perf_counter()
+    rows = insert_dataframe(cursor, table_name, df, columns)
+    result = LoadResult(table_name, rows, time.perf_counter() - start)
+    logger.info("Data loaded: %s.", result)
+    return result
+
+def load_table_from_csv(cursor, table_name, csv_file_path, columns=None, chunk_rows=DEFAULT_CHUNK_ROWS):
+    """
+    Loads data from a CSV file into a specified PostgreSQL table,
+    one set-based INSERT batch per chunk of chunk_rows rows. Returns a LoadResult.
+    """
+    columns = columns or TABLE_COLUMNS[table_name]
+    start = time.perf_counter()
+    total_rows = 0
+    transfer_seconds = 0.0
+    for df in iter_csv_chunks(csv_file_path, chunk_rows, table_name, columns):
+        transfer_start = time.perf_counter()
+        total_rows += insert_dataframe(cursor, table_name, df, columns)
+        transfer_seconds += time.perf_counter() - transfer_start
+    seconds = time.perf_counter() - start
+    result = LoadResult(table_name, total_rows, seconds, parse_seconds=seconds - transfer_seconds)
+    logger.info("Data loaded: %s.", result)
+    return result
+
+def copy_table_from_csv(cursor, table_name, csv_file_path, columns=None, chunk_rows=DEFAULT_CHUNK_ROWS):
+    """
+    Streams a CSV file into a specified PostgreSQL table with COPY ... FROM STDIN,
+    one COPY per chunk of chunk_rows rows. Columns are mapped by name from the CSV header;
+    no DataFrame is built. Returns a LoadResult.
+    """
+    columns = columns or TABLE_COLUMNS[table_name]
+    start = time.perf_counter()
+    copy_query = sql.SQL("COPY {} ({}) FROM STDIN WITH (FORMAT csv)").format(
+        sql.Identifier(table_name),
+        sql.SQL(', ').join(map(sql.Identifier, columns))
+    )
+    total_rows = 0
+    total_bytes = 0
+    parse_seconds = 0.0
+    with open_csv_source(csv_file_path) as source:
+        reader = csv.reader(source)
+        indexes = csv_column_indexes(next(reader), columns)
+        converters = value_converters(registered_table(table_name), columns)
+        while True:
+            stream = CsvColumnStream(reader, indexes, max_rows=chunk_rows, converters=converters)
+            cursor.copy_expert(copy_query, stream)
+            total_rows += stream.rows
+            total_bytes += stream.bytes
+            parse_seconds += stream.parse_seconds
+            if stream.exhausted:
+                break
+    result = LoadResult(table_name, total_rows, time.perf_counter() - start, parse_seconds, total_bytes)
+    logger.info("Data copied: %s.", result)
+    return result
+
+def ensure_row_hash_table(cursor):
+    """
+    Creates the control table that stores the content hash of every row loaded incrementally.
+    """
+    cursor.execute(sql.SQL("""
+        CREATE TABLE IF NOT EXISTS {} (
+            table_name text NOT NULL,
+            row_id text NOT NULL,
+            row_hash text NOT NULL,
+            PRIMARY KEY (table_name, row_id)
+        )
+    """).format(sql.Identifier(ROW_HASH_TABLE)))
+
+def clear_row_hashes(cursor, tables):
+    """
+    Forgets the stored row hashes of the specified tables, e.g. after they were truncated.
+    Does nothing if the control table does not exist.
+    """
+    cursor.execute("SELECT to_regclass(%s)", (ROW_HASH_TABLE,))
+    if cursor.fetchone()[0] is None:
+        return
+    cursor.execute(
+        sql.SQL("DELETE FROM {} WHERE table_name = ANY(%s)").format(sql.Identifier(ROW_HASH_TABLE)),
+        (list(tables),)
+    )
+
+def ensure_unique_key(cursor, table_name, key_column):
+    """
+    Makes sure the key column has a unique index, which INSERT ... ON CONFLICT needs.
+    An existing primary key or single-column unique index is reused.
+    """
+    cursor.execute("""
+        SELECT 1
+        FROM pg_index i
+        JOIN pg_attribute a ON a.attrelid = i.indrelid AND a.attnum = i.indkey[0]
+        WHERE i.indrelid = %s::regclass AND i.indisunique AND i.indnkeyatts = 1
+          AND i.indpred IS NULL AND a.attname = %s
+    """, (table_name, key_column))
+    if cursor.fetchone() is None:
+        cursor.execute(sql.SQL("CREATE UNIQUE INDEX {} ON {} ({})").format(
+            sql.Identifier("%s_%s_key" % (table_name, key_column)),
+            sql.Identifier(table_name),
+            sql.Identifier(key_column)
+        ))
+        logger.info("Created unique index on %s(%s) for incremental loads.", table_name, key_column)
+
+def row_hash(values):
+    """
+    Returns a content hash of one row of CSV values.
+    """
+    return hashlib.blake2b("\x1f".join(values).encode("utf-8"), digest_size=16).hexdigest()
+
+def converted_row(values, converters):
+    """
+    Returns the values of a CSV row as query parameters: converters applied, empty strings as NULL.
+    """
+    values = list(values)
+    for position, convert in converters:
+        values[position] = convert(values[position])
+    return tuple(value if value != '' else None for value in values)
+
+def upsert_table_from_csv(cursor, table_name, csv_file_path, columns=None, chunk_rows=DEFAULT_CHUNK_ROWS,
+                          key_column='id', delete_missing=False):
+    """
+    Incrementally loads a CSV file into a table. Each row is hashed on the client and compared
+    with the hash stored in the row hash table; only new or changed rows are sent, with
+    INSERT ... ON CONFLICT DO UPDATE. With delete_missing, rows whose key is no longer in the
+    file are deleted. The row hash table must exist (see ensure_row_hash_table). Returns a LoadResult
+    whose row count is the number of rows written or deleted.
+    """
+    columns = columns or TABLE_COLUMNS[table_name]
+    start = time.perf_counter()
+    ensure_unique_key(cursor, table_name, key_column)
+
+    upsert_query = sql.SQL("INSERT INTO {} ({}) VALUES %s ON CONFLICT ({}) DO UPDATE SET {}").format(
+        sql.Identifier(table_name),
+        sql.SQL(', ').join(map(sql.Identifier, columns)),
+        sql.Identifier(key_column),
+        sql.SQL(', ').join(
+            sql.SQL("{0} = EXCLUDED.{0}").format(sql.Identifier(col)) for col in columns if col != key_column
+        )
+    )
+    hash_query = sql.SQL(
+        "INSERT INTO {} (table_name, row_id, row_hash) VALUES %s "
+        "ON CONFLICT (table_name, row_id) DO UPDATE SET row_hash = EXCLUDED.row_hash"
+    ).format(sql.Identifier(ROW_HASH_TABLE))
+
+    cursor.execute(
+        sql.SQL("SELECT row_id, row_hash FROM {} WHERE table_name = %s").format(sql.Identifier(ROW_HASH_TABLE)),
+        (table_name,)
+    )
+    known_hashes = dict(cursor.fetchall())
+
+    key_index = columns.index(key_column)
+    converters = [(position, convert) for position, convert in
+                  enumerate(value_converters(registered_table(table_name), columns)) if convert]
+    changed_rows = 0
+    unchanged_rows = 0
+    with open_csv_source(csv_file_path) as source:
+        reader = csv.reader(source)
+        indexes = csv_column_indexes(next(reader), columns)
+        while True:
+            changed = {}
+            for row in reader:
+                values = [row[i] for i in indexes]
+                key = values[key_index]
+                new_hash = row_hash(values)
+                if known_hashes.pop(key, None) == new_hash:
+                    unchanged_rows += 1
+                    continue
+                changed[key] = (values, new_hash)
+                if len(changed) >= chunk_rows:
+                    break
+            if not changed:
+                break
+            psycopg2.extras.execute_values(
+                cursor, upsert_query,
+                [converted_row(values, converters) for values, _ in changed.values()],
+                page_size=1000
+            )
+            psycopg2.extras.execute_values(
+                cursor, hash_query,
+                [(table_name, key, new_hash) for key, (_, new_hash) in changed.items()],
+                page_size=1000
+            )
+            changed_rows += len(changed)
+
+    # Whatever is left in known_hashes was not in the file
+    deleted_rows = 0
+    if delete_missing and known_hashes:
+        cursor.execute(
+            "SELECT format_type(atttypid, atttypmod) FROM pg_attribute WHERE attrelid = %s::regclass AND attname = %s",
+            (table_name, key_column)
+        )
+        key_type = cursor.fetchone()[0]
+        missing_keys = list(known_hashes)
+        cursor.execute(
+            sql.SQL("DELETE FROM {} WHERE {} = ANY(%s::{}[])").format(
+                sql.Identifier(table_name), sql.Identifier(key_column), sql.SQL(key_type)
+            ),
+            (missing_keys,)
+        )
+        deleted_rows = cursor.rowcount
+        cursor.execute(
+            sql.SQL("DELETE FROM {} WHERE table_name = %s AND row_id = ANY(%s)").format(sql.Identifier(ROW_HASH_TABLE)),
+            (table_name, missing_keys)
+        )
+
+    result = LoadResult(table_name, changed_rows + deleted_rows, time.perf_counter() - start)
+    logger.info("Incremental load of %s: %d new or changed, %d unchanged, %d deleted (%.2f s).",
+                table_name, changed_rows, unchanged_rows, deleted_rows, result.seconds)
+    return result
+
+def ensure_checkpoint_table(cursor):
+    """
+    Creates the control table that records the progress of checkpointed loads.
+    """
+    cursor.execute(sql.SQL("""
+        CREATE TABLE IF NOT EXISTS {} (
+            table_name text PRIMARY KEY,
+            source_fingerprint text NOT NULL,
+            rows_committed bigint NOT NULL,
+            completed boolean NOT NULL DEFAULT false,
+            updated_at timestamptz NOT NULL DEFAULT now()
+        )
+    """).format(sql.Identifier(CHECKPOINT_TABLE)))
+
+def clear_checkpoints(cursor, tables):
+    """
+    Removes the checkpoints of the specified tables, e.g. after they were reloaded without checkpoints.
+    Does nothing if the control table does not exist.
+    """
+    cursor.execute("SELECT to_regclass(%s)", (CHECKPOINT_TABLE,))
+    if cursor.fetchone()[0] is None:
+        return
+    cursor.execute(
+        sql.SQL("DELETE FROM {} WHERE table_name = ANY(%s)").format(sql.Identifier(CHECKPOINT_TABLE)),
+        (list(tables),)
+    )
+
+def source_fingerprint(csv_file_path):
+    """
+    Identifies the content of a source file, so that a load is only resumed against the same file.
+    Local files are hashed. URLs are fetched into the http_source cache and identified by the
+    ETag or Last-Modified header the server sent, or else by the hash of the cached copy.
+    """
+    if is_url(csv_file_path):
+        result = fetch_url(csv_file_path)
+        metadata = read_metadata(csv_file_path) or {}
+        if metadata.get("etag"):
+            return "etag:%s" % metadata["etag"]
+        if metadata.get("last_modified"):
+            return "modified:%s:%s" % (metadata["last_modified"], os.path.getsize(result.path))
+        csv_file_path = result.path
+    digest = hashlib.sha256()
+    with open(csv_file_path, "rb") as source:
+        for block in iter(lambda: source.read(1024 * 1024), b""):
+            digest.update(block)
+    return "sha256:%s" % digest.hexdigest()
+
+def read_checkpoint(cursor, table_name):
+    """
+    Returns (source_fingerprint, rows_committed, completed) for a table, or None if it has no checkpoint.
+    """
+    cursor.execute(
+        sql.SQL("SELECT source_fingerprint, rows_committed, completed FROM {} WHERE table_name = %s").format(
+            sql.Identifier(CHECKPOINT_TABLE)),
+        (table_name,)
+    )
+    return cursor.fetchone()
+
+def save_checkpoint(cursor, table_name, fingerprint, rows_committed, completed):
+    """
+    Records the progress of a checkpointed load; commits together with the rows it describes.
+    """
+    cursor.execute(sql.SQL("""
+        INSERT INTO {} (table_name, source_fingerprint, rows_committed, completed, updated_at)
+        VALUES (%s, %s, %s, %s, now())
+        ON CONFLICT (table_name) DO UPDATE SET
+            source_fingerprint = EXCLUDED.source_fingerprint,
+            rows_committed = EXCLUDED.rows_committed,
+            completed = EXCLUDED.completed,
+            updated_at = EXCLUDED.updated_at
+    """).format(sql.Identifier(CHECKPOINT_TABLE)), (table_name, fingerprint, rows_committed, completed))
+
+def referencing_tables(cursor, table_name):
+    """
+    Returns the tables whose foreign keys reference a table, directly or through other tables.
+    """
+    cursor.execute("""
+        WITH RECURSIVE referencing(oid) AS (
+            SELECT %s::regclass::oid
+            UNION
+            SELECT con.conrelid FROM pg_constraint con JOIN referencing r ON con.confrelid = r.oid
+            WHERE con.contype = 'f'
+        )
+        SELECT c.relname FROM referencing r JOIN pg_class c ON c.oid = r.oid
+        WHERE r.oid <> %s::regclass
+        ORDER BY c.relname
+    """, (table_name, table_name))
+    return [row[0] for row in cursor.fetchall()]
+
+def copy_table_with_checkpoints(cursor, table_name, csv_file_path, columns=None, chunk_rows=DEFAULT_CHUNK_ROWS,
+                                resume=False):
+    """
+    Streams a CSV file into a table with one COPY per chunk, committing every chunk together with
+    a checkpoint of the rows committed so far. A failed load loses only its last chunk.
+    With resume, a table whose checkpoint matches the fingerprint of the source file continues after
+    the last committed row (or is skipped if it was completed); otherwise the table is truncated
+    and loaded from the start, together with the tables referencing it, whose checkpoints are
+    cleared so that they are loaded from the start after it. The checkpoint table must exist (see ensure_checkpoint_table).
+    Returns a LoadResult for the rows loaded by this call.
+    """
+    columns = columns or TABLE_COLUMNS[table_name]
+    conn = cursor.connection
+    start = time.perf_counter()
+    fingerprint = source_fingerprint(csv_file_path)
+    checkpoint = read_checkpoint(cursor, table_name) if resume else None
+
+    if checkpoint and checkpoint[0] == fingerprint:
+        rows_committed, completed = checkpoint[1], checkpoint[2]
+        if completed:
+            logger.info("Table %s was already loaded from this source; skipping.", table_name)
+            return LoadResult(table_name, 0, time.perf_counter() - start)
+        logger.info("Resuming %s load after row %d.", table_name, rows_committed)
+    else:
+        if checkpoint:
+            logger.info("Source of %s changed since the last checkpoint; loading from the start.", table_name)
+        rows_committed = 0
+        # Tables whose foreign keys reference this one are emptied with it and start over as well
+        dependents = referencing_tables(cursor, table_name)
+        truncate_tables(cursor, [table_name] + dependents)
+        clear_row_hashes(cursor, [table_name] + dependents)
+        clear_checkpoints(cursor, dependents)
+        save_checkpoint(cursor, table_name, fingerprint, 0, False)
+        conn.commit()
+
+    copy_query = sql.SQL("COPY {} ({}) FROM STDIN WITH (FORMAT csv)").format(
+        sql.Identifier(table_name),
+        sql.SQL(', ').join(map(sql.Identifier, columns))
+    )
+    loaded_rows = 0
+    loaded_bytes = 0
+    parse_seconds = 0.0
+    with open_csv_source(csv_file_path) as source:
+        reader = csv.reader(source)
+        indexes = csv_column_indexes(next(reader), columns)
+        converters = value_converters(registered_table(table_name), columns)
+        # Skip the rows committed by the previous run
+        deque(itertools.islice(reader, rows_committed), maxlen=0)
+        while True:
+            stream = CsvColumnStream(reader, indexes, max_rows=chunk_rows, converters=converters)
+            cursor.copy_expert(copy_query, stream)
+            rows_committed += stream.rows
+            loaded_rows += stream.rows
+            loaded_bytes += stream.bytes
+            parse_seconds += stream.parse_seconds
+            save_checkpoint(cursor, table_name, fingerprint, rows_committed, stream.exhausted)
+            conn.commit()
+            if stream.exhausted:
+                break
+    result = LoadResult(table_name, loaded_rows, time.perf_counter() - start, parse_seconds, loaded_bytes)
+    logger.info("Data copied with checkpoints: %s; %d rows committed in total.", result, rows_committed)
+    return result
+
+def capture_index_definitions(cursor, tables):
+    """
+    Returns the indexes and constraints a bulk load into the tables would have to maintain:
+    primary key, unique and exclusion constraints and plain indexes on the tables, and foreign keys
+    on or referencing them. CHECK and NOT NULL constraints are cheap per row and are left in place.
+    """
+    definitions = []
+    cursor.execute("""
+        SELECT con.conrelid::regclass::text, quote_ident(con.conname), con.contype, pg_get_constraintdef(con.oid)
+        FROM pg_constraint con
+        WHERE con.contype IN ('p', 'u', 'x', 'f')
+          AND (con.conrelid = ANY(%s::regclass[]) OR con.confrelid = ANY(%s::regclass[]))
+        ORDER BY con.contype, con.conname
+    """, (list(tables), list(tables)))
+    for table_name, name, contype, definition in cursor.fetchall():
+        definitions.append(IndexDefinition(
+            table_name, name, 'foreign_key' if contype == 'f' else 'constraint',
+            "ALTER TABLE %s DROP CONSTRAINT %s" % (table_name, name),
+            "ALTER TABLE %s ADD CONSTRAINT %s %s" % (table_name, name, definition)
+        ))
+    cursor.execute("""
+        SELECT i.indrelid::regclass::text, quote_ident(n.nspname) || '.' || quote_ident(ic.relname),
+               pg_get_indexdef(i.indexrelid)
+        FROM pg_index i
+        JOIN pg_class ic ON ic.oid = i.indexrelid
+        JOIN pg_namespace n ON n.oid = ic.relnamespace
+        WHERE i.indrelid = ANY(%s::regclass[])
+          AND NOT EXISTS (
+              SELECT 1 FROM pg_constraint con
+              WHERE con.conindid = i.indexrelid AND con.contype IN ('p', 'u', 'x')
+          )
+        ORDER BY ic.relname
+    """, (list(tables),))
+    for table_name, name, definition in cursor.fetchall():
+        definitions.append(IndexDefinition(table_name, name, 'index', "DROP INDEX %s" % name, definition))
+    return definitions
+
+def drop_index_definitions(cursor, definitions):
+    """
+    Drops the captured indexes and constraints; foreign keys go first since they depend on unique indexes.
+    """
+    for definition in sorted(definitions, key=lambda d: d.kind != 'foreign_key'):
+        cursor.execute(definition.drop_sql)
+    logger.info("Dropped %d indexes and constraints: %s", len(definitions),
+                ", ".join(definition.name for definition in definitions))
+
+def rebuild_index_definitions(conn_string, definitions, parallel):
+    """
+    Recreates dropped indexes and constraints, running up to `parallel` statements at once,
+    each on its own autocommit connection from a pool. Foreign keys are added after the unique
+    indexes they rely on. Every statement is attempted; if any fail, raises after logging them.
+    Returns the wall time of the rebuild in seconds.
+    """
+    start = time.perf_counter()
+    stages = [
+        [definition for definition in definitions if definition.kind != 'foreign_key'],
+        [definition for definition in definitions if definition.kind == 'foreign_key'],
+    ]
+    connection_pool = psycopg2.pool.ThreadedConnectionPool(1, max(1, parallel), conn_string)
+
+    def build(definition):
+        conn = connection_pool.getconn()
+        try:
+            conn.autocommit = True
+            build_start = time.perf_counter()
+            with conn.cursor() as cursor:
+                cursor.execute(definition.create_sql)
+            return time.perf_counter() - build_start
+        finally:
+            connection_pool.putconn(conn)
+
+    failed = []
+    try:
+        for stage in stages:
+            if not stage:
+                continue
+            with ThreadPoolExecutor(max_workers=max(1, min(parallel, len(stage)))) as executor:
+                futures = {executor.submit(build, definition): definition for definition in stage}
+                for future in as_completed(futures):
+                    definition = futures[future]
+                    try:
+                        logger.info("Rebuilt %s on %s in %.2f s.", definition.name, definition.table_name, future.result())
+                    except Exception as e:
+                        failed.append(definition)
+                        logger.error("Failed to rebuild %s on %s: %s Statement: %s",
+                                     definition.name, definition.table_name, e, definition.create_sql)
+    finally:
+        connection_pool.closeall()
+    if failed:
+        raise RuntimeError("Failed to rebuild %d indexes or constraints: %s" % (
+            len(failed), ", ".join(definition.name for definition in failed)))
+    return time.perf_counter() - start
+
+def check_swappable(cursor, table_name):
+    """
+    Raises if a table cannot be replaced by renaming a staging copy over it:
+    views and foreign keys of other tables would keep pointing at the old table.
+    """
+    cursor.execute("""
+        SELECT DISTINCT r.ev_class::regclass::text
+        FROM pg_depend d
+        JOIN pg_rewrite r ON r.oid = d.objid
+        WHERE d.refobjid = %s::regclass AND r.ev_class <> %s::regclass
+    """, (table_name, table_name))
+    views = [row[0] for row in cursor.fetchall()]
+    cursor.execute(
+        "SELECT conrelid::regclass::text FROM pg_constraint WHERE contype = 'f' AND confrelid = %s::regclass",
+        (table_name,)
+    )
+    referencing = [row[0] for row in cursor.fetchall()]
+    if views or referencing:
+        raise RuntimeError("Cannot swap a staging copy in for %s: it is used by %s" % (
+            table_name, ", ".join(["view " + view for view in views] + ["foreign key on " + ref for ref in referencing])))
+
+def staging_index_statements(cursor, table_name, staging_name):
+    """
+    Returns the statements that build the indexes and constraints of a table on its staging copy
+    under temporary names, and the statements that give them their original names after the swap.
+    """
+    create_statements = []
+    rename_statements = []
+    cursor.execute("""
+        SELECT conname, pg_get_constraintdef(oid)
+        FROM pg_constraint
+        WHERE conrelid = %s::regclass AND contype IN ('p', 'u', 'x', 'f')
+        ORDER BY contype = 'f', conname
+    """, (table_name,))
+    for number, (name, definition) in enumerate(cursor.fetchall(), 1):
+        temp_name = "%s_c%d" % (staging_name, number)
+        create_statements.append(sql.SQL("ALTER TABLE {} ADD CONSTRAINT {} {}").format(
+            sql.Identifier(staging_name), sql.Identifier(temp_name), sql.SQL(definition)))
+        rename_statements.append(sql.SQL("ALTER TABLE {} RENAME CONSTRAINT {} TO {}").format(
+            sql.Identifier(table_name), sql.Identifier(temp_name), sql.Identifier(name)))
+    cursor.execute("""
+        SELECT ic.relname, i.indisunique, pg_get_indexdef(i.indexrelid)
+        FROM pg_index i
+        JOIN pg_class ic ON ic.oid = i.indexrelid
+        WHERE i.indrelid = %s::regclass
+          AND NOT EXISTS (
+              SELECT 1 FROM pg_constraint con
+              WHERE con.conindid = i.indexrelid AND con.contype IN ('p', 'u', 'x')
+          )
+        ORDER BY ic.relname
+    """, (table_name,))
+    for number, (name, unique, definition) in enumerate(cursor.fetchall(), 1):
+        temp_name = "%s_i%d" % (staging_name, number)
+        # pg_get_indexdef returns "CREATE [UNIQUE] INDEX name ON schema.table USING method (...)"
+        index_body = definition.split(" USING ", 1)[1]
+        create_statements.append(sql.SQL("CREATE {}INDEX {} ON {} USING {}").format(
+            sql.SQL("UNIQUE " if unique else ""), sql.Identifier(temp_name),
+            sql.Identifier(staging_name), sql.SQL(index_body)))
+        rename_statements.append(sql.SQL("ALTER INDEX {} RENAME TO {}").format(
+            sql.Identifier(temp_name), sql.Identifier(name)))
+    return create_statements, rename_statements
+
+def copy_table_grants(cursor, source_table, target_table):
+    """
+    Grants on target_table the same table privileges that were granted on source_table.
+    """
+    cursor.execute("""
+        SELECT CASE WHEN acl.grantee = 0 THEN 'PUBLIC' ELSE quote_ident(pg_get_userbyid(acl.grantee)) END,
+               acl.privilege_type, acl.is_grantable
+        FROM pg_class c, aclexplode(c.relacl) acl
+        WHERE c.oid = %s::regclass
+    """, (source_table,))
+    for grantee, privilege, grantable in cursor.fetchall():
+        cursor.execute(sql.SQL("GRANT {} ON {} TO {}{}").format(
+            sql.SQL(privilege), sql.Identifier(target_table), sql.SQL(grantee),
+            sql.SQL(" WITH GRANT OPTION" if grantable else "")))
+
+def load_table_via_staging(cursor, table_name, csv_file_path, columns=None, load_table=copy_table_from_csv,
+                           keep_unlogged=False, lock_timeout='10s', metrics=None):
+    """
+    Loads a table by filling an UNLOGGED staging copy with load_table, building its indexes and
+    constraints after the load, and then swapping it in for the live table by renaming.
+    Readers keep seeing the old rows until the transaction commits; the exclusive locks are only
+    taken for the final renames, bounded by lock_timeout. Unless keep_unlogged is set the staging
+    table is made LOGGED right after the load, before its indexes are built, so the table stays
+    crash-safe and replicated; that writes the whole table (and its indexes) to WAL, as a plain
+    load does. Only keep_unlogged saves the WAL, at the cost of crash safety and replication.
+    The index build and swap are recorded as phases when a load_metrics.MetricsRecorder is given.
+    The caller commits (or rolls back) the transaction. Returns the LoadResult of load_table
+    under the name of the live table.
+    """
+    columns = columns or TABLE_COLUMNS[table_name]
+    staging_name = table_name + STAGING_SUFFIX
+    check_swappable(cursor, table_name)
+
+    cursor.execute(sql.SQL("DROP TABLE IF EXISTS {}").format(sql.Identifier(staging_name)))
+    cursor.execute(sql.SQL(
+        "CREATE UNLOGGED TABLE {} (LIKE {} INCLUDING DEFAULTS INCLUDING CONSTRAINTS INCLUDING IDENTITY "
+        "INCLUDING GENERATED INCLUDING STORAGE INCLUDING COMMENTS)"
+    ).format(sql.Identifier(staging_name), sql.Identifier(table_name)))
+    result = load_table(cursor, staging_name, csv_file_path, columns)
+    if not keep_unlogged:
+        # SET LOGGED rewrites the table and rebuilds its indexes, so it runs before any are built
+        cursor.execute(sql.SQL("ALTER TABLE {} SET LOGGED").format(sql.Identifier(staging_name)))
+
+    build_start = time.perf_counter()
+    create_statements, rename_statements = staging_index_statements(cursor, table_name, staging_name)
+    for statement in create_statements:
+        cursor.execute(statement)
+    copy_table_grants(cursor, table_name, staging_name)
+    build_seconds = time.perf_counter() - build_start
+    logger.info("Built %d indexes and constraints on %s in %.2f s.", len(create_statements), staging_name, build_seconds)
+    if metrics:
+        metrics.record("index_build", build_seconds, table_name, rows=result.rows, indexes=len(create_statements))
+
+    swap_start = time.perf_counter()
+    old_name = table_name + '__old'
+    cursor.execute("SET LOCAL lock_timeout = %s", (lock_timeout,))
+    cursor.execute(sql.SQL("ALTER TABLE {} RENAME TO {}").format(sql.Identifier(table_name), sql.Identifier(old_name)))
+    cursor.execute(sql.SQL("ALTER TABLE {} RENAME TO {}").format(sql.Identifier(staging_name), sql.Identifier(table_name)))
+    cursor.execute(sql.SQL("DROP TABLE {}").format(sql.Identifier(old_name)))
+    for statement in rename_statements:
+        cursor.execute(statement)
+    swap_seconds = time.perf_counter() - swap_start
+    logger.info("Swapped %s in for %s in %.3f s.", staging_name, table_name, swap_seconds)
+    if metrics:
+        metrics.record("swap", swap_seconds, table_name)
+    return result._replace(table_name=table_name)
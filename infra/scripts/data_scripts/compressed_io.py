@@ -0,0 +1,150 @@
+"""
+Streaming gzip and Zstandard support for the CSV sources and generated files.
+
+The compression of a file is taken from its extension (.gz or .zst, e.g. orders.csv.zst).
+Readers decompress as the loader consumes the stream and writers compress as rows are
+written, so no uncompressed copy of a file is ever written to disk.
+
+zstandard is optional and only needed for .zst files.
+
+Compress existing CSV files for shipping with:
+    python compressed_io.py --compression zst ../../data/postgresql_db_sample_data/*.csv
+"""
+import argparse
+import gzip
+import io
+import logging
+import os
+import shutil
+import sys
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+logger = logging.getLogger(__name__)
+
+# File extension of each supported compression
+COMPRESSION_SUFFIXES = {
+    "gz": ".gz",
+    "zst": ".zst",
+}
+
+# Compression level of written files: gzip's default, and zstd's default level 3
+GZIP_LEVEL = 6
+ZSTD_LEVEL = 3
+
+def compression_of(path):
+    """
+    Returns the compression of a file or URL from its extension ('gz' or 'zst'), or None.
+    """
+    name = path.split("?")[0].lower()
+    for compression, suffix in COMPRESSION_SUFFIXES.items():
+        if name.endswith(suffix):
+            return compression
+    return None
+
+def require_zstandard():
+    if zstandard is None:
+        raise RuntimeError("zstandard is required for .zst files: pip install zstandard")
+
+class ClosingStream(io.RawIOBase):
+    """
+    Binary stream proxy whose close() also closes the wrapped stream; GzipFile leaves a
+    fileobj it was given open.
+    """
+    def __init__(self, stream):
+        super().__init__()
+        self._stream = stream
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        data = self._stream.read(len(buffer))
+        buffer[:len(data)] = data
+        return len(data)
+
+    def close(self):
+        self._stream.close()
+        super().close()
+
+def decompressing_reader(stream, compression):
+    """
+    Wraps a binary stream so that reading it yields the decompressed bytes.
+    Closing the returned stream closes the wrapped one.
+    """
+    if compression == "gz":
+        return gzip.GzipFile(fileobj=ClosingStream(stream), mode="rb")
+    if compression == "zst":
+        require_zstandard()
+        # Concatenated files (e.g. the shards of sharded_generator.py) are one frame per part
+        return io.BufferedReader(zstandard.ZstdDecompressor().stream_reader(stream, read_across_frames=True,
+                                                                            closefd=True))
+    return stream
+
+class OwningGzipFile(gzip.GzipFile):
+    """
+    GzipFile that also closes the file object it was given.
+    """
+    def close(self):
+        fileobj = self.fileobj
+        try:
+            super().close()
+        finally:
+            if fileobj is not None:
+                fileobj.close()
+
+def open_output(path, compression=None, binary=False):
+    """
+    Opens a file for writing CSV text (or bytes, when binary is true), compressed as the
+    compression argument or, when it is None, as the extension of path says. The same text
+    always gives the same bytes: gzip headers carry no file name or timestamp.
+    """
+    compression = compression or compression_of(path)
+    if compression == "gz":
+        writer = OwningGzipFile(filename="", mode="wb", compresslevel=GZIP_LEVEL, fileobj=open(path, "wb"), mtime=0)
+    elif compression == "zst":
+        require_zstandard()
+        writer = zstandard.ZstdCompressor(level=ZSTD_LEVEL).stream_writer(open(path, "wb"), closefd=True)
+    elif binary:
+        return open(path, "wb")
+    else:
+        return open(path, "w", encoding="utf-8", newline="")
+    return writer if binary else io.TextIOWrapper(writer, encoding="utf-8", newline="")
+
+def compress_file(path, compression, remove=False):
+    """
+    Writes a compressed copy of a file next to it, e.g. orders.csv -> orders.csv.zst.
+    Returns the path of the copy.
+    """
+    output_path = path + COMPRESSION_SUFFIXES[compression]
+    partial_path = output_path + ".partial"
+    with open(path, "r", encoding="utf-8", newline="") as source, open_output(partial_path, compression) as target:
+        shutil.copyfileobj(source, target, 1024 * 1024)
+    os.replace(partial_path, output_path)
+    if remove:
+        os.remove(path)
+    return output_path
+
+def main():
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(levelname)s - %(message)s',
+        handlers=[logging.StreamHandler(sys.stdout)]
+    )
+    parser = argparse.ArgumentParser(description="Compress CSV files for loading with the bulk loaders.")
+    parser.add_argument("paths", nargs="+", help="Files to compress.")
+    parser.add_argument("--compression", choices=sorted(COMPRESSION_SUFFIXES), default="zst",
+                        help="Compression to write.")
+    parser.add_argument("--remove", action="store_true", help="Remove the uncompressed files afterwards.")
+    args = parser.parse_args()
+
+    for path in args.paths:
+        size = os.path.getsize(path)
+        output_path = compress_file(path, args.compression, args.remove)
+        logger.info("%s: %d -> %d bytes.", output_path, size, os.path.getsize(output_path))
+
+if __name__ == "__main__":
+    main()
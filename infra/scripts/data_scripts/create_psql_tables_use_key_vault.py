@@ -6,12 +6,27 @@ from psycopg2 import sql
 import logging
 import sys
 import os
+import time
+import argparse
+from schema_registry import create_indexes_sql, create_table_sql
 
 
 ################################################################################################
 # Initialization: 
 ################################################################################################
 
+# Parse command-line arguments
+parser = argparse.ArgumentParser(description="Create the sample tables and the vector_store table, "
+                                             "with the connection settings from Azure Key Vault.")
+parser.add_argument("--defer-vector-index", action="store_true",
+                    help="Create vector_store without its HNSW index. Loading an empty table and building the "
+                         "index once afterwards is much faster than inserting every row into the index; run "
+                         "again with --build-vector-index after vector_store is loaded.")
+parser.add_argument("--build-vector-index", action="store_true",
+                    help="Only build the indexes of vector_store, after it has been loaded; no table is dropped "
+                         "or created.")
+args = parser.parse_args()
+
 # key_vault_name must be a valid Azure Key Vault name.
 # key_vault_name = "yourKeyVaultNameOnly" # if test locally
 key_vault_name = os.getenv("KEY_VAULT_NAME") 
@@ -140,23 +155,22 @@ try:
     cursor = conn.cursor()
     logging.info("Connection established successfully.")
 
+    if args.build_vector_index:
+        # vector_store is loaded: build its HNSW index once over all of its rows
+        logging.info("Building the 'vector_store' indexes...")
+        start = time.perf_counter()
+        for statement in create_indexes_sql('vector_store', schema_name=None):
+            cursor.execute(statement)
+        conn.commit()
+        logging.info("'vector_store' indexes built in %.2f s.", time.perf_counter() - start)
+        sys.exit(0)
+
     # Drop and recreate the products table
     logging.info("Dropping and recreating the 'products' table...")
     cursor.execute("DROP TABLE IF EXISTS products")
     conn.commit()
 
-    create_products_sql = """
-    CREATE TABLE IF NOT EXISTS products
-    (
-        id integer,
-        product_name character varying(100),
-        price numeric(10,2) NOT NULL,
-        category character varying(50),
-        brand character varying(50),
-        product_description text
-    );
-    """
-    cursor.execute(create_products_sql)
+    cursor.execute(create_table_sql('products', schema_name=None))
     conn.commit()
     logging.info("'products' table created successfully.")
 
@@ -165,22 +179,9 @@ try:
     cursor.execute("DROP TABLE IF EXISTS customers")
     conn.commit()
 
-    create_customers_sql = """
-    CREATE TABLE customers
-    (
-        id integer,
-        first_name character varying(50),
-        last_name character varying(50),
-        gender character varying(10),
-        date_of_birth date,
-        age integer,
-        email character varying(100),
-        phone character varying(20),
-        post_address character varying(255),
-        membership character varying(50)
-    );
-    """
-    cursor.execute(create_customers_sql)
+    cursor.execute(create_table_sql('customers', schema_name=None))
+    for statement in create_indexes_sql('customers', schema_name=None):
+        cursor.execute(statement)
     conn.commit()
     logging.info("'customers' table created successfully.")
 
@@ -189,30 +190,9 @@ try:
     cursor.execute("DROP TABLE IF EXISTS orders")
     conn.commit()
 
-    create_orders_sql = """
-    CREATE TABLE orders
-    (
-        id integer,
-        customer_id integer,
-        customer_first_name character varying(50),
-        customer_last_name character varying(50),
-        customer_gender character varying(10),
-        customer_age integer,
-        customer_email character varying(100),
-        customer_phone character varying(20),
-        order_date date,
-        product_id integer,
-        product_name character varying(100),
-        quantity integer,
-        unit_price numeric(10,2),
-        total numeric(10,2),
-        category character varying(50),
-        brand character varying(50),
-        product_description text,
-        return_status BOOLEAN DEFAULT FALSE
-    );
-    """
-    cursor.execute(create_orders_sql)
+    cursor.execute(create_table_sql('orders', schema_name=None))
+    for statement in create_indexes_sql('orders', schema_name=None):
+        cursor.execute(statement)
     conn.commit()
     logging.info("'orders' table created successfully.")
 
@@ -224,28 +204,17 @@ try:
     cursor.execute("DROP TABLE IF EXISTS vector_store;")
     conn.commit()
 
-    create_vs_sql = """
-    CREATE TABLE IF NOT EXISTS vector_store(
-        id text,
-        title text,
-        chunk integer,
-        chunk_id text,
-        "offset" integer,
-        page_number integer,
-        content text,
-        source text,
-        metadata text,
-        content_vector public.vector(1536)
-    );
-    """
-    cursor.execute(create_vs_sql)
+    cursor.execute(create_table_sql('vector_store', schema_name=None))
     conn.commit()
 
-    cursor.execute(
-        "CREATE INDEX vector_store_content_vector_idx ON vector_store USING hnsw (content_vector vector_cosine_ops);"
-    )
-    conn.commit()
-    logging.info("'vector_store' table and index created successfully.")
+    if args.defer_vector_index:
+        logging.info("'vector_store' table created successfully; build its index with --build-vector-index "
+                     "after it is loaded.")
+    else:
+        for statement in create_indexes_sql('vector_store', schema_name=None):
+            cursor.execute(statement)
+        conn.commit()
+        logging.info("'vector_store' table and index created successfully.")
 
     # Grant permissions to the admin principal if provided
     if postgresql_admin_login and postgresql_admin_login.strip():
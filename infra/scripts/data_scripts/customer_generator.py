@@ -0,0 +1,373 @@
+"""
+Vectorized generator of the sample customers and their retail_simple rows.
+
+The Generate_Customer, Generate_Location, Generate_CustomerAccount and Generate_CustomerTradeName
+notebooks of src/generate_samples build one customer at a time with the global random and
+numpy.random generators seeded with 42, on a single core. Here their rules (customer types and
+tiers, one or two accounts per customer, trade names of business and government customers, one
+address per customer) are applied to whole batches of customers with NumPy, and every batch comes
+out as one DataFrame per table of CUSTOMER_TABLES: the customers table of the sample database and
+the Customer, CustomerAccount, CustomerTradeName and Location tables of the notebooks.
+
+Customers are generated in shards from a seed sequence each (see sharded_generator.py). A shard
+draws the customer types and account counts, which decide how many accounts and trade names it
+has, from a stream of its own; shard_row_counts draws just those, so that the accounts and trade
+names of every shard can be numbered before any shard runs.
+"""
+import os
+
+import numpy as np
+import pandas as pd
+
+from order_generator import END_YEAR, REPO_ROOT
+from schema_registry import TABLE_SCHEMAS
+
+GENERATE_SAMPLES_DIR = os.path.join(REPO_ROOT, "src", "generate_samples")
+NAMES_PATH = os.path.join(GENERATE_SAMPLES_DIR, "input", "customer_names_unique_513.csv")
+
+# Columns of the retail_simple tables, as the Generate_* notebooks write them
+RETAIL_SIMPLE_COLUMNS = {
+    'CustomerRelationshipType': ['CustomerRelationshipTypeId', 'CustomerRelationshipTypeName',
+                                 'CustomerRelationshipTypeDescription'],
+    'Customer': ['CustomerId', 'CustomerTypeId', 'CustomerRelationshipTypeId', 'DateOfBirth', 'CustomerEstablishedDate',
+                 'IsActive', 'FirstName', 'LastName', 'Gender', 'PrimaryPhone', 'SecondaryPhone', 'PrimaryEmail',
+                 'SecondaryEmail', 'CreatedBy'],
+    'CustomerAccount': ['CustomerAccountId', 'ParentAccountId', 'CustomerAccountName', 'CustomerId', 'IsoCurrencyCode'],
+    'CustomerTradeName': ['CustomerId', 'CustomerTypeId', 'TradeNameId', 'TradeName', 'PeriodStartDate',
+                          'PeriodEndDate', 'CustomerTradeNameNote'],
+    'Location': ['LocationId', 'CustomerId', 'LocationName', 'IsActive', 'AddressLine1', 'AddressLine2', 'City',
+                 'StateId', 'ZipCode', 'CountryId', 'SubdivisionName', 'Region', 'Latitude', 'Longitude', 'Note'],
+}
+
+# Tables generated per customer, in one pass over the customers
+CUSTOMER_TABLES = ['customers', 'Customer', 'CustomerAccount', 'CustomerTradeName', 'Location']
+
+# Share of each membership among the sample customers
+MEMBERSHIP_WEIGHTS = {'Base': 21, 'Gold': 13, 'Platinum': 9}
+
+# Customer types and, per type, its relationship tiers with their probabilities (Generate_Customer)
+CUSTOMER_TYPES = {'Individual': 0.7, 'Business': 0.2, 'Government': 0.1}
+RELATIONSHIP_TIERS = {
+    'Individual': {'Standard': 0.45, 'Premium': 0.40, 'VIP': 0.15},
+    'Business': {'SMB': 0.60, 'Premier': 0.30, 'Partner': 0.10},
+    'Government': {'Local': 0.50, 'State': 0.35, 'Federal': 0.15},
+}
+
+# Share of active customers per relationship tier (the rest: STANDARD_ACTIVE_RATE)
+TIER_ACTIVE_RATES = {'VIP': 0.98, 'Premier': 0.98, 'Partner': 0.98, 'Federal': 0.98, 'Premium': 0.96, 'State': 0.96}
+STANDARD_ACTIVE_RATE = 0.94
+
+# Age range in years at which customers of each type become customers, and the period they do
+ESTABLISHED_AGES = {'Individual': (19, 70), 'Business': (25, 65), 'Government': (28, 60)}
+FIRST_ESTABLISHED_DATE = np.datetime64("2018-01-01", "D")
+LAST_ESTABLISHED_DATE = np.datetime64("2021-12-31", "D")
+
+# Birth dates are drawn from ages as of this day, the last possible order date, so that the
+# age of every customer is the same in all of their orders
+AGE_REFERENCE_DATE = np.datetime64("%d-12-31" % END_YEAR, "D")
+
+# Trade names of business and government customers (Generate_CustomerTradeName)
+TRADE_NAMES = {
+    'Business': [
+        "Contoso Corp", "Contoso Industries", "Contoso Solutions", "Contoso Enterprises",
+        "Contoso Manufacturing", "Contoso Technology", "Contoso Services", "Contoso Group",
+        "Fabrikam Inc", "Fabrikam Systems", "Fabrikam Group", "Fabrikam Technologies",
+        "Fabrikam Manufacturing", "Fabrikam Solutions", "Fabrikam Services", "Fabrikam Industries",
+    ],
+    'Government': [
+        "Planet Mars Authority", "Jupiter Department of Commerce", "Saturn Municipal Services",
+        "Venus Regional Office", "Neptune State Agency", "Mercury City Government",
+        "Uranus Federal Bureau", "Pluto District Office", "Europa Space Authority",
+        "Titan Regional Services", "Ganymede Municipal Office", "Callisto State Department",
+    ],
+}
+
+# Area codes of the fictitious 555-01xx / 555-02xx phone numbers (Generate_Customer)
+AREA_CODES = [
+    201, 202, 203, 205, 206, 207, 208, 209, 210, 212, 213, 214, 215, 216, 217, 218, 219, 224, 225, 228, 229,
+    231, 234, 239, 240, 248, 251, 252, 253, 254, 256, 260, 262, 267, 269, 270, 276, 281, 301, 302, 303, 304,
+    305, 307, 308, 309, 310, 312, 313, 314, 315, 316, 317, 318, 319, 320, 321, 323, 325, 330, 331, 334, 336,
+    337, 339, 341, 347, 351, 352, 360, 361, 364, 380, 385, 386, 401, 402, 404, 405, 406, 407, 408, 409, 410,
+    412, 413, 414, 415, 417, 419, 423, 424, 425, 430, 432, 434, 435, 440, 443, 458, 463, 464, 469, 470, 475,
+    478, 479, 480, 484, 501, 502, 503, 504, 505, 507, 508, 509, 510, 512, 513, 515, 516, 517, 518, 520, 530,
+    540, 541, 551, 559, 561, 562, 563, 564, 567, 570, 571, 573, 574, 575, 580, 585, 586, 601, 602, 603, 605,
+    606, 607, 608, 609, 610, 612, 614, 615, 616, 617, 618, 619, 620, 623, 626, 628, 630, 631, 636, 641, 646,
+    650, 651, 657, 660, 661, 662, 667, 678, 682, 701, 702, 703, 704, 706, 707, 708, 712, 713, 714, 715, 716,
+    717, 718, 719, 720, 724, 725, 727, 731, 732, 734, 737, 740, 747, 754, 757, 760, 762, 763, 765, 769, 770,
+    772, 773, 774, 775, 781, 785, 786, 801, 802, 803, 804, 805, 806, 808, 810, 812, 813, 814, 815, 816, 817,
+    818, 828, 830, 831, 832, 843, 845, 847, 848, 850, 856, 857, 858, 859, 860, 862, 863, 864, 865, 870, 872,
+    878, 901, 903, 904, 906, 907, 908, 909, 910, 912, 913, 914, 915, 916, 917, 918, 919, 920, 925, 928, 929,
+    930, 931, 934, 936, 937, 940, 941, 947, 949, 951, 952, 954, 956, 959, 970, 971, 972, 973, 978, 979, 980,
+    984, 985, 989,
+]
+
+# Streets, cities and made-up zip codes of the customer addresses (Generate_Location)
+STREET_NAMES = [
+    "Main St", "Oak Ave", "First St", "Second St", "Third St", "Park Ave", "Elm St", "Maple St",
+    "Cedar St", "Pine St", "Church St", "Washington St", "Lincoln Ave", "Madison Ave", "Jefferson St",
+    "Adams St", "Jackson St", "Franklin St", "Roosevelt Ave", "Wilson St", "Market St", "Broad St",
+    "Center St", "High St", "Union St", "Spring St", "Water St", "Mill St", "State St", "School St",
+    "Hill St", "Valley Rd", "River Rd", "Lake St", "Sunset Ave", "Sunrise Ave", "Forest Ave",
+    "Garden St", "College Ave", "University Dr", "Liberty St", "Commerce St", "Industrial Dr",
+    "Business Park Way", "Technology Blvd", "Corporate Dr", "Executive Ave", "Summit St",
+    "Mountain View Dr", "Hillside Ave", "Riverside Dr", "Meadow Ln", "Woodland Ave",
+]
+CITIES = [
+    ("Seattle", "WA", "West Coast"), ("Portland", "OR", "West Coast"),
+    ("San Francisco", "CA", "West Coast"), ("Los Angeles", "CA", "West Coast"),
+    ("Sacramento", "CA", "West Coast"), ("San Jose", "CA", "West Coast"),
+    ("San Diego", "CA", "West Coast"), ("Long Beach", "CA", "West Coast"), ("Oakland", "CA", "West Coast"),
+    ("Denver", "CO", "Mountain West"), ("Salt Lake City", "UT", "Mountain West"),
+    ("Phoenix", "AZ", "Mountain West"), ("Tucson", "AZ", "Mountain West"),
+    ("Las Vegas", "NV", "Mountain West"), ("Albuquerque", "NM", "Mountain West"),
+    ("Austin", "TX", "South"), ("Dallas", "TX", "South"), ("Houston", "TX", "South"),
+    ("San Antonio", "TX", "South"), ("Atlanta", "GA", "South"), ("Miami", "FL", "South"),
+    ("Orlando", "FL", "South"), ("Tampa", "FL", "South"), ("Jacksonville", "FL", "South"),
+    ("Charlotte", "NC", "South"), ("Raleigh", "NC", "South"), ("Nashville", "TN", "South"),
+    ("Richmond", "VA", "South"), ("Oklahoma City", "OK", "South"),
+    ("Chicago", "IL", "Midwest"), ("Minneapolis", "MN", "Midwest"), ("Detroit", "MI", "Midwest"),
+    ("Columbus", "OH", "Midwest"), ("Cleveland", "OH", "Midwest"), ("Cincinnati", "OH", "Midwest"),
+    ("Indianapolis", "IN", "Midwest"), ("Milwaukee", "WI", "Midwest"),
+    ("Kansas City", "MO", "Midwest"), ("St. Louis", "MO", "Midwest"),
+    ("Boston", "MA", "Northeast"), ("New York", "NY", "Northeast"), ("Buffalo", "NY", "Northeast"),
+    ("Albany", "NY", "Northeast"), ("Syracuse", "NY", "Northeast"), ("Rochester", "NY", "Northeast"),
+    ("Pittsburgh", "PA", "Northeast"), ("Philadelphia", "PA", "Northeast"),
+    ("Baltimore", "MD", "Northeast"), ("Washington", "DC", "Northeast"),
+]
+ZIP_CODES = [
+    "12345", "54321", "98765", "56789", "13579", "24680", "97531", "86420", "15975", "35791",
+    "23456", "34567", "45678", "67890", "78901", "89012", "91234", "12567", "23678", "34789",
+    "45890", "56123", "67234", "78345", "89456", "91567", "12678", "23789", "34890", "45912",
+    "56234", "67345", "78456", "89567", "91678", "12789", "23890", "34912", "45123", "56345",
+    "67456", "78567", "89678", "91789", "12890", "23912", "34123", "45234", "56456", "67567",
+    "78678", "89789", "91890", "12123", "23234", "34345", "45456", "56567", "67678", "78789",
+]
+
+def choose(rng, weights, size):
+    """
+    Draws size keys of a {key: weight} dict in proportion to their weights.
+    """
+    keys = list(weights)
+    p = np.array([weights[key] for key in keys], dtype='float64')
+    return np.array(keys, dtype=object)[rng.choice(len(keys), size=size, p=p / p.sum())]
+
+def format_ids(prefix, numbers, width):
+    """
+    Formats numbers as notebook-style keys, e.g. CID-001 or CA-0001.
+    """
+    return ["%s-%0*d" % (prefix, width, number) for number in numbers]
+
+def date_strings(days, date_format=None):
+    """
+    Formats datetime64[D] values as ISO dates or with date_format; NaT becomes None.
+    """
+    if date_format is not None:
+        return pd.DatetimeIndex(days).strftime(date_format).to_numpy(dtype=object)
+    strings = np.datetime_as_string(days, unit='D').astype(object)
+    strings[np.isnat(days)] = None
+    return strings
+
+def table_columns(table_name):
+    return RETAIL_SIMPLE_COLUMNS.get(table_name) or TABLE_SCHEMAS[table_name].column_names
+
+def birth_dates(rng, count):
+    """
+    Draws birth dates for ages 23 to 75 (90%) or 76 to 100 (10%) as of AGE_REFERENCE_DATE.
+    Returns (birth dates, ages).
+    """
+    ages = np.where(rng.random(count) < 0.9, rng.integers(23, 76, count), rng.integers(76, 101, count))
+    first_days = (AGE_REFERENCE_DATE.astype('datetime64[Y]') - ages).astype('datetime64[D]')
+    year_days = ((first_days.astype('datetime64[Y]') + 1).astype('datetime64[D]') - first_days).astype('int64')
+    return first_days + (rng.random(count) * year_days).astype('int64'), ages
+
+def established_dates(rng, dob, customer_types):
+    """
+    Draws the date each customer was established, within the age range of its customer type
+    and the establishment period, or anywhere in the period when the two do not overlap.
+    """
+    min_age = np.array([ESTABLISHED_AGES[t][0] for t in customer_types])
+    max_age = np.array([ESTABLISHED_AGES[t][1] for t in customer_types])
+    first = np.maximum(dob + min_age * 365, FIRST_ESTABLISHED_DATE)
+    last = np.minimum(dob + max_age * 365, LAST_ESTABLISHED_DATE)
+    overlap = first <= last
+    first = np.where(overlap, first, FIRST_ESTABLISHED_DATE)
+    last = np.where(overlap, last, LAST_ESTABLISHED_DATE)
+    days = (last - first).astype('int64') + 1
+    return first + (rng.random(len(dob)) * days).astype('int64')
+
+def phones(rng, count, exchange):
+    """
+    Draws count fictitious phone numbers (area code) 555-<exchange>xx.
+    """
+    return ["(%d) 555-%s%02d" % (area, exchange, last) for area, last in
+            zip(np.array(AREA_CODES).take(rng.integers(0, len(AREA_CODES), count)), rng.integers(0, 100, count))]
+
+def draw_structure(rng, count):
+    """
+    Draws the customer type of count customers and whether each has two accounts, which decide
+    how many CustomerAccount and CustomerTradeName rows they have.
+    """
+    return choose(rng, CUSTOMER_TYPES, count), rng.random(count) < 0.8
+
+def shard_streams(seed_sequence):
+    """
+    Returns the random generators of a shard of customers: one for draw_structure and one for
+    every other value.
+    """
+    structure, values = seed_sequence.spawn(2)
+    return np.random.default_rng(structure), np.random.default_rng(values)
+
+def shard_row_counts(seed_sequence, count):
+    """
+    Returns the number of CustomerAccount and CustomerTradeName rows of a shard of count
+    customers, drawing only their structure.
+    """
+    customer_types, two_accounts = draw_structure(shard_streams(seed_sequence)[0], count)
+    return count + int(two_accounts.sum()), int((customer_types != 'Individual').sum())
+
+def generate_customer_chunk(rng, names, first_id, customer_types, two_accounts, first_account_number,
+                            first_trade_name_number):
+    """
+    Generates customers with ids first_id.. and their retail_simple rows, one per element of
+    customer_types and two_accounts (see draw_structure). Accounts and trade names are numbered
+    from first_account_number and first_trade_name_number.
+    Returns {table name: DataFrame} of the CUSTOMER_TABLES.
+    """
+    count = len(customer_types)
+    ids = np.arange(first_id, first_id + count)
+    customer_ids = format_ids("CID", ids, 3)
+    first_names = names['FirstName'].to_numpy(dtype=object)
+    genders = names['Gender'].to_numpy(dtype=object)
+    name_index = rng.integers(0, len(names), count)
+    first_name = first_names[name_index]
+    last_name = names['LastName'].to_numpy(dtype=object)[rng.integers(0, len(names), count)]
+    gender = genders[name_index]
+    dob, ages = birth_dates(rng, count)
+    # The id makes every email unique, so that customers can be looked up by email
+    email = ["%s.%s%d@example.com" % (first, last.replace(" ", ""), number)
+             for first, last, number in zip(first_name, last_name, ids)]
+    primary_phone = phones(rng, count, "01")
+
+    # Addresses (Generate_Location)
+    street = np.array(STREET_NAMES, dtype=object)[rng.integers(0, len(STREET_NAMES), count)]
+    city_index = rng.integers(0, len(CITIES), count)
+    city, state, region = (np.array([c[i] for c in CITIES], dtype=object)[city_index] for i in range(3))
+    zip_code = np.array(ZIP_CODES, dtype=object)[rng.integers(0, len(ZIP_CODES), count)]
+    address_line1 = ["%d %s" % (999 + number, name) for number, name in zip(ids, street)]
+    apartment = rng.random(count) < 0.1
+    unit = rng.integers(0, 1000, count)
+    address_line2 = [("Suite %d" % (100 + number % 900) if "Ave" in name or "Dr" in name else "Apt %d" % (1 + number % 50))
+                     if flag else "" for flag, number, name in zip(apartment, unit, street)]
+
+    customers = pd.DataFrame({
+        'id': ids,
+        'first_name': first_name,
+        'last_name': last_name,
+        'gender': gender,
+        'date_of_birth': date_strings(dob, TABLE_SCHEMAS['customers'].column('date_of_birth').date_format),
+        'age': ages,
+        'email': email,
+        'phone': primary_phone,
+        'post_address': ["%s, %s,%s %s" % values for values in zip(address_line1, city, state, zip_code)],
+        'membership': choose(rng, MEMBERSHIP_WEIGHTS, count),
+    })
+
+    # Customer (Generate_Customer)
+    tiers = np.empty(count, dtype=object)
+    for customer_type, weights in RELATIONSHIP_TIERS.items():
+        of_type = customer_types == customer_type
+        tiers[of_type] = choose(rng, weights, int(of_type.sum()))
+    active_rates = np.array([TIER_ACTIVE_RATES.get(tier, STANDARD_ACTIVE_RATE) for tier in tiers])
+    services_rates = np.where(customer_types == 'Government', 0.9, 0.1)
+    secondary_phone = np.where(rng.random(count) < 0.3, phones(rng, count, "02"), None)
+    secondary_email = [("%s@fabrikam.com" % first.lower()) if flag else None
+                       for first, flag in zip(first_name, rng.random(count) < 0.15)]
+    customer = pd.DataFrame({
+        'CustomerId': customer_ids,
+        'CustomerTypeId': customer_types,
+        'CustomerRelationshipTypeId': tiers,
+        'DateOfBirth': date_strings(dob),
+        'CustomerEstablishedDate': date_strings(established_dates(rng, dob, customer_types)),
+        'IsActive': rng.random(count) < active_rates,
+        'FirstName': first_name,
+        'LastName': last_name,
+        'Gender': gender,
+        'PrimaryPhone': primary_phone,
+        'SecondaryPhone': secondary_phone,
+        'PrimaryEmail': email,
+        'SecondaryEmail': secondary_email,
+        'CreatedBy': np.where(rng.random(count) < services_rates, 'Services', 'Sales'),
+    })
+
+    # CustomerAccount (Generate_CustomerAccount): 80% of the customers have a Fabric (PA-1) and an
+    # ADB (PA-2) account, the others one of the two, 70% Fabric
+    single_fabric = rng.random(count) < 0.7
+    accounts_per_customer = np.where(two_accounts, 2, 1)
+    owner = np.repeat(np.arange(count), accounts_per_customer)
+    position = np.arange(len(owner)) - np.repeat(np.cumsum(accounts_per_customer) - accounts_per_customer,
+                                                 accounts_per_customer)
+    fabric = np.where(two_accounts[owner], position == 0, single_fabric[owner])
+    account = pd.DataFrame({
+        'CustomerAccountId': format_ids("CA", np.arange(first_account_number, first_account_number + len(owner)), 4),
+        'ParentAccountId': np.where(fabric, "PA-1", "PA-2"),
+        'CustomerAccountName': np.where(fabric, "Fabric", "ADB"),
+        'CustomerId': np.array(customer_ids, dtype=object)[owner],
+        'IsoCurrencyCode': "USD",
+    })
+
+    # CustomerTradeName (Generate_CustomerTradeName): one per business and government customer,
+    # 5% of them ended 1 to 3 years after they started
+    holder = np.flatnonzero(customer_types != 'Individual')
+    holder_types = customer_types[holder]
+    trade_names = np.empty(len(holder), dtype=object)
+    for customer_type, names_of_type in TRADE_NAMES.items():
+        of_type = holder_types == customer_type
+        trade_names[of_type] = np.array(names_of_type, dtype=object)[rng.integers(0, len(names_of_type), int(of_type.sum()))]
+    start = FIRST_ESTABLISHED_DATE + rng.integers(0, 1461, len(holder))
+    end = np.where(rng.random(len(holder)) < 0.05, start + rng.integers(365, 1096, len(holder)), np.datetime64("NaT"))
+    trade_name = pd.DataFrame({
+        'CustomerId': np.array(customer_ids, dtype=object)[holder],
+        'CustomerTypeId': holder_types,
+        'TradeNameId': format_ids("TN", np.arange(first_trade_name_number, first_trade_name_number + len(holder)), 3),
+        'TradeName': trade_names,
+        'PeriodStartDate': date_strings(start),
+        'PeriodEndDate': date_strings(end.astype('datetime64[D]')),
+        'CustomerTradeNameNote': ["Generated %s trade name for compliance testing" % t.lower() for t in holder_types],
+    })
+
+    location = pd.DataFrame({
+        'LocationId': format_ids("LOC", ids, 3),
+        'CustomerId': customer_ids,
+        'LocationName': "Street Address",
+        'IsActive': rng.random(count) < 0.995,
+        'AddressLine1': address_line1,
+        'AddressLine2': address_line2,
+        'City': city,
+        'StateId': state,
+        'ZipCode': zip_code,
+        'CountryId': "US",
+        'SubdivisionName': "",
+        'Region': region,
+        'Latitude': np.round(rng.uniform(24.0, 49.0, count), 7),
+        'Longitude': np.round(rng.uniform(-125.0, -66.0, count), 7),
+        'Note': "Generated sample address",
+    })
+    return {'customers': customers, 'Customer': customer, 'CustomerAccount': account,
+            'CustomerTradeName': trade_name, 'Location': location}
+
+def generate_customer_batches(names, count, first_id, seed_sequence, first_account_number, first_trade_name_number,
+                              batch_rows):
+    """
+    Generates a shard of count customers with ids first_id.. from its seed sequence, in batches
+    of batch_rows customers. Accounts and trade names are numbered on from first_account_number
+    and first_trade_name_number. Yields {table name: DataFrame} of the CUSTOMER_TABLES per batch.
+    """
+    structure_rng, rng = shard_streams(seed_sequence)
+    customer_types, two_accounts = draw_structure(structure_rng, count)
+    for start in range(0, count, batch_rows):
+        stop = min(count, start + batch_rows)
+        batch = generate_customer_chunk(rng, names, first_id + start, customer_types[start:stop],
+                                        two_accounts[start:stop], first_account_number, first_trade_name_number)
+        first_account_number += len(batch['CustomerAccount'])
+        first_trade_name_number += len(batch['CustomerTradeName'])
+        yield batch
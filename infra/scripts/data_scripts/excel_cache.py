@@ -0,0 +1,151 @@
+"""
+Content-addressed Parquet cache for Excel inputs.
+
+Parsing .xlsx files with openpyxl is much slower than reading a columnar file, so each
+sheet is converted to a typed Parquet file the first time it is read. The cache key is the
+SHA-256 of the workbook bytes plus the sheet name: an edited workbook gets a new entry
+and a renamed or copied one reuses the old entry.
+
+pyarrow is optional. Without it read_excel_cached falls back to pd.read_excel.
+
+Warm the cache for the sample data and the archived SalesLT / retail_simple workbooks with:
+    python excel_cache.py
+"""
+import argparse
+import glob
+import hashlib
+import logging
+import os
+import sys
+
+import pandas as pd
+
+try:
+    import pyarrow  # noqa: F401 - only needed by DataFrame.to_parquet / pd.read_parquet
+except ImportError:
+    pyarrow = None
+
+logger = logging.getLogger(__name__)
+
+# Bump when the conversion below changes, so entries written by older versions are ignored.
+CACHE_FORMAT_VERSION = 1
+
+# Cache directory, overridable with the EXCEL_CACHE_DIR environment variable
+DEFAULT_CACHE_DIR = os.environ.get(
+    "EXCEL_CACHE_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), ".excel_cache"))
+
+REPO_ROOT = os.path.normpath(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", ".."))
+
+# Workbooks warmed by default when the module is run as a script
+DEFAULT_WARM_PATHS = [
+    os.path.join(REPO_ROOT, "infra", "scripts", "_create_postgresql_sample_data", "_python_data_scripts", "sample_data"),
+    os.path.join(REPO_ROOT, "infra", "data"),
+    os.path.join(REPO_ROOT, "archives", "_old_sample_data", "SalesLT"),
+    os.path.join(REPO_ROOT, "archives", "_old_sample_data", "retail_simple_headers_xlsx"),
+    os.path.join(REPO_ROOT, "archives", "_old_sample_data", "retail_simple_samples"),
+]
+
+def file_sha256(path):
+    """
+    Returns the SHA-256 hex digest of a file, read in blocks.
+    """
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+def cache_path(file_hash, sheet_name, cache_dir=None):
+    """
+    Returns the cache file of one sheet of the workbook with the given content hash.
+    """
+    key = hashlib.sha256(("%d\0%s\0%s" % (CACHE_FORMAT_VERSION, file_hash, sheet_name)).encode("utf-8")).hexdigest()
+    return os.path.join(cache_dir or DEFAULT_CACHE_DIR, key[:2], key + ".parquet")
+
+def normalize_mixed_columns(df):
+    """
+    Converts object columns that mix value types (e.g. numbers and text in one Excel column)
+    to text, since a Parquet column has a single type. Missing values stay missing.
+    """
+    for column in df.columns[df.dtypes == object]:
+        values = df[column]
+        types = set(type(value) for value in values[values.notna()])
+        if len(types) > 1:
+            df[column] = values.map(lambda value: str(value) if pd.notna(value) else None)
+    return df
+
+def write_cache_file(df, path):
+    """
+    Writes a DataFrame to a cache file atomically, so a partial file is never read.
+    """
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    partial_path = "%s.%d.partial" % (path, os.getpid())
+    df.to_parquet(partial_path, index=False)
+    os.replace(partial_path, path)
+
+def read_excel_cached(xlsx_file_path, sheet_name=0, cache_dir=None):
+    """
+    Reads one sheet of an Excel workbook into a DataFrame, from the Parquet cache when the
+    workbook content was seen before. On a miss the sheet is read with pd.read_excel and cached.
+    """
+    if pyarrow is None:
+        return pd.read_excel(xlsx_file_path, sheet_name=sheet_name)
+    path = cache_path(file_sha256(xlsx_file_path), sheet_name, cache_dir)
+    if os.path.exists(path):
+        logger.info("Excel cache hit for %s [%s].", xlsx_file_path, sheet_name)
+        return pd.read_parquet(path)
+    logger.info("Excel cache miss for %s [%s]; converting.", xlsx_file_path, sheet_name)
+    df = normalize_mixed_columns(pd.read_excel(xlsx_file_path, sheet_name=sheet_name))
+    write_cache_file(df, path)
+    return df
+
+def warm_workbook(xlsx_file_path, cache_dir=None):
+    """
+    Caches every sheet of a workbook, under its sheet name. Returns the number of sheets converted.
+    """
+    file_hash = file_sha256(xlsx_file_path)
+    with pd.ExcelFile(xlsx_file_path) as workbook:
+        missing = [sheet for sheet in workbook.sheet_names if not os.path.exists(cache_path(file_hash, sheet, cache_dir))]
+        for sheet in missing:
+            write_cache_file(normalize_mixed_columns(workbook.parse(sheet)), cache_path(file_hash, sheet, cache_dir))
+    return len(missing)
+
+def iter_workbooks(paths):
+    """
+    Yields the .xlsx files among the given files and (recursively) directories.
+    """
+    for path in paths:
+        if os.path.isdir(path):
+            for xlsx_file_path in sorted(glob.glob(os.path.join(path, "**", "*.xlsx"), recursive=True)):
+                yield xlsx_file_path
+        else:
+            yield path
+
+def main():
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(levelname)s - %(message)s',
+        handlers=[logging.StreamHandler(sys.stdout)]
+    )
+    parser = argparse.ArgumentParser(description="Convert Excel workbooks to the Parquet cache ahead of time.")
+    parser.add_argument("paths", nargs="*", default=DEFAULT_WARM_PATHS,
+                        help="Workbooks or directories of workbooks to cache (default: the sample data and archives).")
+    parser.add_argument("--cache-dir", default=DEFAULT_CACHE_DIR, help="Directory of the cache files.")
+    args = parser.parse_args()
+
+    if pyarrow is None:
+        logger.error("pyarrow is required to write the Excel cache: pip install pyarrow")
+        sys.exit(1)
+
+    for xlsx_file_path in iter_workbooks(args.paths):
+        # Skip Excel lock files such as ~$Product.xlsx
+        if os.path.basename(xlsx_file_path).startswith("~$"):
+            continue
+        try:
+            converted = warm_workbook(xlsx_file_path, args.cache_dir)
+            logger.info("%s: %d sheets converted.", os.path.relpath(xlsx_file_path, REPO_ROOT), converted)
+        except Exception as e:
+            logger.error("Failed to cache %s: %s", xlsx_file_path, e)
+
+if __name__ == "__main__":
+    main()
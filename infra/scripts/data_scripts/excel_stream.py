@@ -0,0 +1,61 @@
+"""
+Streaming reader for large Excel workbooks.
+
+pd.read_excel builds the whole workbook in memory before the first row is available.
+Here a sheet is read in openpyxl read-only mode, which parses the sheet XML as it goes,
+and the rows are yielded as typed DataFrame batches that go straight to the bulk-load
+path. Memory stays proportional to the batch size, not to the workbook size.
+"""
+import logging
+import time
+
+import openpyxl
+import pandas as pd
+
+from bulk_load import DEFAULT_CHUNK_ROWS, LoadResult, insert_dataframe
+
+logger = logging.getLogger(__name__)
+
+def iter_excel_batches(xlsx_file_path, sheet_name, batch_rows=DEFAULT_CHUNK_ROWS):
+    """
+    Yields the rows of a sheet as DataFrames of at most batch_rows rows. The first row is the
+    header (whitespace stripped from the names); fully empty rows are skipped. Cell values keep
+    the types openpyxl reads them with (numbers, dates, booleans, text).
+    """
+    workbook = openpyxl.load_workbook(xlsx_file_path, read_only=True, data_only=True)
+    try:
+        rows = workbook[sheet_name].iter_rows(values_only=True)
+        header = next(rows, None)
+        if header is None:
+            return
+        columns = [str(name).strip() if name is not None else "" for name in header]
+        batch = []
+        for row in rows:
+            if all(value is None for value in row):
+                continue
+            # Read-only sheets can have ragged rows; pad or cut them to the header width
+            batch.append(tuple(row[:len(columns)]) + (None,) * (len(columns) - len(row)))
+            if len(batch) >= batch_rows:
+                yield pd.DataFrame.from_records(batch, columns=columns)
+                batch = []
+        if batch:
+            yield pd.DataFrame.from_records(batch, columns=columns)
+    finally:
+        workbook.close()
+
+def load_table_from_excel(cursor, table_name, xlsx_file_path, sheet_name, columns=None, batch_rows=DEFAULT_CHUNK_ROWS):
+    """
+    Streams one sheet of a workbook into a table, one set-based INSERT batch per batch_rows rows.
+    Returns a LoadResult.
+    """
+    start = time.perf_counter()
+    total_rows = 0
+    transfer_seconds = 0.0
+    for df in iter_excel_batches(xlsx_file_path, sheet_name, batch_rows):
+        transfer_start = time.perf_counter()
+        total_rows += insert_dataframe(cursor, table_name, df, columns)
+        transfer_seconds += time.perf_counter() - transfer_start
+    seconds = time.perf_counter() - start
+    result = LoadResult(table_name, total_rows, seconds, parse_seconds=seconds - transfer_seconds)
+    logger.info("Data streamed from Excel: %s.", result)
+    return result
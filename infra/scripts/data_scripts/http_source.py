@@ -0,0 +1,217 @@
+"""
+HTTP source fetcher with a local cache for the CSV files loaded from --baseUrl.
+
+Each URL is cached as one body file plus a JSON file with the validators the server sent
+(ETag, Last-Modified). A later fetch of the same URL sends them back as If-None-Match /
+If-Modified-Since, and a 304 Not Modified reuses the cached body without downloading it again.
+Requests ask for gzip transfer encoding; gzip responses are decompressed as they are read.
+
+open_url streams a response straight to the caller while it is written to the cache, so a
+load does not wait for the download to finish. prefetch_urls downloads several URLs concurrently.
+
+Any HTTP server works, including a local one:
+    python -m http.server 8000 --directory /path/to/repo
+    python http_source.py http://localhost:8000/infra/data/postgresql_db_sample_data/products.csv
+"""
+import argparse
+import hashlib
+import io
+import json
+import logging
+import os
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+import zlib
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+# Cache directory, overridable with the SOURCE_CACHE_DIR environment variable
+DEFAULT_CACHE_DIR = os.environ.get(
+    "SOURCE_CACHE_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), ".source_cache"))
+
+# Seconds to wait for the server to respond
+DEFAULT_TIMEOUT = 60
+
+# Bytes read from the response per block
+BLOCK_SIZE = 1024 * 1024
+
+# Result of fetching one URL: the local body file, the bytes received over the network
+# (0 when the cached copy was still valid), the wall time, and whether the cache was used.
+FetchResult = namedtuple("FetchResult", ["url", "path", "bytes", "seconds", "cached"])
+
+def is_url(path):
+    return path.startswith(("http://", "https://"))
+
+def cache_paths(url, cache_dir=None):
+    """
+    Returns the (body, metadata) cache files of a URL. The body keeps the file name of the
+    URL, so its extension still tells the file type.
+    """
+    key = hashlib.sha256(url.encode("utf-8")).hexdigest()
+    name = os.path.basename(url.split("?")[0]) or "index"
+    directory = os.path.join(cache_dir or DEFAULT_CACHE_DIR, key[:2])
+    return os.path.join(directory, "%s-%s" % (key[:16], name)), os.path.join(directory, key + ".json")
+
+def read_metadata(url, cache_dir=None):
+    """
+    Returns the cached metadata of a URL, or None if there is no complete cache entry.
+    """
+    body_path, metadata_path = cache_paths(url, cache_dir)
+    try:
+        with open(metadata_path, encoding="utf-8") as f:
+            metadata = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if metadata.get("url") != url or not os.path.exists(body_path):
+        return None
+    return metadata
+
+def partial_path(path):
+    """
+    Returns a temporary path next to path, unique to this process and thread.
+    """
+    return "%s.%d.%d.partial" % (path, os.getpid(), threading.get_ident())
+
+class CachingResponse(io.RawIOBase):
+    """
+    Readable byte stream over an HTTP response that decompresses gzip content and copies
+    what is read into the cache. The cache entry is only committed once the whole response
+    was read; a stream closed early leaves the previous entry in place.
+    """
+    def __init__(self, response, url, cache_dir=None):
+        super().__init__()
+        self.url = url
+        self.bytes = 0
+        self._response = response
+        self._body_path, self._metadata_path = cache_paths(url, cache_dir)
+        gzipped = response.headers.get("Content-Encoding", "").lower() == "gzip"
+        self._decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS) if gzipped else None
+        self._metadata = {
+            "url": url,
+            "etag": response.headers.get("ETag"),
+            "last_modified": response.headers.get("Last-Modified"),
+        }
+        self._pending = b""
+        self._eof = False
+        os.makedirs(os.path.dirname(self._body_path), exist_ok=True)
+        self._partial_path = partial_path(self._body_path)
+        self._cache_file = open(self._partial_path, "wb")
+
+    def readable(self):
+        return True
+
+    def _fill(self):
+        while not self._pending and not self._eof:
+            block = self._response.read(BLOCK_SIZE)
+            self.bytes += len(block)
+            if block:
+                self._pending = self._decompressor.decompress(block) if self._decompressor else block
+            else:
+                self._eof = True
+                if self._decompressor:
+                    self._pending = self._decompressor.flush()
+
+    def readinto(self, buffer):
+        self._fill()
+        if not self._pending:
+            self._commit()
+            return 0
+        size = min(len(buffer), len(self._pending))
+        buffer[:size] = self._pending[:size]
+        self._cache_file.write(self._pending[:size])
+        self._pending = self._pending[size:]
+        return size
+
+    def _commit(self):
+        if self._cache_file is None:
+            return
+        self._cache_file.close()
+        self._cache_file = None
+        os.replace(self._partial_path, self._body_path)
+        metadata_partial_path = partial_path(self._metadata_path)
+        with open(metadata_partial_path, "w", encoding="utf-8") as f:
+            json.dump(self._metadata, f)
+        os.replace(metadata_partial_path, self._metadata_path)
+
+    def close(self):
+        if self._cache_file is not None:
+            self._cache_file.close()
+            self._cache_file = None
+            os.remove(self._partial_path)
+        self._response.close()
+        super().close()
+
+def open_url(url, cache_dir=None, timeout=DEFAULT_TIMEOUT):
+    """
+    Opens a URL as a binary stream, validating the cached copy with the server first.
+    Returns the cached body file when the server answers 304 Not Modified; otherwise a
+    CachingResponse that streams the new content and stores it in the cache as it is read.
+    """
+    request = urllib.request.Request(url, headers={"Accept-Encoding": "gzip"})
+    metadata = read_metadata(url, cache_dir)
+    if metadata:
+        if metadata.get("etag"):
+            request.add_header("If-None-Match", metadata["etag"])
+        if metadata.get("last_modified"):
+            request.add_header("If-Modified-Since", metadata["last_modified"])
+    try:
+        response = urllib.request.urlopen(request, timeout=timeout)
+    except urllib.error.HTTPError as e:
+        if e.code == 304 and metadata:
+            e.close()
+            logger.info("Source cache hit for %s.", url)
+            return open(cache_paths(url, cache_dir)[0], "rb")
+        raise
+    return io.BufferedReader(CachingResponse(response, url, cache_dir), BLOCK_SIZE)
+
+def fetch_url(url, cache_dir=None, timeout=DEFAULT_TIMEOUT):
+    """
+    Makes sure the cache holds the current content of a URL. Returns a FetchResult.
+    """
+    start = time.perf_counter()
+    with open_url(url, cache_dir, timeout) as source:
+        response = source.raw
+        cached = not isinstance(response, CachingResponse)
+        if not cached:
+            while source.read(BLOCK_SIZE):
+                pass
+    return FetchResult(url, cache_paths(url, cache_dir)[0], 0 if cached else response.bytes,
+                       time.perf_counter() - start, cached)
+
+def prefetch_urls(urls, cache_dir=None, parallel=4, timeout=DEFAULT_TIMEOUT):
+    """
+    Fetches the given URLs concurrently with up to `parallel` threads.
+    Returns a dict of URL -> FetchResult; raises the first download error.
+    """
+    urls = list(dict.fromkeys(urls))
+    if not urls:
+        return {}
+    with ThreadPoolExecutor(max_workers=max(1, min(parallel, len(urls)))) as executor:
+        results = list(executor.map(lambda url: fetch_url(url, cache_dir, timeout), urls))
+    for result in results:
+        logger.info("Fetched %s: %s in %.2f s.", result.url,
+                    "cached copy still valid" if result.cached else "%d bytes" % result.bytes, result.seconds)
+    return {result.url: result for result in results}
+
+def main():
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(levelname)s - %(message)s',
+        handlers=[logging.StreamHandler(sys.stdout)]
+    )
+    parser = argparse.ArgumentParser(description="Download source files into the local source cache.")
+    parser.add_argument("urls", nargs="+", help="URLs to fetch.")
+    parser.add_argument("--cache-dir", default=DEFAULT_CACHE_DIR, help="Directory of the cache files.")
+    parser.add_argument("--parallel", type=int, default=4, help="Number of concurrent downloads.")
+    args = parser.parse_args()
+
+    for result in prefetch_urls(args.urls, args.cache_dir, args.parallel).values():
+        print(result.path)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,216 @@
+"""
+Benchmark of the wide and normalized orders layouts against a local PostgreSQL instance.
+
+Creates both layouts of the sample tables in scratch schemas from the schema registry (the
+DDL that psql_create_tables_script.py runs with --layout wide / normalized), loads the sample
+customers and products into both, streams the same generated orders into the orders table of
+one and the order_headers and order_lines tables of the other, and reports for each layout:
+the load time of the orders, the on-disk size of the order tables (with indexes and TOAST) and
+the latency of the lookups of verify_query_plans.py (the queries of get_orders.py and
+chatbot_query.sql, and by customer id and email) and of an aggregate, which run against the
+orders table or the orders view unchanged.
+
+Example:
+    python layout_benchmark.py --dsn "host=localhost dbname=postgres user=postgres" --orders 100000 1000000
+"""
+import argparse
+import json
+import logging
+import os
+import statistics
+import sys
+import time
+
+import psycopg2
+from psycopg2 import sql
+
+from batch_pipeline import copy_batches
+from bulk_load import TABLE_COLUMNS, copy_table_from_csv
+from order_generator import (
+    ORDER_TABLE_COLUMNS, ORDER_TABLES, SAMPLE_DATA_DIR, generate_order_batches, order_table_batches, read_table_csv
+)
+from schema_registry import LAYOUT_TABLES, create_indexes_sql, create_table_sql, orders_view_sql
+from verify_query_plans import LOOKUP_QUERIES, QUERY_PARAMETERS
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s',
+    handlers=[logging.StreamHandler(sys.stdout)]
+)
+
+logger = logging.getLogger(__name__)
+
+# Scratch schema of each layout, so the real tables are never touched
+LAYOUT_SCHEMAS = {
+    'wide': 'layout_benchmark_wide',
+    'normalized': 'layout_benchmark_normalized',
+}
+
+# Queries run against both layouts, by name: the lookups of verify_query_plans.py and an
+# aggregate over all orders
+REFERENCE_QUERIES = dict(LOOKUP_QUERIES, revenue_by_category="SELECT category, sum(total) FROM orders GROUP BY category")
+
+def connect(dsn, schema_name):
+    """
+    Connects to the benchmark database with a layout schema first on the search path.
+    """
+    return psycopg2.connect(dsn, options="-c search_path=%s" % schema_name)
+
+def create_layout(dsn, layout):
+    """
+    (Re)creates the scratch schema of a layout with its tables and indexes (and the orders view)
+    and loads the sample customers and products into it.
+    """
+    schema_name = LAYOUT_SCHEMAS[layout]
+    conn = psycopg2.connect(dsn)
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute(sql.SQL("DROP SCHEMA IF EXISTS {} CASCADE").format(sql.Identifier(schema_name)))
+            cursor.execute(sql.SQL("CREATE SCHEMA {}").format(sql.Identifier(schema_name)))
+            for table_name in LAYOUT_TABLES[layout]:
+                cursor.execute(create_table_sql(table_name, schema_name))
+                for statement in create_indexes_sql(table_name, schema_name):
+                    cursor.execute(statement)
+            if layout == 'normalized':
+                cursor.execute(orders_view_sql(schema_name))
+        conn.commit()
+    finally:
+        conn.close()
+    conn = connect(dsn, schema_name)
+    try:
+        with conn.cursor() as cursor:
+            for table_name in ('products', 'customers'):
+                copy_table_from_csv(cursor, table_name, os.path.join(SAMPLE_DATA_DIR, table_name + ".csv"),
+                                    TABLE_COLUMNS[table_name])
+        conn.commit()
+    finally:
+        conn.close()
+
+def load_orders(dsn, layout, order_count, seed, customers, products):
+    """
+    Streams order_count generated orders into the order tables of a layout and analyzes them.
+    Returns the load time in seconds.
+    """
+    conn = connect(dsn, LAYOUT_SCHEMAS[layout])
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute(sql.SQL("TRUNCATE TABLE {}").format(
+                sql.SQL(', ').join(map(sql.Identifier, ORDER_TABLES[layout]))))
+            conn.commit()
+            start = time.perf_counter()
+            for table_name in ORDER_TABLES[layout]:
+                batches = generate_order_batches(customers, products, order_count, seed=seed)
+                copy_batches(cursor, table_name, order_table_batches(batches, table_name), ORDER_TABLE_COLUMNS[table_name])
+            conn.commit()
+            seconds = time.perf_counter() - start
+            for table_name in ORDER_TABLES[layout]:
+                cursor.execute(sql.SQL("ANALYZE {}").format(sql.Identifier(table_name)))
+            conn.commit()
+    finally:
+        conn.close()
+    return seconds
+
+def order_tables_size(dsn, layout):
+    """
+    Returns the total on-disk size in bytes of the order tables of a layout, with their indexes and TOAST data.
+    """
+    conn = connect(dsn, LAYOUT_SCHEMAS[layout])
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute("SELECT sum(pg_total_relation_size(name::regclass)) FROM unnest(%s::text[]) AS name",
+                           (ORDER_TABLES[layout],))
+            return int(cursor.fetchone()[0])
+    finally:
+        conn.close()
+
+def time_queries(dsn, layout, repeat):
+    """
+    Runs every reference query `repeat` times (after one warm-up run) and returns
+    {query name: (median ms, max ms, rows)}.
+    """
+    timings = {}
+    conn = connect(dsn, LAYOUT_SCHEMAS[layout])
+    try:
+        with conn.cursor() as cursor:
+            for name, query in REFERENCE_QUERIES.items():
+                cursor.execute(query, QUERY_PARAMETERS)
+                rows = len(cursor.fetchall())
+                samples = []
+                for _ in range(repeat):
+                    start = time.perf_counter()
+                    cursor.execute(query, QUERY_PARAMETERS)
+                    cursor.fetchall()
+                    samples.append((time.perf_counter() - start) * 1000)
+                timings[name] = (statistics.median(samples), max(samples), rows)
+        conn.rollback()
+    finally:
+        conn.close()
+    return timings
+
+def log_results(results):
+    """
+    Logs the benchmark results as a table.
+    """
+    logger.info("%-11s %10s %10s %12s  %-22s %10s %10s %8s", "layout", "orders", "load s", "size MB",
+                "query", "median ms", "max ms", "rows")
+    for result in results:
+        for name, (median, maximum, rows) in result["queries"].items():
+            logger.info("%-11s %10d %10.2f %12.1f  %-22s %10.2f %10.2f %8d", result["layout"], result["orders"],
+                        result["load_seconds"], result["size_bytes"] / 2**20, name, median, maximum, rows)
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare the storage size and query latency of the orders layouts.")
+    parser.add_argument("--dsn", default="host=localhost dbname=postgres",
+                        help="libpq connection string of the benchmark database.")
+    parser.add_argument("--orders", type=int, nargs="+", default=[100000], help="Order counts to benchmark.")
+    parser.add_argument("--layouts", nargs="+", choices=sorted(LAYOUT_SCHEMAS), default=sorted(LAYOUT_SCHEMAS),
+                        help="Layouts to compare.")
+    parser.add_argument("--repeat", type=int, default=20, help="Timed runs of every query.")
+    parser.add_argument("--seed", type=int, default=42, help="Seed of the generated orders.")
+    parser.add_argument("--keep", action="store_true", help="Keep the scratch schemas afterwards.")
+    parser.add_argument("--output", help="Also write the results to this JSON file.")
+    args = parser.parse_args()
+
+    if any(orders < 1 for orders in args.orders) or args.repeat < 1:
+        logger.error("--orders and --repeat must be at least 1")
+        sys.exit(1)
+
+    customers = read_table_csv(os.path.join(SAMPLE_DATA_DIR, "customers.csv"), 'customers')
+    products = read_table_csv(os.path.join(SAMPLE_DATA_DIR, "products.csv"), 'products')
+    for layout in args.layouts:
+        create_layout(args.dsn, layout)
+
+    results = []
+    try:
+        for order_count in args.orders:
+            for layout in args.layouts:
+                logger.info("Loading %d orders into the %s layout...", order_count, layout)
+                load_seconds = load_orders(args.dsn, layout, order_count, args.seed, customers, products)
+                results.append({
+                    "layout": layout,
+                    "orders": order_count,
+                    "load_seconds": round(load_seconds, 4),
+                    "size_bytes": order_tables_size(args.dsn, layout),
+                    "queries": time_queries(args.dsn, layout, args.repeat),
+                })
+    finally:
+        if not args.keep:
+            conn = psycopg2.connect(args.dsn)
+            try:
+                with conn.cursor() as cursor:
+                    for layout in args.layouts:
+                        cursor.execute(sql.SQL("DROP SCHEMA IF EXISTS {} CASCADE").format(
+                            sql.Identifier(LAYOUT_SCHEMAS[layout])))
+                conn.commit()
+            finally:
+                conn.close()
+
+    log_results(results)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+        logger.info("Results written to %s", args.output)
+
+if __name__ == "__main__":
+    main()
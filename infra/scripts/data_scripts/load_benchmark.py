@@ -0,0 +1,267 @@
+"""
+Benchmark of the table load strategies against a local PostgreSQL instance.
+
+Generates synthetic products, customers and orders CSV files of the requested sizes,
+creates the tables in a scratch schema from the schema registry (the DDL that
+psql_create_tables_script.py runs), and loads every file with every registered strategy.
+Each load runs in its own process so that its peak RSS is measured on its own.
+Reports rows/s, peak RSS and the WAL bytes the server wrote during the load.
+
+New strategies plug in by adding a loader with the signature
+    load_table(cursor, table_name, csv_file_path, columns)
+to STRATEGIES.
+
+Example:
+    python load_benchmark.py --dsn "host=localhost dbname=postgres user=postgres" --rows 1000 100000
+"""
+import argparse
+import csv
+import datetime
+import json
+import logging
+import multiprocessing
+import os
+import random
+import resource
+import sys
+import tempfile
+import time
+
+import psycopg2
+from psycopg2 import sql
+
+from binary_copy import copy_table_binary_from_csv
+from bulk_load import (
+    DEFAULT_CHUNK_ROWS, TABLE_COLUMNS, LoadResult, copy_table_from_csv, iter_csv_chunks, load_table_from_csv
+)
+from compressed_io import COMPRESSION_SUFFIXES, open_output
+from schema_registry import SAMPLE_TABLES, create_indexes_sql, create_table_sql, date_columns
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s',
+    handlers=[logging.StreamHandler(sys.stdout)]
+)
+
+logger = logging.getLogger(__name__)
+
+# Schema the benchmark tables are created in, so the real tables are never touched
+BENCHMARK_SCHEMA = 'load_benchmark'
+
+FIRST_NAMES = ['Hazel', 'Anne', 'Mikaela', 'Isabel', 'Liam', 'Noah', 'Olivia', 'Emma', 'Mateo', 'Aiko', 'Ravi', 'Chen']
+LAST_NAMES = ['Rodriguez', 'Patel', 'Lee', 'Garcia', 'Smith', 'Nguyen', 'Kim', 'Brown', 'Silva', 'Cohen', 'Okafor']
+CATEGORIES = ['Tents', 'Backpacks', 'Hiking Clothing', 'Camping Stoves', 'Sleeping Bags', 'Footwear', 'Navigation']
+BRANDS = ['OutdoorLiving', 'HikeMate', 'MountainStyle', 'EcoFire', 'TrailBlaze', 'CozyNights', 'AltiPeak']
+MEMBERSHIPS = ['Base', 'Gold', 'Platinum']
+DESCRIPTION_WORDS = ('durable lightweight waterproof compact breathable versatile rugged comfortable portable '
+                     'adventure trail camping hiking outdoor design fabric weather night storage').split()
+
+def insert_rows_from_csv(cursor, table_name, csv_file_path, columns=None, chunk_rows=DEFAULT_CHUNK_ROWS):
+    """
+    Inserts a CSV file one row per INSERT statement, as populate_all_tables.py originally did.
+    Kept as the baseline of the benchmark.
+    """
+    columns = columns or TABLE_COLUMNS[table_name]
+    insert_query = sql.SQL("INSERT INTO {} ({}) VALUES ({})").format(
+        sql.Identifier(table_name),
+        sql.SQL(', ').join(map(sql.Identifier, columns)),
+        sql.SQL(', ').join(sql.Placeholder() * len(columns))
+    )
+    start = time.perf_counter()
+    rows = 0
+    for df in iter_csv_chunks(csv_file_path, chunk_rows):
+        values = df[columns].astype(object).where(df[columns].notna(), None)
+        for row in values.itertuples(index=False, name=None):
+            cursor.execute(insert_query, row)
+        rows += len(values)
+    return LoadResult(table_name, rows, time.perf_counter() - start)
+
+# Load strategies compared by the benchmark, by name
+STRATEGIES = {
+    "per_row": insert_rows_from_csv,
+    "execute_values": load_table_from_csv,
+    "copy": copy_table_from_csv,
+    "binary_copy": copy_table_binary_from_csv,
+}
+
+def generate_rows(table_name, rows, seed=0):
+    """
+    Yields `rows` deterministic synthetic rows for a table, in TABLE_COLUMNS order.
+    Dates are written in the source format registered for their column.
+    """
+    rng = random.Random("%s-%d" % (table_name, seed))
+    date_formats = {col: date_format or '%Y-%m-%d' for col, date_format in date_columns(table_name).items()}
+    first_day = datetime.date(2020, 1, 1)
+    for row_id in range(1, rows + 1):
+        first_name = rng.choice(FIRST_NAMES)
+        last_name = rng.choice(LAST_NAMES)
+        description = " ".join(rng.choices(DESCRIPTION_WORDS, k=rng.randint(20, 120)))
+        if table_name == 'products':
+            yield [row_id, "%s %s %d" % (rng.choice(BRANDS), rng.choice(CATEGORIES), row_id),
+                   "%.2f" % rng.uniform(5, 500), rng.choice(CATEGORIES), rng.choice(BRANDS), description]
+        elif table_name == 'customers':
+            birth_date = datetime.date(1950, 1, 1) + datetime.timedelta(days=rng.randint(0, 20000))
+            yield [row_id, first_name, last_name, rng.choice(['Female', 'Male']),
+                   birth_date.strftime(date_formats['date_of_birth']), 2025 - birth_date.year, "%s.%s%d@example.com" % (first_name, last_name, row_id),
+                   "555-%03d-%04d" % (rng.randint(100, 999), rng.randint(0, 9999)),
+                   "%d Main ST, Buffalo,NY 99999" % rng.randint(1, 9999), rng.choice(MEMBERSHIPS)]
+        elif table_name == 'orders':
+            quantity = rng.randint(1, 5)
+            unit_price = round(rng.uniform(5, 500), 2)
+            order_date = first_day + datetime.timedelta(days=rng.randint(0, 1800))
+            yield [row_id, rng.randint(1, 1000), rng.randint(1, 1000), quantity, "%.2f" % (quantity * unit_price),
+                   order_date.strftime(date_formats['order_date']), first_name, last_name, "%.2f" % unit_price,
+                   rng.choice(CATEGORIES), rng.choice(BRANDS), description, rng.random() < 0.1]
+        else:
+            raise ValueError("No synthetic data generator for table %s" % table_name)
+
+def write_synthetic_csv(work_dir, table_name, rows, seed=0, compression=None):
+    """
+    Writes a synthetic CSV file for a table unless it already exists, compressed as it is
+    written with compression ('gz' or 'zst'). Returns its path.
+    """
+    path = os.path.join(work_dir, "%s_%d_%d.csv%s" % (table_name, rows, seed, COMPRESSION_SUFFIXES.get(compression, "")))
+    if not os.path.exists(path):
+        partial_path = path + ".partial"
+        with open_output(partial_path, compression) as f:
+            writer = csv.writer(f)
+            writer.writerow(TABLE_COLUMNS[table_name])
+            writer.writerows(generate_rows(table_name, rows, seed))
+        os.replace(partial_path, path)
+    return path
+
+def connect(dsn):
+    """
+    Connects to the benchmark database with the benchmark schema first on the search path.
+    """
+    return psycopg2.connect(dsn, options="-c search_path=%s" % BENCHMARK_SCHEMA)
+
+def create_benchmark_tables(dsn, tables):
+    """
+    (Re)creates the benchmark schema and its tables and indexes from the DDL used for the real tables.
+    """
+    conn = psycopg2.connect(dsn)
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute(sql.SQL("DROP SCHEMA IF EXISTS {} CASCADE").format(sql.Identifier(BENCHMARK_SCHEMA)))
+            cursor.execute(sql.SQL("CREATE SCHEMA {}").format(sql.Identifier(BENCHMARK_SCHEMA)))
+            for table_name in tables:
+                cursor.execute(create_table_sql(table_name, BENCHMARK_SCHEMA))
+                for statement in create_indexes_sql(table_name, BENCHMARK_SCHEMA):
+                    cursor.execute(statement)
+        conn.commit()
+    finally:
+        conn.close()
+
+def current_wal_lsn(cursor):
+    cursor.execute("SELECT pg_current_wal_lsn()")
+    return cursor.fetchone()[0]
+
+def run_strategy(dsn, strategy, table_name, csv_file_path, results):
+    """
+    Child process body: truncates the table, loads the file with one strategy and commits.
+    Puts (rows, seconds, peak RSS in bytes) on the results queue.
+    """
+    conn = connect(dsn)
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute(sql.SQL("TRUNCATE TABLE {}").format(sql.Identifier(table_name)))
+            conn.commit()
+            start = time.perf_counter()
+            result = STRATEGIES[strategy](cursor, table_name, csv_file_path, TABLE_COLUMNS[table_name])
+            conn.commit()
+            seconds = time.perf_counter() - start
+    finally:
+        conn.close()
+    # ru_maxrss is in kilobytes on Linux and in bytes on macOS
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    results.put((result.rows, seconds, peak_rss if sys.platform == "darwin" else peak_rss * 1024))
+
+def benchmark_load(dsn, strategy, table_name, csv_file_path):
+    """
+    Runs one load in a separate process and returns its measurements as a dict.
+    WAL bytes are the server-wide WAL written while the load ran.
+    """
+    conn = psycopg2.connect(dsn)
+    conn.autocommit = True
+    try:
+        with conn.cursor() as cursor:
+            context = multiprocessing.get_context("spawn")
+            results = context.Queue()
+            process = context.Process(target=run_strategy, args=(dsn, strategy, table_name, csv_file_path, results))
+            wal_start = current_wal_lsn(cursor)
+            process.start()
+            process.join()
+            if process.exitcode != 0:
+                raise RuntimeError("%s load of %s failed with exit code %s" % (strategy, table_name, process.exitcode))
+            rows, seconds, peak_rss = results.get()
+            cursor.execute("SELECT pg_wal_lsn_diff(pg_current_wal_lsn(), %s)", (wal_start,))
+            wal_bytes = int(cursor.fetchone()[0])
+    finally:
+        conn.close()
+    return {
+        "strategy": strategy,
+        "table": table_name,
+        "rows": rows,
+        "file_bytes": os.path.getsize(csv_file_path),
+        "seconds": round(seconds, 4),
+        "rows_per_second": round(rows / seconds) if seconds > 0 else None,
+        "peak_rss_bytes": peak_rss,
+        "wal_bytes": wal_bytes,
+    }
+
+def log_results(results):
+    """
+    Logs the benchmark results as a table.
+    """
+    logger.info("%-16s %-10s %10s %10s %12s %12s %14s", "strategy", "table", "rows", "seconds",
+                "rows/s", "peak RSS MB", "WAL MB")
+    for result in results:
+        logger.info("%-16s %-10s %10d %10.2f %12s %12.1f %14.1f", result["strategy"], result["table"], result["rows"],
+                    result["seconds"], result["rows_per_second"], result["peak_rss_bytes"] / 2**20,
+                    result["wal_bytes"] / 2**20)
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the table load strategies against a local PostgreSQL.")
+    parser.add_argument("--dsn", default="host=localhost dbname=postgres",
+                        help="libpq connection string of the benchmark database.")
+    parser.add_argument("--rows", type=int, nargs="+", default=[1000, 10000, 100000],
+                        help="Row counts to benchmark (1000 to 10000000).")
+    parser.add_argument("--strategies", nargs="+", choices=sorted(STRATEGIES), default=sorted(STRATEGIES),
+                        help="Load strategies to compare.")
+    parser.add_argument("--tables", nargs="+", choices=SAMPLE_TABLES, default=SAMPLE_TABLES,
+                        help="Tables to load.")
+    parser.add_argument("--seed", type=int, default=0, help="Seed of the synthetic data.")
+    parser.add_argument("--work-dir", default=os.path.join(tempfile.gettempdir(), "load_benchmark"),
+                        help="Directory the synthetic CSV files are generated in and reused from.")
+    parser.add_argument("--compression", choices=sorted(COMPRESSION_SUFFIXES),
+                        help="Generate compressed CSV files, which the loaders decompress as they read them.")
+    parser.add_argument("--output", help="Also write the results to this JSON file.")
+    args = parser.parse_args()
+
+    if any(rows < 1000 or rows > 10000000 for rows in args.rows):
+        logger.error("--rows must be between 1000 and 10000000")
+        sys.exit(1)
+
+    os.makedirs(args.work_dir, exist_ok=True)
+    create_benchmark_tables(args.dsn, args.tables)
+
+    results = []
+    for rows in args.rows:
+        for table_name in args.tables:
+            logger.info("Generating %d %s rows...", rows, table_name)
+            csv_file_path = write_synthetic_csv(args.work_dir, table_name, rows, args.seed, args.compression)
+            for strategy in args.strategies:
+                result = benchmark_load(args.dsn, strategy, table_name, csv_file_path)
+                logger.info("%s: %d rows into %s in %.2f s.", strategy, result["rows"], table_name, result["seconds"])
+                results.append(result)
+
+    log_results(results)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+        logger.info("Results written to %s", args.output)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""
+Machine-readable metrics of the data load scripts.
+
+Every timed phase of a load (token, connect, truncate, parse, transfer, commit, index_build, ...)
+is written as one JSON object per line, so runs can be compared and charted:
+
+    {"run_id": "...", "timestamp": "...", "phase": "transfer", "table": "orders", "seconds": 0.41,
+     "rows": 300, "bytes": 412345, "rows_per_second": 731.7, "bytes_per_second": 1005719.5}
+"""
+import datetime
+import json
+import sys
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+class MetricsRecorder:
+    """
+    Writes per-phase metrics records as JSON lines to a file (appended), or to stdout when
+    output is "-". With no output the records are dropped, so callers can always record.
+    Safe to use from the threads of a concurrent load.
+    """
+    def __init__(self, output=None, run_id=None):
+        self.run_id = run_id or uuid.uuid4().hex
+        self._lock = threading.Lock()
+        if output == "-":
+            self._file, self._close = sys.stdout, False
+        elif output:
+            self._file, self._close = open(output, "a", encoding="utf-8"), True
+        else:
+            self._file, self._close = None, False
+
+    def record(self, phase, seconds, table_name=None, rows=None, bytes=None, **fields):
+        """
+        Writes one metrics record. Throughput is derived from the duration and the counts given.
+        """
+        if self._file is None:
+            return
+        record = {
+            "run_id": self.run_id,
+            "timestamp": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+            "phase": phase,
+            "table": table_name,
+            "seconds": round(seconds, 6),
+            "rows": rows,
+            "bytes": bytes,
+            "rows_per_second": round(rows / seconds, 1) if rows is not None and seconds > 0 else None,
+            "bytes_per_second": round(bytes / seconds, 1) if bytes is not None and seconds > 0 else None,
+        }
+        record.update(fields)
+        line = json.dumps(record, default=str)
+        with self._lock:
+            self._file.write(line + "\n")
+            self._file.flush()
+
+    @contextmanager
+    def phase(self, phase, table_name=None, **fields):
+        """
+        Times the body of a with block and records it as a phase. The yielded dict can be used
+        to set rows, bytes or other fields of the record before the block ends.
+        The record has status "ok", or "error" and the error when the block raises.
+        """
+        counts = dict(fields)
+        start = time.perf_counter()
+        try:
+            yield counts
+            counts["status"] = "ok"
+        except BaseException as e:
+            counts.update(status="error", error=f"{type(e).__name__}: {e}")
+            raise
+        finally:
+            self.record(phase, time.perf_counter() - start, table_name, **counts)
+
+    def record_load(self, result):
+        """
+        Records the parse and transfer phases of a bulk_load LoadResult. Loaders that do not
+        separate parsing report their whole wall time as transfer.
+        """
+        parse_seconds = result.parse_seconds or 0.0
+        if result.parse_seconds is not None:
+            self.record("parse", parse_seconds, result.table_name, rows=result.rows, bytes=result.bytes)
+        self.record("transfer", max(result.seconds - parse_seconds, 0.0), result.table_name,
+                    rows=result.rows, bytes=result.bytes)
+
+    def close(self):
+        if self._close:
+            self._file.close()
+        self._file = None
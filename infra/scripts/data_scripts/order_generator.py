@@ -0,0 +1,306 @@
+"""
+Vectorized generator of synthetic orders for the sample e-commerce tables.
+
+_generate_orders_from_database.py originally built each order in a Python loop with
+random.choice and sent it with its own INSERT. Here the customer indices, product indices,
+quantities and order dates of a whole batch are drawn as NumPy arrays in one pass, totals are
+computed on the arrays, and each batch comes out as a DataFrame with the columns of the orders
+table, ready to stream into a COPY or a CSV / Parquet file with batch_pipeline.py.
+Picks are uniform by default; with skewed_order_weights they follow the alias tables of
+weighted_sampling.py (hot products, frequent customers, seasonal dates).
+
+generate_orders_in_database is the server-side alternative: one INSERT ... SELECT over
+generate_series that draws the orders inside PostgreSQL, with no data moving through the client.
+It picks uniformly.
+
+Time the generator against the sample customers and products with:
+    python order_generator.py --orders 10000000 [--skew]
+"""
+import argparse
+import logging
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+from psycopg2 import sql
+
+from batch_pipeline import write_batches
+from bulk_load import DEFAULT_CHUNK_ROWS, iter_csv_chunks
+from schema_registry import TABLE_SCHEMAS
+from weighted_sampling import AliasTable, purchase_frequency_weights, seasonal_date_weights, zipf_weights
+
+logger = logging.getLogger(__name__)
+
+# Columns of the orders table, in DDL order
+ORDER_COLUMNS = TABLE_SCHEMAS['orders'].column_names
+
+# Order tables of each layout, and their columns in DDL order
+ORDER_TABLES = {
+    'wide': ['orders'],
+    'normalized': ['order_headers', 'order_lines'],
+}
+ORDER_TABLE_COLUMNS = {table_name: TABLE_SCHEMAS[table_name].column_names
+                       for table_names in ORDER_TABLES.values() for table_name in table_names}
+
+# Customer and product columns copied into every order, as (order column, source column)
+CUSTOMER_FIELDS = [
+    ('customer_id', 'id'),
+    ('customer_first_name', 'first_name'),
+    ('customer_last_name', 'last_name'),
+    ('customer_gender', 'gender'),
+    ('customer_age', 'age'),
+    ('customer_email', 'email'),
+    ('customer_phone', 'phone'),
+]
+PRODUCT_FIELDS = [
+    ('product_id', 'id'),
+    ('product_name', 'product_name'),
+    ('unit_price', 'price'),
+    ('category', 'category'),
+    ('brand', 'brand'),
+    ('product_description', 'product_description'),
+]
+
+# Order dates are drawn uniformly from the first day of START_YEAR to the last day of END_YEAR
+START_YEAR = 2023
+END_YEAR = 2024
+
+REPO_ROOT = os.path.normpath(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", ".."))
+SAMPLE_DATA_DIR = os.path.join(REPO_ROOT, "infra", "data", "postgresql_db_sample_data")
+
+def column_arrays(df, fields):
+    """
+    Returns {order column: array of the source column} for drawing rows by index.
+    The arrays keep the pandas dtype of the column (e.g. nullable integers and strings).
+    """
+    return {order_column: df[source_column].array for order_column, source_column in fields}
+
+def order_days(start_year, end_year):
+    """
+    Returns the first order date and the number of days orders are spread over.
+    """
+    first_day = np.datetime64("%d-01-01" % start_year, "D")
+    return first_day, int((np.datetime64("%d-12-31" % end_year, "D") - first_day).astype(int)) + 1
+
+def skewed_order_weights(customers, products, seed=None, start_year=START_YEAR, end_year=END_YEAR,
+                         product_exponent=1.1, customer_sigma=1.0):
+    """
+    Returns the weights of generate_order_batches for realistic hot-key skew: Zipf product
+    popularity over randomly ranked products, log-normal purchase frequencies of the customers
+    and seasonal order dates. The same seed always gives the same weights.
+    """
+    rng = np.random.default_rng(seed)
+    first_day, days = order_days(start_year, end_year)
+    return {
+        'customer_weights': purchase_frequency_weights(len(customers), rng, customer_sigma),
+        'product_weights': zipf_weights(len(products), product_exponent, rng),
+        'date_weights': seasonal_date_weights(first_day, days),
+    }
+
+def index_sampler(count, weights):
+    """
+    Returns a function drawing indices 0..count-1, uniformly or, with weights, from an alias table.
+    """
+    if weights is None:
+        return lambda rng, size: rng.integers(0, count, size)
+    if len(weights) != count:
+        raise ValueError("Expected %d weights, not %d" % (count, len(weights)))
+    return AliasTable(weights).sample_indices
+
+def generate_order_batches(customers, products, order_count, batch_rows=DEFAULT_CHUNK_ROWS, seed=None,
+                           first_order_id=1, start_year=START_YEAR, end_year=END_YEAR,
+                           customer_weights=None, product_weights=None, date_weights=None):
+    """
+    Yields order_count random orders as DataFrames of at most batch_rows rows, with the
+    columns of the orders table. customers and products are DataFrames with the columns of
+    their tables (at least those in CUSTOMER_FIELDS and PRODUCT_FIELDS). Every order picks a
+    customer and a product, a quantity of 1 to 5 and a date in start_year to end_year;
+    unit_price is the product price, total is price * quantity, and return_status is false.
+    Customers, products and dates are picked uniformly, or in proportion to the given weights
+    (one per customer, product and day, e.g. from skewed_order_weights).
+    The same seed always yields the same orders.
+    """
+    if customers.empty or products.empty:
+        raise ValueError("Orders need at least one customer and one product")
+    rng = np.random.default_rng(seed)
+    customer_columns = column_arrays(customers, CUSTOMER_FIELDS)
+    product_columns = column_arrays(products, PRODUCT_FIELDS)
+    prices = products['price'].to_numpy(dtype='float64')
+    first_day, days = order_days(start_year, end_year)
+    draw_customers = index_sampler(len(customers), customer_weights)
+    draw_products = index_sampler(len(products), product_weights)
+    draw_days = index_sampler(days, date_weights)
+
+    for offset in range(0, order_count, batch_rows):
+        rows = min(batch_rows, order_count - offset)
+        customer_index = draw_customers(rng, rows)
+        product_index = draw_products(rng, rows)
+        quantity = rng.integers(1, 6, rows)
+        order_date = first_day + draw_days(rng, rows)
+
+        batch = {'id': np.arange(first_order_id + offset, first_order_id + offset + rows)}
+        batch.update((column, values.take(customer_index)) for column, values in customer_columns.items())
+        batch.update((column, values.take(product_index)) for column, values in product_columns.items())
+        batch['quantity'] = quantity
+        batch['unit_price'] = prices[product_index]
+        batch['total'] = np.round(prices[product_index] * quantity, 2)
+        batch['order_date'] = order_date
+        batch['return_status'] = np.zeros(rows, dtype=bool)
+        yield pd.DataFrame(batch, columns=ORDER_COLUMNS)
+
+def generate_orders_in_database(cursor, order_count, seed=None, first_order_id=1,
+                                start_year=START_YEAR, end_year=END_YEAR, layout='wide'):
+    """
+    Inserts order_count random orders with the semantics of generate_order_batches in one
+    INSERT ... SELECT: generate_series numbers the orders, random() picks a customer and a
+    product by row number, a quantity and a date, and the picks are joined back to the
+    customers and products tables. With the normalized layout the same statement fills
+    order_headers and order_lines. seed (any integer) is passed to setseed() for repeatable
+    runs. Returns the number of orders inserted.
+    """
+    if seed is not None:
+        # setseed() takes a value in [-1, 1]
+        cursor.execute("SELECT setseed(%s)", ((seed % 2 ** 31) / 2 ** 31,))
+    customer_columns = [source for _, source in CUSTOMER_FIELDS]
+    product_columns = [source for _, source in PRODUCT_FIELDS]
+    picks = """
+        WITH c AS (
+            SELECT row_number() OVER (ORDER BY id) AS n, {customer_columns} FROM customers
+        ), p AS (
+            SELECT row_number() OVER (ORDER BY id) AS n, {product_columns} FROM products
+        ), picks AS (
+            SELECT g AS order_number,
+                   1 + floor(random() * (SELECT count(*) FROM c))::bigint AS customer_n,
+                   1 + floor(random() * (SELECT count(*) FROM p))::bigint AS product_n,
+                   1 + floor(random() * 5)::integer AS quantity,
+                   make_date(%(start_year)s, 1, 1)
+                       + floor(random() * (make_date(%(end_year)s + 1, 1, 1) - make_date(%(start_year)s, 1, 1)))::integer
+                       AS order_date
+            FROM generate_series(1, %(order_count)s) AS g
+        )
+    """
+    if layout == 'normalized':
+        # picks is referenced twice, so PostgreSQL evaluates it (and random()) only once
+        insert = """
+        , headers AS (
+            INSERT INTO order_headers (id, customer_id, order_date)
+            SELECT %(first_order_id)s + picks.order_number - 1, c.id, picks.order_date
+            FROM picks
+            JOIN c ON c.n = picks.customer_n
+        )
+        INSERT INTO order_lines (id, order_id, line_number, product_id, quantity, unit_price, total, return_status)
+        SELECT %(first_order_id)s + picks.order_number - 1, %(first_order_id)s + picks.order_number - 1, 1, p.id,
+               picks.quantity, p.price, p.price * picks.quantity, false
+        FROM picks
+        JOIN p ON p.n = picks.product_n
+        """
+    else:
+        insert = """
+        INSERT INTO orders ({order_columns})
+        SELECT %(first_order_id)s + picks.order_number - 1, {customer_values}, {product_values},
+               picks.quantity, p.price * picks.quantity, picks.order_date, false
+        FROM picks
+        JOIN c ON c.n = picks.customer_n
+        JOIN p ON p.n = picks.product_n
+        """
+    query = sql.SQL(picks + insert).format(
+        customer_columns=sql.SQL(', ').join(map(sql.Identifier, customer_columns)),
+        product_columns=sql.SQL(', ').join(map(sql.Identifier, product_columns)),
+        order_columns=sql.SQL(', ').join(map(sql.Identifier,
+            ['id'] + [column for column, _ in CUSTOMER_FIELDS] + [column for column, _ in PRODUCT_FIELDS]
+            + ['quantity', 'total', 'order_date', 'return_status'])),
+        customer_values=sql.SQL(', ').join(sql.Identifier('c', column) for column in customer_columns),
+        product_values=sql.SQL(', ').join(sql.Identifier('p', column) for column in product_columns),
+    )
+    cursor.execute(query, {
+        'order_count': order_count,
+        'first_order_id': first_order_id,
+        'start_year': start_year,
+        'end_year': end_year,
+    })
+    return cursor.rowcount
+
+def order_table_batch(df, table_name):
+    """
+    Returns the rows of a batch of orders (with the columns of the wide orders table) as rows
+    of table_name: orders itself, or order_headers or order_lines of the normalized layout,
+    where every order has a single line whose id is the order id.
+    """
+    if table_name == 'order_headers':
+        return df[ORDER_TABLE_COLUMNS['order_headers']]
+    if table_name == 'order_lines':
+        lines = df[['id', 'product_id', 'quantity', 'unit_price', 'total', 'return_status']].copy()
+        lines.insert(1, 'order_id', df['id'])
+        lines.insert(2, 'line_number', 1)
+        return lines[ORDER_TABLE_COLUMNS['order_lines']]
+    return df[ORDER_COLUMNS]
+
+def order_table_batches(batches, table_name):
+    """
+    Yields the batches of orders as rows of table_name (see order_table_batch).
+    """
+    for df in batches:
+        yield order_table_batch(df, table_name)
+
+def read_table_csv(csv_file_path, table_name):
+    """
+    Reads a whole CSV file of a registered table with its registered column types.
+    """
+    return pd.concat(iter_csv_chunks(csv_file_path, DEFAULT_CHUNK_ROWS, table_name), ignore_index=True)
+
+def main():
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(levelname)s - %(message)s',
+        handlers=[logging.StreamHandler(sys.stdout)]
+    )
+    parser = argparse.ArgumentParser(description="Generate random orders from customers and products CSV files.")
+    parser.add_argument("--orders", type=int, default=300, help="Number of orders to generate.")
+    parser.add_argument("--customers", default=os.path.join(SAMPLE_DATA_DIR, "customers.csv"),
+                        help="CSV file of the customers table.")
+    parser.add_argument("--products", default=os.path.join(SAMPLE_DATA_DIR, "products.csv"),
+                        help="CSV file of the products table.")
+    parser.add_argument("--batch-rows", type=int, default=DEFAULT_CHUNK_ROWS, help="Rows per generated batch.")
+    parser.add_argument("--seed", type=int, default=42, help="Seed of the random generator.")
+    parser.add_argument("--skew", action="store_true",
+                        help="Pick popular products, frequent customers and seasonal dates more often "
+                             "instead of uniformly.")
+    parser.add_argument("--output", help="Write the orders to this CSV or Parquet file (.csv, .csv.gz, .csv.zst or "
+                                         ".parquet); without it the orders are only generated and timed. "
+                                         "{table} in the path is replaced by the table name.")
+    parser.add_argument("--layout", choices=sorted(ORDER_TABLES), default='wide',
+                        help="Write one orders file, or order_headers and order_lines files (--output must "
+                             "contain {table}).")
+    parser.add_argument("--source-orders",
+                        help="Read the orders from this CSV file of the wide orders table instead of generating "
+                             "them, e.g. to split the sample orders into the normalized layout.")
+    args = parser.parse_args()
+
+    if args.layout == 'normalized' and (not args.output or "{table}" not in args.output):
+        logger.error("--layout normalized requires an --output path containing {table}")
+        sys.exit(1)
+
+    if args.source_orders:
+        make_batches = lambda: iter_csv_chunks(args.source_orders, args.batch_rows, 'orders')
+    else:
+        customers = read_table_csv(args.customers, 'customers')
+        products = read_table_csv(args.products, 'products')
+        weights = skewed_order_weights(customers, products, args.seed) if args.skew else {}
+        # Every table file is written from its own pass over the generator; the seed makes the passes identical
+        make_batches = lambda: generate_order_batches(customers, products, args.orders, args.batch_rows, args.seed,
+                                                      **weights)
+    start = time.perf_counter()
+    for table_name in ORDER_TABLES[args.layout]:
+        batches = order_table_batches(make_batches(), table_name)
+        if args.output:
+            output_path = args.output.replace("{table}", table_name)
+            rows = write_batches(batches, output_path, table_name, ORDER_TABLE_COLUMNS[table_name])
+        else:
+            rows = sum(len(df) for df in batches)
+    seconds = time.perf_counter() - start
+    logger.info("Generated %d orders in %.2f s (%.0f rows/s).", rows, seconds, rows / seconds if seconds > 0 else 0)
+
+if __name__ == "__main__":
+    main()
@@ -1,9 +1,21 @@
 import psycopg2
-import pandas as pd
 import urllib.parse
 import os
 import sys
 import getpass
+import argparse
+from bulk_load import DEFAULT_CHUNK_ROWS, load_table_from_csv
+from load_metrics import MetricsRecorder
+
+# Parse command-line arguments
+parser = argparse.ArgumentParser(description="Populate the products, customers and orders tables from the sample CSV files.")
+parser.add_argument("--chunk-rows", type=int, default=DEFAULT_CHUNK_ROWS,
+                    help="Number of CSV rows read and inserted per batch; bounds peak memory.")
+parser.add_argument("--metrics-file",
+                    help="Append a JSON-lines metrics record per load phase (connect, load, parse, transfer, "
+                         "commit) to this file; '-' writes them to stdout.")
+args = parser.parse_args()
+metrics = MetricsRecorder(args.metrics_file)
 
 # Read URI parameters from the environment
 dbhost = "customchatbotdbserver.postgres.database.azure.com"
@@ -18,7 +30,8 @@ password = getpass.getpass(prompt='Enter your PostgreSQL password: ')
 conn_string = f"host={dbhost} dbname={dbname} user={dbuser} password={password} sslmode={sslmode}"
 
 # Connect to the PostgreSQL server
-conn = psycopg2.connect(conn_string)
+with metrics.phase("connect"):
+    conn = psycopg2.connect(conn_string)
 print("Connection established")
 cursor = conn.cursor()
 
@@ -36,82 +49,23 @@ csv_file_path_products = os.path.join(csv_file_dir, 'products.csv')
 csv_file_path_orders = os.path.join(csv_file_dir, 'orders.csv')
 csv_file_path_customers = os.path.join(csv_file_dir, 'customers.csv')
 
-# Read the CSV file into a DataFrame
-df_products = pd.read_csv(csv_file_path_products)
-df_orders = pd.read_csv(csv_file_path_orders)
-df_customers = pd.read_csv(csv_file_path_customers)
-
-
-# Strip whitespace from column names
-df_products.columns = df_products.columns.str.strip()
-df_customers.columns = df_customers.columns.str.strip()
-df_orders.columns = df_orders.columns.str.strip()
-
-# Insert data into the products table
-for index, row in df_products.iterrows():
-    cursor.execute(
-        "INSERT INTO products (id, product_name, price, category, brand, product_description) "
-        "VALUES (%s, %s, %s, %s, %s, %s)",
-        (
-            row['id'],
-            row['product_name'],
-            row['price'],
-            row['category'],
-            row['brand'],
-            row['product_description']
-        )
-    )
-
-print("Inserted rows from sample data file into the products table")
-
-
-# Insert data into the customers table
-for index, row in df_customers.iterrows():
-    cursor.execute(
-        "INSERT INTO customers (id, first_name, last_name, gender, date_of_birth, age, email, phone, post_address, membership) "
-        "VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)",
-        (
-            row['id'],
-            row['first_name'],
-            row['last_name'],
-            row['gender'],
-            row['date_of_birth'],
-            row['age'],
-            row['email'],
-            row['phone'],
-            row['post_address'],
-            row['membership']
-        )
-    )
-
-print("Inserted rows from sample data file into the customers table")
-
-# Insert data into the orders table
-for index, row in df_orders.iterrows():
-    cursor.execute(
-        "INSERT INTO public.orders (id, customer_id, product_id, quantity, total, order_date, customer_first_name, customer_last_name, unit_price, category, brand, product_description, return_status) "
-        "VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)",
-        (
-            row['id'],
-            row['customer_id'],
-            row['product_id'],
-            row['quantity'],
-            row['total'],
-            row['order_date'],
-            row['customer_first_name'],
-            row['customer_last_name'],
-            row['unit_price'],
-            row['category'],
-            row['brand'],
-            row['product_description'],
-            row['return_status']
-        )
-    )
-print("Inserted rows from sample data file into the orders table")
+# Insert data into each table with set-based inserts, reading the CSV file one chunk of rows at a time
+for table_name, csv_file_path in [
+    ('products', csv_file_path_products),
+    ('customers', csv_file_path_customers),
+    ('orders', csv_file_path_orders),
+]:
+    with metrics.phase("load", table_name) as counts:
+        result = load_table_from_csv(cursor, table_name, csv_file_path, chunk_rows=args.chunk_rows)
+        counts["rows"] = result.rows
+        metrics.record_load(result)
+    print(f"Inserted {result}")
 
 print("\n\n All Finished. \n")
 
 # Clean up
-conn.commit()
+with metrics.phase("commit"):
+    conn.commit()
 cursor.close()
-conn.close()
\ No newline at end of file
+conn.close()
+metrics.close()
\ No newline at end of file
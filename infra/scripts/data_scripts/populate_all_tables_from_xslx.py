@@ -4,6 +4,24 @@ import urllib.parse
 import os
 import sys
 import getpass
+import argparse
+from bulk_load import DEFAULT_CHUNK_ROWS, load_dataframe
+from load_metrics import MetricsRecorder
+from excel_cache import read_excel_cached
+from excel_stream import load_table_from_excel
+
+# Parse command-line arguments
+parser = argparse.ArgumentParser(description="Populate the products, customers and orders tables from the sample Excel files.")
+parser.add_argument("--stream", action="store_true",
+                    help="Stream each sheet in openpyxl read-only mode instead of loading whole workbooks; "
+                         "memory stays flat regardless of workbook size.")
+parser.add_argument("--batch-rows", type=int, default=DEFAULT_CHUNK_ROWS,
+                    help="With --stream, number of rows read and inserted per batch.")
+parser.add_argument("--metrics-file",
+                    help="Append a JSON-lines metrics record per load phase (connect, read, load, parse, "
+                         "transfer, commit) to this file; '-' writes them to stdout.")
+args = parser.parse_args()
+metrics = MetricsRecorder(args.metrics_file)
 
 # Read URI parameters from the environment
 dbhost = "customchatbotdbserver.postgres.database.azure.com"
@@ -18,7 +36,8 @@ password = getpass.getpass(prompt='Enter your PostgreSQL password: ')
 conn_string = f"host={dbhost} dbname={dbname} user={dbuser} password={password} sslmode={sslmode}"
 
 # Connect to the PostgreSQL server
-conn = psycopg2.connect(conn_string)
+with metrics.phase("connect"):
+    conn = psycopg2.connect(conn_string)
 print("Connection established")
 cursor = conn.cursor()
 
@@ -35,81 +54,55 @@ xlsx_file_path_products = os.path.join(xslx_file_dir, 'products_data.xlsx')
 xslx_file_path_customers = os.path.join(xslx_file_dir, 'customers_data.xlsx')
 xslx_file_path_orders = os.path.join(xslx_file_dir, 'orders_data.xlsx')
 
-# Read the Excel file into a DataFrame, specifying the sheet name
-df_products = pd.read_excel(xlsx_file_path_products, sheet_name='products')
-df_customers = pd.read_excel(xslx_file_path_customers, sheet_name='customers')
-df_orders = pd.read_excel(xslx_file_path_orders, sheet_name='orders')
-
-# Strip whitespace from column names
-df_products.columns = df_products.columns.str.strip()
-df_customers.columns = df_customers.columns.str.strip()
-df_orders.columns = df_orders.columns.str.strip()
-
-# Insert data into the products table
-for index, row in df_products.iterrows():
-    cursor.execute(
-        "INSERT INTO products (id, product_name, price, category, brand, product_description) "
-        "VALUES (%s, %s, %s, %s, %s, %s)",
-        (
-            row['id'],
-            row['product_name'],
-            row['price'],
-            row['category'],
-            row['brand'],
-            row['product_description']
-        )
-    )
-
-print("Inserted rows from sample data file into the products table")
-
-
-# Insert data into the customers table
-for index, row in df_customers.iterrows():
-    cursor.execute(
-        "INSERT INTO customers (id, first_name, last_name, gender, date_of_birth, age, email, phone, post_address, membership) "
-        "VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)",
-        (
-            row['id'],
-            row['first_name'],
-            row['last_name'],
-            row['gender'],
-            row['date_of_birth'],
-            row['age'],
-            row['email'],
-            row['phone'],
-            row['post_address'],
-            row['membership']
-        )
-    )
-
-print("Inserted rows from sample data file into the customers table")
-
-# Insert data into the orders table
-for index, row in df_orders.iterrows():
-    cursor.execute(
-        "INSERT INTO public.orders (id, customer_id, product_id, quantity, total, order_date, customer_first_name, customer_last_name, unit_price, category, brand, product_description, return_status) "
-        "VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)",
-        (
-            row['id'],
-            row['customer_id'],
-            row['product_id'],
-            row['quantity'],
-            row['total'],
-            row['order_date'],
-            row['customer_first_name'],
-            row['customer_last_name'],
-            row['unit_price'],
-            row['category'],
-            row['brand'],
-            row['product_description'],
-            row['return_status']
-        )
-    )
-print("Inserted rows from sample data file into the orders table")
+# Sheets to load: (table name, workbook path, sheet name)
+sheets = [
+    ('products', xlsx_file_path_products, 'products'),
+    ('customers', xslx_file_path_customers, 'customers'),
+    ('orders', xslx_file_path_orders, 'orders'),
+]
+
+if args.stream:
+    # Insert data into each table batch by batch while the sheet is being read
+    for table_name, xlsx_file_path, sheet_name in sheets:
+        with metrics.phase("load", table_name) as counts:
+            result = load_table_from_excel(cursor, table_name, xlsx_file_path, sheet_name, batch_rows=args.batch_rows)
+            counts["rows"] = result.rows
+            metrics.record_load(result)
+        print(f"Inserted {result}")
+else:
+    # Read the Excel file into a DataFrame, specifying the sheet name (cached as Parquet after the first read)
+    with metrics.phase("read", 'products') as counts:
+        df_products = read_excel_cached(xlsx_file_path_products, sheet_name='products')
+        counts["rows"] = len(df_products)
+    with metrics.phase("read", 'customers') as counts:
+        df_customers = read_excel_cached(xslx_file_path_customers, sheet_name='customers')
+        counts["rows"] = len(df_customers)
+    with metrics.phase("read", 'orders') as counts:
+        df_orders = read_excel_cached(xslx_file_path_orders, sheet_name='orders')
+        counts["rows"] = len(df_orders)
+
+    # Strip whitespace from column names
+    df_products.columns = df_products.columns.str.strip()
+    df_customers.columns = df_customers.columns.str.strip()
+    df_orders.columns = df_orders.columns.str.strip()
+
+    # Insert data into each table with set-based inserts
+    for table_name, df in [
+        ('products', df_products),
+        ('customers', df_customers),
+        ('orders', df_orders),
+    ]:
+        with metrics.phase("load", table_name) as counts:
+            result = load_dataframe(cursor, table_name, df)
+            counts["rows"] = result.rows
+            metrics.record_load(result)
+        print(f"Inserted {result}")
 
 print("\n\n All Finished. \n")
 
 # Commit the transaction and close connections
-conn.commit()
+with metrics.phase("commit"):
+    conn.commit()
 cursor.close()
-conn.close()
\ No newline at end of file
+conn.close()
+metrics.close()
\ No newline at end of file
@@ -5,6 +5,7 @@ from psycopg2 import sql
 import logging
 import sys
 import argparse  # Added for parsing command-line arguments
+from schema_registry import LAYOUT_TABLES, create_indexes_sql, create_table_sql, orders_view_sql
 
 # Configure logging
 logging.basicConfig(
@@ -15,6 +16,28 @@ logging.basicConfig(
 
 logger = logging.getLogger(__name__)
 
+# DDL of the sample data tables of every layout, keyed by table name, generated from the schema registry:
+# the table with its keys, then its secondary indexes.
+CREATE_TABLE_STATEMENTS = {table_name: create_table_sql(table_name) + "".join(create_indexes_sql(table_name))
+                           for table_names in LAYOUT_TABLES.values() for table_name in table_names}
+
+# Tables and views of all layouts, in drop order: objects that depend on others go first.
+# orders is a table in the wide layout and a view in the normalized one.
+DROP_ORDER = ['orders', 'order_lines', 'order_headers', 'customers', 'products']
+
+def drop_relation(cursor, name, schema_name="public"):
+    """
+    Drops a table or view if it exists.
+    """
+    cursor.execute(
+        "SELECT c.relkind FROM pg_class c JOIN pg_namespace n ON n.oid = c.relnamespace "
+        "WHERE n.nspname = %s AND c.relname = %s", (schema_name, name)
+    )
+    row = cursor.fetchone()
+    if row is not None:
+        cursor.execute(sql.SQL("DROP {} {}").format(
+            sql.SQL("VIEW" if row[0] == 'v' else "TABLE"), sql.Identifier(schema_name, name)))
+
 # Grant Permission Function
 def grant_permissions(cursor, db_name, schema_name, principal_name):
     """
@@ -69,6 +92,10 @@ def main():
     parser.add_argument("--admin_principal_name", required=True, help="The admin principal name.")
     parser.add_argument("--identity_name", required=True, help="The identity name for database access.")
     parser.add_argument("--database_name", required=True, help="The name of the PostgreSQL database.")
+    parser.add_argument("--layout", choices=sorted(LAYOUT_TABLES), default="wide",
+                        help="'wide' creates the orders table with the customer and product columns of every order; "
+                             "'normalized' creates order_headers and order_lines with foreign keys to customers and "
+                             "products, and an orders view with the columns of the wide table.")
     args = parser.parse_args()
 
     # Assign arguments to variables
@@ -87,6 +114,7 @@ def main():
     logger.info(f"Admin Principal Name: {admin_principal_name}")
     logger.info(f"Identity Name: {identity_name}")
     logger.info(f"Database Name: {database_name}")
+    logger.info(f"Layout: {args.layout}")
 
     logger.info("Starting the script to create tables and grant permissions.")
 
@@ -107,81 +135,22 @@ def main():
         cursor = conn.cursor()
         logger.info("Connection established successfully.")
 
-        # Drop and recreate the products table
-        logger.info("Dropping and recreating the 'products' table.")
-        cursor.execute("DROP TABLE IF EXISTS public.products")
-        conn.commit()
-
-        create_products_sql = """
-        CREATE TABLE IF NOT EXISTS public.products
-        (
-            id integer,
-            product_name character varying(100),
-            price numeric(10,2) NOT NULL,
-            category character varying(50),
-            brand character varying(50),
-            product_description text
-        );
-        """
-        cursor.execute(create_products_sql)
+        # Drop the tables and views of both layouts, so that switching layouts leaves nothing behind
+        logger.info("Dropping the existing sample tables and views.")
+        for name in DROP_ORDER:
+            drop_relation(cursor, name)
         conn.commit()
-        logger.info("'products' table created successfully.")
 
-        # Drop and recreate the customers table
-        logger.info("Dropping and recreating the 'customers' table.")
-        cursor.execute("DROP TABLE IF EXISTS public.customers")
-        conn.commit()
-
-        create_customers_sql = """
-        CREATE TABLE IF NOT EXISTS public.customers
-        (
-            id integer,
-            first_name character varying(50),
-            last_name character varying(50),
-            gender character varying(10),
-            date_of_birth date,
-            age integer,
-            email character varying(100),
-            phone character varying(20),
-            post_address character varying(255),
-            membership character varying(50)
-        );
-        """
-        cursor.execute(create_customers_sql)
-        conn.commit()
-        logger.info("'customers' table created successfully.")
-
-        # Drop and recreate the orders table
-        logger.info("Dropping and recreating the 'orders' table.")
-        cursor.execute("DROP TABLE IF EXISTS public.orders")
-        conn.commit()
+        # Create the tables of the layout, referenced tables first
+        for table_name in LAYOUT_TABLES[args.layout]:
+            cursor.execute(CREATE_TABLE_STATEMENTS[table_name])
+            conn.commit()
+            logger.info(f"'{table_name}' table and its indexes created successfully.")
 
-        create_orders_sql = """
-        CREATE TABLE IF NOT EXISTS public.orders
-        (
-            id integer,
-            customer_id integer,
-            customer_first_name character varying(50),
-            customer_last_name character varying(50),
-            customer_gender character varying(10),
-            customer_age integer,
-            customer_email character varying(100),
-            customer_phone character varying(20),
-            order_date date,
-            product_id integer,
-            product_name character varying(100),
-            quantity integer,
-            unit_price numeric(10,2),
-            total numeric(10,2),
-            category character varying(50),
-            brand character varying(50),
-            product_description text,
-            return_status BOOLEAN DEFAULT FALSE
-        );
-        """
-        cursor.execute(create_orders_sql)
-        conn.commit()
-        logger.info("'orders' table created successfully.")
+        if args.layout == "normalized":
+            cursor.execute(orders_view_sql())
+            conn.commit()
+            logger.info("'orders' view created successfully.")
 
         # Grant permissions to the admin principal if provided
         if admin_principal_name and admin_principal_name.strip():
@@ -1,12 +1,32 @@
 from azure.identity import DefaultAzureCredential
 import psycopg2
-import psycopg2.extras
-from psycopg2 import sql
 import os
-import pandas as pd
 import logging
 import sys  
 import argparse  # Added for parsing command-line arguments
+import functools
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import psycopg2.pool
+from bulk_load import (
+    DEFAULT_CHUNK_ROWS, TABLE_COLUMNS, capture_index_definitions, clear_checkpoints, clear_row_hashes,
+    copy_table_from_csv, copy_table_with_checkpoints, drop_index_definitions, ensure_checkpoint_table,
+    ensure_row_hash_table, load_table_from_csv, load_table_via_staging, rebuild_index_definitions, truncate_tables,
+    upsert_table_from_csv
+)
+from binary_copy import copy_table_binary_from_csv
+from compressed_io import COMPRESSION_SUFFIXES
+from http_source import is_url, prefetch_urls
+from load_metrics import MetricsRecorder
+from schema_registry import LAYOUT_TABLES, load_stages
+
+# Tables loaded by this script for each layout, in load order:
+# (table name, CSV path relative to the base URL, columns to load)
+LAYOUT_SOURCES = {
+    layout: [(table_name, 'infra/data/postgresql_db_sample_data/%s.csv' % table_name, TABLE_COLUMNS[table_name])
+             for table_name in table_names]
+    for layout, table_names in LAYOUT_TABLES.items()
+}
 
 # Configure logging
 logging.basicConfig(
@@ -17,27 +37,89 @@ logging.basicConfig(
 
 logger = logging.getLogger(__name__)
 
-def truncate_tables(cursor, tables):
+# Loader used for each table, selected with --load-mode.
+# "execute_values" is the original pandas-based path, kept for comparison.
+LOAD_MODES = {
+    "copy": copy_table_from_csv,
+    "binary_copy": copy_table_binary_from_csv,
+    "execute_values": load_table_from_csv,
+}
+
+def load_table_in_transaction(conn, load_table, table_name, csv_file_path, columns, metrics):
+    """
+    Loads one table in its own transaction: commits on success, rolls back and re-raises on error.
+    Records the parse, transfer and commit phases. Returns the wall time of the load in seconds.
+    """
+    start = time.perf_counter()
+    cursor = conn.cursor()
+    try:
+        result = load_table(cursor, table_name, csv_file_path, columns)
+        metrics.record_load(result)
+        with metrics.phase("commit", table_name):
+            conn.commit()
+    except Exception:
+        conn.rollback() # Rollback the transaction in case of error
+        raise
+    finally:
+        cursor.close()
+    return time.perf_counter() - start
+
+def load_tables_concurrently(conn_string, tables, load_table, parallel, metrics):
+    """
+    Loads the given tables concurrently, each on its own connection taken from a pool
+    of at most `parallel` connections. Every table keeps its own transaction.
+    Returns a dict of table name -> wall time in seconds (None if the load failed).
+    """
+    connection_pool = psycopg2.pool.ThreadedConnectionPool(1, parallel, conn_string)
+
+    def worker(table_name, csv_file_path, columns):
+        conn = connection_pool.getconn()
+        try:
+            return load_table_in_transaction(conn, load_table, table_name, csv_file_path, columns, metrics)
+        finally:
+            connection_pool.putconn(conn)
+
+    timings = {}
+    try:
+        with ThreadPoolExecutor(max_workers=parallel) as executor:
+            futures = {executor.submit(worker, *table): table[0] for table in tables}
+            for future in as_completed(futures):
+                table_name = futures[future]
+                try:
+                    timings[table_name] = future.result()
+                    logger.info("Loaded %s table in %.2f s.", table_name, timings[table_name])
+                except Exception as e:
+                    timings[table_name] = None
+                    logger.error("An error occurred while loading %s table: %s", table_name, e)
+    finally:
+        connection_pool.closeall()
+    return {table[0]: timings[table[0]] for table in tables}
+
+def fetch_table_sources(tables, parallel, metrics):
     """
-    Truncate the specified tables.
+    Downloads the CSV URLs of the given tables concurrently into the local source cache
+    (reusing cached copies the server reports as unchanged) and returns the tables with
+    their URLs replaced by the cached files. Local paths are kept as they are.
     """
-    for table in tables:
-        cursor.execute(sql.SQL("TRUNCATE TABLE {}").format(sql.Identifier(table)))
-    logger.info("Tables truncated: %s", ", ".join(tables))
+    urls = [csv_file_path for _, csv_file_path, _ in tables if is_url(csv_file_path)]
+    with metrics.phase("download", tables=[table_name for table_name, _, _ in tables]) as counts:
+        fetched = prefetch_urls(urls, parallel=parallel)
+        counts["bytes"] = sum(result.bytes for result in fetched.values())
+        counts["cached"] = [result.url for result in fetched.values() if result.cached]
+    return [(table_name, fetched[csv_file_path].path if csv_file_path in fetched else csv_file_path, columns)
+            for table_name, csv_file_path, columns in tables]
 
-def load_table_from_csv(cursor, table_name, csv_file_path, columns):
+def log_load_summary(timings, elapsed):
     """
-    Loads data from a CSV file into a specified PostgreSQL table.
+    Logs the per-table wall time and the total wall time of the load.
     """
-    df = pd.read_csv(csv_file_path)
-    df.columns = df.columns.str.strip()
-    rows = [tuple(row[col] for col in columns) for index, row in df.iterrows()]
-    insert_query = sql.SQL("INSERT INTO {} ({}) VALUES %s").format(
-        sql.Identifier(table_name),
-        sql.SQL(', ').join(map(sql.Identifier, columns))
-    )
-    psycopg2.extras.execute_values(cursor, insert_query, rows)
-    logger.info("Data loaded into %s table.", table_name)
+    logger.info("Load summary:")
+    for table_name, seconds in timings.items():
+        if seconds is None:
+            logger.info("  %s: failed", table_name)
+        else:
+            logger.info("  %s: %.2f s", table_name, seconds)
+    logger.info("  total wall time: %.2f s", elapsed)
 
 def main():
     # Parse command-line arguments
@@ -46,10 +128,55 @@ def main():
     parser.add_argument("--host_name", required=True, help="The hostname of the PostgreSQL server.")
     parser.add_argument("--identity_name", required=True, help="The identity name for database access.")
     parser.add_argument("--database_name", required=True, help="The name of the PostgreSQL database.")
+    parser.add_argument("--load-mode", choices=sorted(LOAD_MODES), default="copy",
+                        help="How CSV files are sent to the database: 'copy' streams them with COPY FROM STDIN, "
+                             "'binary_copy' sends typed columns in the PGCOPY binary format, "
+                             "'execute_values' uses the pandas-based INSERT path.")
+    parser.add_argument("--parallel", type=int, default=1,
+                        help="Number of tables loaded concurrently, each on its own pooled connection. "
+                             "1 loads the tables one after another on a single connection.")
+    parser.add_argument("--chunk-rows", type=int, default=DEFAULT_CHUNK_ROWS,
+                        help="Number of CSV rows read and sent to the database per batch; bounds peak memory.")
+    parser.add_argument("--incremental", action="store_true",
+                        help="Do not truncate; hash each row and upsert only new or changed rows "
+                             "(INSERT ... ON CONFLICT DO UPDATE). Ignores --load-mode.")
+    parser.add_argument("--delete-missing", action="store_true",
+                        help="With --incremental, also delete rows whose id is no longer in the source file.")
+    parser.add_argument("--checkpoint", action="store_true",
+                        help="Commit after every chunk and record the committed row offset and source fingerprint "
+                             "in the load_checkpoints table. Uses COPY; ignores --load-mode.")
+    parser.add_argument("--resume", action="store_true",
+                        help="Continue each table from its last checkpoint if the source file is unchanged. "
+                             "Implies --checkpoint.")
+    parser.add_argument("--defer-indexes", action="store_true",
+                        help="Drop the indexes and constraints of the loaded tables before the load "
+                             "and rebuild them afterwards.")
+    parser.add_argument("--index-parallel", type=int, default=4,
+                        help="Number of indexes and constraints rebuilt concurrently with --defer-indexes.")
+    parser.add_argument("--staging-swap", action="store_true",
+                        help="Do not truncate; load each table into an UNLOGGED staging copy, build its indexes, "
+                             "and swap it in with a rename so readers never see an empty or partial table. The copy is "
+                             "made LOGGED before its indexes are built, so the whole table is still written to WAL; "
+                             "only --keep-unlogged saves it.")
+    parser.add_argument("--keep-unlogged", action="store_true",
+                        help="With --staging-swap, leave the swapped-in tables UNLOGGED (the only way to skip "
+                             "writing them to WAL, but the data is lost on a crash and not replicated).")
+    parser.add_argument("--layout", choices=sorted(LAYOUT_SOURCES), default="wide",
+                        help="Layout the tables were created with (see psql_create_tables_script.py): 'wide' loads "
+                             "the orders table, 'normalized' loads order_headers and order_lines.")
+    parser.add_argument("--download-parallel", type=int, default=max(map(len, LAYOUT_SOURCES.values())),
+                        help="Number of CSV files downloaded concurrently into the local source cache before "
+                             "the load. 0 streams each file from the server while it is loaded instead.")
+    parser.add_argument("--source-compression", choices=sorted(COMPRESSION_SUFFIXES),
+                        help="Load the compressed copies of the CSV files (e.g. orders.csv.zst) instead of the plain "
+                             "ones; they are decompressed as a stream while they are loaded.")
+    parser.add_argument("--metrics-file",
+                        help="Append a JSON-lines metrics record per load phase (token, connect, truncate, parse, "
+                             "transfer, commit, index_build, download) to this file; '-' writes them to stdout.")
     args = parser.parse_args()
 
     # Assign arguments to variables
-    basrUrl = args.basrUrl
+    basrUrl = args.baseUrl
     host_name = args.host_name
     identity_name = args.identity_name
     database_name = args.database_name
@@ -65,12 +192,69 @@ def main():
     logger.info("Host Name: %s", host_name)   
     logger.info("Identity Name: %s", identity_name)
     logger.info("Database Name: %s", database_name)
-    
+    logger.info("Load Mode: %s", args.load_mode)
+    logger.info("Parallel: %d", args.parallel)
+    logger.info("Chunk Rows: %d", args.chunk_rows)
+    logger.info("Incremental: %s (delete missing rows: %s)", args.incremental, args.delete_missing)
+    logger.info("Checkpoint: %s (resume: %s)", args.checkpoint or args.resume, args.resume)
+    logger.info("Defer Indexes: %s (rebuild parallel: %d)", args.defer_indexes, args.index_parallel)
+    logger.info("Staging Swap: %s (keep unlogged: %s)", args.staging_swap, args.keep_unlogged)
+    logger.info("Layout: %s", args.layout)
+    logger.info("Download Parallel: %d", args.download_parallel)
+    logger.info("Source Compression: %s", args.source_compression)
+
+    if args.parallel < 1 or args.chunk_rows < 1 or args.index_parallel < 1:
+        logger.error("--parallel, --chunk-rows and --index-parallel must be at least 1")
+        sys.exit(1)
+    if args.download_parallel < 0:
+        logger.error("--download-parallel must not be negative")
+        sys.exit(1)
+    if args.delete_missing and not args.incremental:
+        logger.error("--delete-missing requires --incremental")
+        sys.exit(1)
+
+    if args.incremental and (args.checkpoint or args.resume or args.defer_indexes):
+        logger.error("--incremental cannot be combined with --checkpoint, --resume or --defer-indexes")
+        sys.exit(1)
+
+    if args.keep_unlogged and not args.staging_swap:
+        logger.error("--keep-unlogged requires --staging-swap")
+        sys.exit(1)
+    if args.staging_swap and (args.incremental or args.checkpoint or args.resume or args.defer_indexes):
+        logger.error("--staging-swap cannot be combined with --incremental, --checkpoint, --resume or --defer-indexes")
+        sys.exit(1)
+    if args.staging_swap and args.layout == "normalized":
+        # Foreign keys and the orders view would keep pointing at the replaced tables
+        logger.error("--staging-swap cannot be used with --layout normalized")
+        sys.exit(1)
+
+    if args.checkpoint or args.resume:
+        load_table = functools.partial(copy_table_with_checkpoints, chunk_rows=args.chunk_rows, resume=args.resume)
+    elif args.incremental:
+        load_table = functools.partial(upsert_table_from_csv, chunk_rows=args.chunk_rows,
+                                       delete_missing=args.delete_missing)
+    else:
+        load_table = functools.partial(LOAD_MODES[args.load_mode], chunk_rows=args.chunk_rows)
+    metrics = MetricsRecorder(args.metrics_file)
+    if args.staging_swap:
+        load_table = functools.partial(load_table_via_staging, load_table=load_table, keep_unlogged=args.keep_unlogged,
+                                       metrics=metrics)
+
+    conn = None
+    cursor = None
     try:
+        suffix = COMPRESSION_SUFFIXES.get(args.source_compression, "")
+        tables = [(table_name, os.path.join(basrUrl, csv_path) + suffix, columns)
+                  for table_name, csv_path, columns in LAYOUT_SOURCES[args.layout]]
+        if args.download_parallel > 0:
+            # Download before anything is truncated, so a failed download leaves the tables as they are
+            tables = fetch_table_sources(tables, args.download_parallel, metrics)
+
         # Acquire the access token
         logger.info("Acquiring access token...")
-        cred = DefaultAzureCredential()
-        access_token = cred.get_token("https://ossrdbms-aad.database.windows.net/.default")
+        with metrics.phase("token"):
+            cred = DefaultAzureCredential()
+            access_token = cred.get_token("https://ossrdbms-aad.database.windows.net/.default")
         logger.info("Access token acquired.")
         #password = access_token.token
       
@@ -82,47 +266,73 @@ def main():
             )
         )
         
-        conn = psycopg2.connect(conn_string)
+        with metrics.phase("connect"):
+            conn = psycopg2.connect(conn_string)
         cursor = conn.cursor()
         logger.info("Database connection established.")
 
-        try:
-        # Truncate the tables
-            truncate_tables(cursor, ["products", "customers", "orders"])
+        table_names = [table_name for table_name, _, _ in tables]
+        if args.incremental:
+            # Incremental loads keep the existing rows and compare against the stored row hashes
+            ensure_row_hash_table(cursor)
+            clear_checkpoints(cursor, table_names)
             conn.commit()
-        except Exception as e:
-            logger.error("An error occurred while truncating tables: %s", e)
-            conn.rollback() # Rollback the transaction in case of error
-
-        try:
-        # Load data into the products table
-            csv_file_path_products = os.path.join(basrUrl, 'infra/data/postgresql_db_sample_data/products.csv')
-            load_table_from_csv(cursor, 'products', csv_file_path_products, 
-                ['id', 'product_name', 'price', 'category', 'brand', 'product_description'])
+        elif args.checkpoint or args.resume:
+            # Checkpointed loads truncate each table themselves unless they resume it
+            ensure_checkpoint_table(cursor)
+            conn.commit()
+        elif args.staging_swap:
+            # The live tables are replaced, not truncated; their stored load state no longer applies
+            clear_row_hashes(cursor, table_names)
+            clear_checkpoints(cursor, table_names)
             conn.commit()
-        except Exception as e:
-            logger.error("An error occurred while loading products table: %s", e)
-            conn.rollback() # Rollback the transaction in case of error
+        else:
+            try:
+            # Truncate the tables
+                with metrics.phase("truncate", tables=table_names):
+                    truncate_tables(cursor, table_names)
+                    clear_row_hashes(cursor, table_names)
+                    clear_checkpoints(cursor, table_names)
+                    conn.commit()
+            except Exception as e:
+                logger.error("An error occurred while truncating tables: %s", e)
+                conn.rollback() # Rollback the transaction in case of error
 
-        try:
-        # Load data into the customers table
-            csv_file_path_customers = os.path.join(basrUrl, 'infra/data/postgresql_db_sample_data/customers.csv')
-            load_table_from_csv(cursor, 'customers', csv_file_path_customers, 
-                ['id', 'first_name', 'last_name', 'gender', 'date_of_birth', 'age', 'email', 'phone', 'post_address', 'membership'])
+        deferred_indexes = []
+        if args.defer_indexes:
+            # Indexes and constraints are rebuilt once after the load instead of maintained per row
+            deferred_indexes = capture_index_definitions(cursor, table_names)
+            drop_index_definitions(cursor, deferred_indexes)
             conn.commit()
-        except Exception as e:
-            logger.error("An error occurred while loading customers table: %s", e)
-            conn.rollback() # Rollback the transaction in case of error
-        
+
+        start = time.perf_counter()
         try:
-        # Load data into the orders table
-            csv_file_path_orders = os.path.join(basrUrl, 'infra/data/postgresql_db_sample_data/orders.csv')
-            load_table_from_csv(cursor, 'orders', csv_file_path_orders, 
-                ['id', 'customer_id', 'product_id', 'quantity', 'total', 'order_date', 'customer_first_name', 'customer_last_name', 'unit_price', 'category', 'brand', 'product_description', 'return_status'])
-            conn.commit()
-        except Exception as e:
-            logger.error("An error occurred while loading orders table: %s", e)
-            conn.rollback() # Rollback the transaction in case of error
+            if args.parallel > 1:
+                # Tables are loaded after the tables their foreign keys reference
+                timings = {}
+                for stage in load_stages(table_names):
+                    timings.update(load_tables_concurrently(
+                        conn_string, [table for table in tables if table[0] in stage], load_table, args.parallel,
+                        metrics))
+            else:
+                timings = {}
+                for table_name, csv_file_path, columns in tables:
+                    try:
+                        timings[table_name] = load_table_in_transaction(conn, load_table, table_name, csv_file_path,
+                                                                        columns, metrics)
+                        logger.info("Loaded %s table in %.2f s.", table_name, timings[table_name])
+                    except Exception as e:
+                        timings[table_name] = None
+                        logger.error("An error occurred while loading %s table: %s", table_name, e)
+            elapsed = time.perf_counter() - start
+            log_load_summary(timings, elapsed)
+            metrics.record("load", elapsed, tables=table_names,
+                           failed=[table_name for table_name, seconds in timings.items() if seconds is None])
+        finally:
+            if deferred_indexes:
+                rebuild_seconds = rebuild_index_definitions(conn_string, deferred_indexes, args.index_parallel)
+                metrics.record("index_build", rebuild_seconds, indexes=len(deferred_indexes))
+                logger.info("Rebuilt %d indexes and constraints in %.2f s.", len(deferred_indexes), rebuild_seconds)
 
     except Exception as e:
         logger.error("An error occurred while executint main program: %s", e)
@@ -131,6 +341,7 @@ def main():
             cursor.close()
         if conn:
             conn.close()
+        metrics.close()
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
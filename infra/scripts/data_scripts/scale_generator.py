@@ -0,0 +1,331 @@
+"""
+Scale-factor generator of complete, referentially intact sample datasets.
+
+One scale factor sizes every table in proportion to the sample data (scale factor 1 is the
+size of infra/data/postgresql_db_sample_data: 20 products, 43 customers and 300 orders), much
+like the scale factor of TPC-H. The generator writes, into one output directory:
+- products.csv: the sample products, then numbered variants of them at other prices.
+- customers.csv: customers with names drawn from the 513 unique names of src/generate_samples,
+  birth dates, unique emails, phones and addresses.
+- orders.csv (or order_headers.csv and order_lines.csv with --layout normalized): orders
+  picking from the generated customers and products, generated in deterministic shards by
+  sharded_generator.py.
+- retail_simple/: the tables of the Generate_* notebooks for the same customers (Customer,
+  CustomerRelationshipType, CustomerAccount, CustomerTradeName and Location), following the
+  notebooks' rules (customer types and tiers, one or two accounts per customer, trade names
+  of business and government customers, one address per customer).
+- manifest.json: the scale factor, seed and row count of every file.
+
+Every key is generated from the row it belongs to, so every foreign key resolves by construction;
+the files are checked once more after generation, chunk by chunk, against the key ranges of the
+referenced tables. The same scale factor and seed always give the
+same files, whatever the number of workers.
+
+Example:
+    python scale_generator.py --scale-factor 100 --output-dir sf100 --workers 8
+"""
+import argparse
+import contextlib
+import json
+import logging
+import os
+import sys
+import time
+import zlib
+
+import numpy as np
+import pandas as pd
+
+from batch_pipeline import csv_bytes, write_csv_batches
+from bulk_load import DEFAULT_CHUNK_ROWS, open_csv_source
+from compressed_io import COMPRESSION_SUFFIXES, open_output
+from customer_generator import (
+    CUSTOMER_TABLES, GENERATE_SAMPLES_DIR, NAMES_PATH, RETAIL_SIMPLE_COLUMNS, format_ids, generate_customer_batches,
+    table_columns
+)
+from order_generator import ORDER_TABLES, SAMPLE_DATA_DIR, read_table_csv
+from schema_registry import TABLE_SCHEMAS
+from sharded_generator import (
+    DEFAULT_BATCH_ROWS, DEFAULT_SHARD_ROWS, generate_table, load_orders_context, plan_shards, shard_seed
+)
+
+logger = logging.getLogger(__name__)
+
+# Rows of each table at scale factor 1: the sizes of the sample data
+BASE_ROWS = {
+    'products': 20,
+    'customers': 43,
+    'orders': 300,
+}
+
+RELATIONSHIP_TYPES_PATH = os.path.join(GENERATE_SAMPLES_DIR, "output", "CustomerRelationshipType_Samples.csv")
+
+# Subdirectory of the retail_simple tables
+RETAIL_SIMPLE_DIR = "retail_simple"
+
+# Foreign keys checked after generation, as (table, column, referenced table, referenced column)
+REFERENCES = [
+    ('orders', 'customer_id', 'customers', 'id'),
+    ('orders', 'product_id', 'products', 'id'),
+    ('order_headers', 'customer_id', 'customers', 'id'),
+    ('order_lines', 'order_id', 'order_headers', 'id'),
+    ('order_lines', 'product_id', 'products', 'id'),
+    ('Customer', 'CustomerRelationshipTypeId', 'CustomerRelationshipType', 'CustomerRelationshipTypeId'),
+    ('CustomerAccount', 'CustomerId', 'Customer', 'CustomerId'),
+    ('CustomerTradeName', 'CustomerId', 'Customer', 'CustomerId'),
+    ('Location', 'CustomerId', 'Customer', 'CustomerId'),
+]
+
+# Referenced keys that the generator numbers 1 to n in file order, with their format: None for
+# integers, or (prefix, minimum digits) for notebook-style keys such as CID-001. Foreign keys to
+# them are checked against the range 1..n. The other referenced keys are those of small lookup
+# tables, whose size does not grow with the scale factor; they are compared as a set.
+DENSE_KEYS = {
+    ('customers', 'id'): None,
+    ('products', 'id'): None,
+    ('order_headers', 'id'): None,
+    ('Customer', 'CustomerId'): ('CID', 3),
+}
+
+def scaled_rows(scale_factor):
+    """
+    Returns the row count of products, customers and orders at a scale factor (at least one each).
+    """
+    return {table_name: max(1, int(round(rows * scale_factor))) for table_name, rows in BASE_ROWS.items()}
+
+def table_rng(seed, table_name):
+    """
+    Returns the random generator of a table: independent of every other table's, so that a
+    table's rows do not change when others are added or resized.
+    """
+    return np.random.default_rng(np.random.SeedSequence([seed, zlib.crc32(table_name.encode("utf-8"))]))
+
+def generate_products(count, rng, templates):
+    """
+    Generates count products: the template products first, then numbered variants of them
+    ("<name> Series 2", ...) priced within -20% and +25% of the template. With the sample
+    products as templates, scale factor 1 gives exactly the sample products.
+    """
+    template_index = np.arange(count) % len(templates)
+    variant = np.arange(count) // len(templates)
+    products = templates.iloc[template_index].reset_index(drop=True)
+    prices = products['price'].to_numpy(dtype='float64')
+    factors = np.where(variant > 0, rng.uniform(0.8, 1.25, count), 1.0)
+    products['id'] = np.arange(1, count + 1)
+    products['product_name'] = [name if number == 0 else "%s Series %d" % (name, number + 1)
+                                for name, number in zip(products['product_name'], variant)]
+    products['price'] = np.round(prices * factors, 2)
+    return products[TABLE_SCHEMAS['products'].column_names]
+
+def write_customer_tables(paths, count, seed):
+    """
+    Generates count customers and writes them and their retail_simple rows to paths
+    ({table name: file}) in one pass. The customers are drawn in the shards and batches of
+    sharded_generator.py, so each file has the rows that sharded_generator.py generates for its
+    table with the same seed. Returns {table name: rows written}.
+    """
+    names = pd.read_csv(NAMES_PATH)
+    rows = dict.fromkeys(CUSTOMER_TABLES, 0)
+    with contextlib.ExitStack() as stack:
+        files = {table_name: stack.enter_context(open_output(paths[table_name], binary=True))
+                 for table_name in CUSTOMER_TABLES}
+        for shard in plan_shards(count, DEFAULT_SHARD_ROWS):
+            batches = generate_customer_batches(names, shard.rows, shard.first_row + 1, shard_seed(seed, shard.index),
+                                                rows['CustomerAccount'] + 1, rows['CustomerTradeName'] + 1,
+                                                DEFAULT_BATCH_ROWS)
+            for chunk in batches:
+                for table_name, df in chunk.items():
+                    files[table_name].write(csv_bytes(df, table_name, table_columns(table_name),
+                                                      header=rows[table_name] == 0))
+                    rows[table_name] += len(df)
+        for table_name, f in files.items():
+            if rows[table_name] == 0:
+                f.write(csv_bytes(pd.DataFrame(columns=table_columns(table_name)), table_name,
+                                  table_columns(table_name), header=True))
+    return rows
+
+def dataset_paths(output_dir, layout='wide', compression=None):
+    """
+    Returns {table name: file} of every table of a dataset written to output_dir.
+    """
+    suffix = ".csv" + (COMPRESSION_SUFFIXES[compression] if compression else "")
+    paths = {table_name: os.path.join(output_dir, table_name + suffix)
+             for table_name in ['products', 'customers'] + ORDER_TABLES[layout]}
+    paths.update((table_name, os.path.join(output_dir, RETAIL_SIMPLE_DIR, table_name + suffix))
+                 for table_name in RETAIL_SIMPLE_COLUMNS)
+    return paths
+
+def iter_key_columns(path, columns):
+    """
+    Yields some columns of a (possibly compressed) CSV file as strings, chunk by chunk.
+    """
+    with open_csv_source(path) as f:
+        yield from pd.read_csv(f, usecols=columns, dtype='string', chunksize=DEFAULT_CHUNK_ROWS)
+
+def key_numbers(values, key_format=None):
+    """
+    Returns the numbers of dense keys (1, 2, ... or e.g. CID-001, CID-002, ... for the key format
+    ('CID', 3)) as an int64 array, with 0 for missing values and values that are not such keys.
+    """
+    digits = values.str.slice(len(key_format[0]) + 1) if key_format else values
+    valid = digits.str.fullmatch(r"\d{1,18}").fillna(False).to_numpy(dtype=bool)
+    numbers = np.zeros(len(values), dtype='int64')
+    numbers[valid] = digits[valid].astype('int64').to_numpy()
+    if key_format:
+        canonical = np.array(format_ids(key_format[0], numbers[valid], key_format[1]), dtype=object)
+        valid[valid] = values[valid].to_numpy(dtype=object) == canonical
+    return np.where(valid, numbers, 0)
+
+def dense_key_count(path, column, key_format=None):
+    """
+    Returns the number of keys of a column numbered 1 to n in file order, or None if it is not.
+    """
+    count = 0
+    for chunk in iter_key_columns(path, [column]):
+        if not np.array_equal(key_numbers(chunk[column], key_format), np.arange(count + 1, count + len(chunk) + 1)):
+            return None
+        count += len(chunk)
+    return count
+
+def key_check(paths, table_name, column):
+    """
+    Reads the keys of a referenced column and returns a function counting the values of a chunk
+    of foreign keys that do not resolve to them, or None if the keys are not unique (or, for
+    DENSE_KEYS, not numbered 1 to n). Dense keys are only counted; the others are kept as a set.
+    """
+    if (table_name, column) in DENSE_KEYS:
+        key_format = DENSE_KEYS[table_name, column]
+        count = dense_key_count(paths[table_name], column, key_format)
+        if count is None:
+            return None
+
+        def unresolved(values):
+            numbers = key_numbers(values, key_format)
+            return int(((numbers < 1) | (numbers > count)).sum())
+        return unresolved
+    keys = set()
+    count = 0
+    for chunk in iter_key_columns(paths[table_name], [column]):
+        keys.update(chunk[column].dropna())
+        count += len(chunk)
+    if len(keys) != count:
+        return None
+    return lambda values: int((~values.isin(keys)).sum())
+
+def verify_references(paths):
+    """
+    Checks that the referenced keys of REFERENCES are unique and that every foreign key of the
+    generated files resolves, reading each file chunk by chunk so that memory does not grow
+    with the scale factor. Returns a list of the problems found (empty if none).
+    """
+    references = [reference for reference in REFERENCES if reference[0] in paths and reference[2] in paths]
+    problems = []
+    checks = {}
+    for _, _, ref_table, ref_column in references:
+        if (ref_table, ref_column) not in checks:
+            checks[ref_table, ref_column] = key_check(paths, ref_table, ref_column)
+            if checks[ref_table, ref_column] is None:
+                problems.append("%s.%s has duplicate or unnumbered keys" % (ref_table, ref_column))
+    for table_name in dict.fromkeys(reference[0] for reference in references):
+        table_references = [reference for reference in references
+                            if reference[0] == table_name and checks[reference[2], reference[3]] is not None]
+        if not table_references:
+            continue
+        rows = 0
+        missing = dict.fromkeys(table_references, 0)
+        columns = sorted(set(reference[1] for reference in table_references))
+        for chunk in iter_key_columns(paths[table_name], columns):
+            rows += len(chunk)
+            for reference in table_references:
+                missing[reference] += checks[reference[2], reference[3]](chunk[reference[1]])
+        for (_, column, ref_table, ref_column), count in missing.items():
+            if count:
+                problems.append("%d %s.%s values do not resolve to %s.%s" % (count, table_name, column, ref_table, ref_column))
+            else:
+                logger.info("%s.%s -> %s.%s: %d rows resolve.", table_name, column, ref_table, ref_column, rows)
+    return problems
+
+def generate_dataset(scale_factor, output_dir, seed=42, layout='wide', workers=None, skew=False, compression=None,
+                     verify=True):
+    """
+    Generates the dataset of a scale factor into output_dir (see the module docstring) and
+    returns its manifest. Raises ValueError if a foreign key does not resolve.
+    """
+    start = time.perf_counter()
+    rows = scaled_rows(scale_factor)
+    paths = dataset_paths(output_dir, layout, compression)
+    os.makedirs(os.path.join(output_dir, RETAIL_SIMPLE_DIR), exist_ok=True)
+    written = {}
+
+    templates = read_table_csv(os.path.join(SAMPLE_DATA_DIR, "products.csv"), 'products')
+    products = generate_products(rows['products'], table_rng(seed, 'products'), templates)
+    written['products'] = write_csv_batches([products], paths['products'], 'products', products.columns.tolist())
+    logger.info("Generated %d products.", written['products'])
+
+    written.update(write_customer_tables(paths, rows['customers'], seed))
+    logger.info("Generated %d customers and their retail_simple rows.", written['customers'])
+    relationship_types = pd.read_csv(RELATIONSHIP_TYPES_PATH)
+    written['CustomerRelationshipType'] = write_csv_batches(
+        [relationship_types], paths['CustomerRelationshipType'], 'CustomerRelationshipType',
+        RETAIL_SIMPLE_COLUMNS['CustomerRelationshipType'])
+
+    # The orders pick from the files just written, read back as the loader reads them
+    context = load_orders_context(seed, skew, paths['customers'], paths['products'])
+    for table_name in ORDER_TABLES[layout]:
+        generate_table(table_name, rows['orders'], paths[table_name], seed, workers, DEFAULT_SHARD_ROWS,
+                       DEFAULT_BATCH_ROWS, context=context)
+        written[table_name] = rows['orders']
+
+    if verify:
+        problems = verify_references(paths)
+        if problems:
+            raise ValueError("Unresolved references in %s: %s" % (output_dir, "; ".join(problems)))
+
+    manifest = {
+        'scale_factor': scale_factor,
+        'seed': seed,
+        'layout': layout,
+        'skew': skew,
+        'tables': {table_name: {'file': os.path.relpath(path, output_dir), 'rows': written[table_name]}
+                   for table_name, path in paths.items()},
+    }
+    with open(os.path.join(output_dir, "manifest.json"), "w") as f:
+        json.dump(manifest, f, indent=2)
+    logger.info("Generated the scale factor %g dataset in %s in %.2f s.", scale_factor, output_dir,
+                time.perf_counter() - start)
+    return manifest
+
+def main():
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(levelname)s - %(message)s',
+        handlers=[logging.StreamHandler(sys.stdout)]
+    )
+    parser = argparse.ArgumentParser(description="Generate a referentially intact sample dataset at a scale factor.")
+    parser.add_argument("--scale-factor", type=float, required=True,
+                        help="Size relative to the sample data: 1 gives 20 products, 43 customers and 300 orders.")
+    parser.add_argument("--output-dir", required=True, help="Directory to write the dataset to.")
+    parser.add_argument("--seed", type=int, default=42, help="Seed of the generated data.")
+    parser.add_argument("--layout", choices=sorted(ORDER_TABLES), default='wide',
+                        help="Write an orders file, or order_headers and order_lines files.")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="Worker processes generating the orders.")
+    parser.add_argument("--skew", action="store_true", help="Draw skewed instead of uniform order distributions "
+                                                            "(e.g. hot products and frequent customers).")
+    parser.add_argument("--compression", choices=sorted(COMPRESSION_SUFFIXES), help="Compress the written files.")
+    parser.add_argument("--skip-verify", action="store_true",
+                        help="Do not read the files back to check that every foreign key resolves.")
+    args = parser.parse_args()
+
+    if args.scale_factor <= 0 or args.seed < 0 or args.workers < 1:
+        logger.error("--scale-factor must be positive, --seed not negative and --workers at least 1")
+        sys.exit(1)
+
+    try:
+        generate_dataset(args.scale_factor, args.output_dir, args.seed, args.layout, args.workers, args.skew,
+                         args.compression, verify=not args.skip_verify)
+    except ValueError as error:
+        logger.error("%s", error)
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,390 @@
+"""
+Schema registry of the sample PostgreSQL tables.
+
+The column names, SQL types and source date formats of every table are defined once here.
+The create scripts generate their DDL from it, and the loaders use it to parse source files
+with explicit types instead of inferring them: pandas dtypes, Arrow CSV column types when
+pyarrow is installed, and converters that turn source dates into ISO dates before they
+reach the server. Numeric columns are never parsed as floats: the loaders read them as
+strings and turn them into decimal.Decimal values, so prices and totals reach the server
+exactly as they are written in the source.
+
+Regenerate the _postgresql_db_scripts DDL after changing a table with:
+    python schema_registry.py --sql > ../_create_postgresql_sample_data/_postgresql_db_scripts/db_create_tables.sql
+    python schema_registry.py --sql --layout normalized > ../_create_postgresql_sample_data/_postgresql_db_scripts/db_create_tables_normalized.sql
+"""
+import argparse
+import datetime
+import re
+from collections import namedtuple
+
+try:
+    import pyarrow as pa
+except ImportError:
+    pa = None
+
+# One column of a table. date_format is the strptime format of the values in the source
+# files, for date columns whose files do not use ISO dates.
+Column = namedtuple("Column", ["name", "sql_type", "not_null", "default", "date_format"],
+                    defaults=(False, None, None))
+
+# A foreign key from columns of a table to ref_columns of ref_table
+ForeignKey = namedtuple("ForeignKey", ["columns", "ref_table", "ref_columns"])
+
+# A secondary index: its key columns and the non-key columns it carries (INCLUDE). method is the
+# index access method (B-tree when None) and opclass the operator class of the key columns.
+Index = namedtuple("Index", ["name", "columns", "include", "method", "opclass"], defaults=((), None, None))
+
+class TableSchema(namedtuple("TableSchema", ["name", "columns", "load_columns", "primary_key", "unique",
+                                             "foreign_keys", "indexes"], defaults=(None, (), (), ()))):
+    """
+    Columns of a table, in DDL order, and the columns the loaders fill from the source files
+    (None for tables that are not loaded from files). primary_key is a list of columns, unique
+    a list of column lists, foreign_keys a list of ForeignKey and indexes a list of Index.
+    """
+    @property
+    def column_names(self):
+        return [column.name for column in self.columns]
+
+    def column(self, name):
+        for column in self.columns:
+            if column.name == name:
+                return column
+        raise KeyError("Table %s has no column %s" % (self.name, name))
+
+TABLE_SCHEMAS = {
+    'products': TableSchema('products', [
+        Column('id', 'integer'),
+        Column('product_name', 'character varying(100)'),
+        Column('price', 'numeric(10,2)', not_null=True),
+        Column('category', 'character varying(50)'),
+        Column('brand', 'character varying(50)'),
+        Column('product_description', 'text'),
+    ], load_columns=['id', 'product_name', 'price', 'category', 'brand', 'product_description'],
+       primary_key=['id']),
+    'customers': TableSchema('customers', [
+        Column('id', 'integer'),
+        Column('first_name', 'character varying(50)'),
+        Column('last_name', 'character varying(50)'),
+        Column('gender', 'character varying(10)'),
+        Column('date_of_birth', 'date', date_format='%m/%d/%Y'),
+        Column('age', 'integer'),
+        Column('email', 'character varying(100)'),
+        Column('phone', 'character varying(20)'),
+        Column('post_address', 'character varying(255)'),
+        Column('membership', 'character varying(50)'),
+    ], load_columns=['id', 'first_name', 'last_name', 'gender', 'date_of_birth', 'age', 'email', 'phone',
+                     'post_address', 'membership'], primary_key=['id'],
+       indexes=[
+           # Customer lookups by name and email; with id included, the name lookup of the orders
+           # view of the normalized layout is an index-only scan
+           Index('customers_name_idx', ['first_name', 'last_name'], include=['id']),
+           Index('customers_email_idx', ['email'], include=['id']),
+       ]),
+    'orders': TableSchema('orders', [
+        Column('id', 'integer'),
+        Column('customer_id', 'integer'),
+        Column('customer_first_name', 'character varying(50)'),
+        Column('customer_last_name', 'character varying(50)'),
+        Column('customer_gender', 'character varying(10)'),
+        Column('customer_age', 'integer'),
+        Column('customer_email', 'character varying(100)'),
+        Column('customer_phone', 'character varying(20)'),
+        Column('order_date', 'date', date_format='%Y-%m-%d'),
+        Column('product_id', 'integer'),
+        Column('product_name', 'character varying(100)'),
+        Column('quantity', 'integer'),
+        Column('unit_price', 'numeric(10,2)'),
+        Column('total', 'numeric(10,2)'),
+        Column('category', 'character varying(50)'),
+        Column('brand', 'character varying(50)'),
+        Column('product_description', 'text'),
+        Column('return_status', 'boolean', default='FALSE'),
+    ], load_columns=['id', 'customer_id', 'product_id', 'quantity', 'total', 'order_date', 'customer_first_name',
+                     'customer_last_name', 'unit_price', 'category', 'brand', 'product_description', 'return_status'],
+       primary_key=['id'],
+       indexes=[
+           # get_orders.py and chatbot_query.sql: equality on the first (and last) name, then
+           # ORDER BY order_date LIMIT n, which reads the first n entries of the index in order
+           Index('orders_customer_name_date_idx', ['customer_first_name', 'customer_last_name', 'order_date']),
+           Index('orders_customer_id_date_idx', ['customer_id', 'order_date']),
+       ]),
+    # Normalized layout of the orders: one header per order and one line per ordered product,
+    # with the customer and product columns kept only in their own tables
+    'order_headers': TableSchema('order_headers', [
+        Column('id', 'integer', not_null=True),
+        Column('customer_id', 'integer', not_null=True),
+        Column('order_date', 'date', date_format='%Y-%m-%d'),
+    ], load_columns=['id', 'customer_id', 'order_date'], primary_key=['id'],
+       foreign_keys=[ForeignKey(['customer_id'], 'customers', ['id'])],
+       # The orders of a customer by date, index-only; order_lines is reached through its (order_id, line_number) key
+       indexes=[Index('order_headers_customer_date_idx', ['customer_id', 'order_date'], include=['id'])]),
+    'order_lines': TableSchema('order_lines', [
+        Column('id', 'integer', not_null=True),
+        Column('order_id', 'integer', not_null=True),
+        Column('line_number', 'integer', not_null=True),
+        Column('product_id', 'integer', not_null=True),
+        Column('quantity', 'integer'),
+        Column('unit_price', 'numeric(10,2)'),
+        Column('total', 'numeric(10,2)'),
+        Column('return_status', 'boolean', default='FALSE'),
+    ], load_columns=['id', 'order_id', 'line_number', 'product_id', 'quantity', 'unit_price', 'total', 'return_status'],
+       primary_key=['id'], unique=[['order_id', 'line_number']],
+       foreign_keys=[ForeignKey(['order_id'], 'order_headers', ['id']), ForeignKey(['product_id'], 'products', ['id'])],
+       indexes=[Index('order_lines_product_id_idx', ['product_id'])]),
+    'vector_store': TableSchema('vector_store', [
+        Column('id', 'text'),
+        Column('title', 'text'),
+        Column('chunk', 'integer'),
+        Column('chunk_id', 'text'),
+        Column('offset', 'integer'),
+        Column('page_number', 'integer'),
+        Column('content', 'text'),
+        Column('source', 'text'),
+        Column('metadata', 'text'),
+        Column('content_vector', 'public.vector(1536)'),
+    ], load_columns=None,
+       # Cosine similarity search over the embeddings. An HNSW build over a loaded table is much
+       # faster than inserting into the graph row by row; see create_psql_tables_use_key_vault.py
+       indexes=[Index('vector_store_content_vector_idx', ['content_vector'], method='hnsw',
+                      opclass='vector_cosine_ops')]),
+}
+
+# Tables of the sample e-commerce data, in load order
+SAMPLE_TABLES = ['products', 'customers', 'orders']
+
+# Tables of each layout of the sample data, in load order. The normalized layout replaces the
+# orders table with order_headers and order_lines and a view named orders (see ORDERS_VIEW_COLUMNS).
+LAYOUT_TABLES = {
+    'wide': SAMPLE_TABLES,
+    'normalized': ['products', 'customers', 'order_headers', 'order_lines'],
+}
+
+# Columns of the orders view of the normalized layout, as (column, source), in the column order
+# of the wide orders table. The sources are columns of order_headers (h), order_lines (l),
+# customers (c) and products (p).
+ORDERS_VIEW_COLUMNS = [
+    ('id', 'h.id'),
+    ('customer_id', 'h.customer_id'),
+    ('customer_first_name', 'c.first_name'),
+    ('customer_last_name', 'c.last_name'),
+    ('customer_gender', 'c.gender'),
+    ('customer_age', 'c.age'),
+    ('customer_email', 'c.email'),
+    ('customer_phone', 'c.phone'),
+    ('order_date', 'h.order_date'),
+    ('product_id', 'l.product_id'),
+    ('product_name', 'p.product_name'),
+    ('quantity', 'l.quantity'),
+    ('unit_price', 'l.unit_price'),
+    ('total', 'l.total'),
+    ('category', 'p.category'),
+    ('brand', 'p.brand'),
+    ('product_description', 'p.product_description'),
+    ('return_status', 'l.return_status'),
+]
+
+# Column names that must be quoted in DDL
+RESERVED_WORDS = {'offset', 'order', 'user', 'limit', 'group', 'table', 'select', 'from', 'where'}
+
+def quote_identifier(name):
+    if re.match(r'^[a-z_][a-z0-9_]*$', name) and name not in RESERVED_WORDS:
+        return name
+    return '"%s"' % name.replace('"', '""')
+
+def qualified_name(name, schema_name):
+    return "%s.%s" % (schema_name, name) if schema_name else name
+
+def column_list(columns):
+    return ", ".join(quote_identifier(column) for column in columns)
+
+def create_table_sql(table_name, schema_name='public', if_not_exists=True):
+    """
+    Returns the CREATE TABLE statement of a table, qualified with schema_name unless it is None.
+    Referenced tables of foreign keys are qualified with the same schema.
+    """
+    schema = TABLE_SCHEMAS[table_name]
+    lines = []
+    for column in schema.columns:
+        line = "%s %s" % (quote_identifier(column.name), column.sql_type)
+        if column.not_null:
+            line += " NOT NULL"
+        if column.default is not None:
+            line += " DEFAULT %s" % column.default
+        lines.append("    " + line)
+    if schema.primary_key:
+        lines.append("    PRIMARY KEY (%s)" % column_list(schema.primary_key))
+    for columns in schema.unique:
+        lines.append("    UNIQUE (%s)" % column_list(columns))
+    for foreign_key in schema.foreign_keys:
+        lines.append("    FOREIGN KEY (%s) REFERENCES %s (%s)" % (
+            column_list(foreign_key.columns), qualified_name(foreign_key.ref_table, schema_name),
+            column_list(foreign_key.ref_columns)))
+    return "CREATE TABLE %s%s\n(\n%s\n);\n" % (
+        "IF NOT EXISTS " if if_not_exists else "", qualified_name(table_name, schema_name), ",\n".join(lines))
+
+def create_indexes_sql(table_name, schema_name='public', if_not_exists=True):
+    """
+    Returns the CREATE INDEX statements of the secondary indexes of a table, qualified with
+    schema_name unless it is None.
+    """
+    statements = []
+    for index in TABLE_SCHEMAS[table_name].indexes:
+        keys = column_list(index.columns)
+        if index.opclass:
+            keys = ", ".join("%s %s" % (quote_identifier(column), index.opclass) for column in index.columns)
+        statement = "CREATE INDEX %s%s ON %s%s (%s)" % (
+            "IF NOT EXISTS " if if_not_exists else "", quote_identifier(index.name),
+            qualified_name(table_name, schema_name), " USING %s" % index.method if index.method else "", keys)
+        if index.include:
+            statement += " INCLUDE (%s)" % column_list(index.include)
+        statements.append(statement + ";\n")
+    return statements
+
+def orders_view_sql(schema_name='public'):
+    """
+    Returns the CREATE VIEW statement of the orders view of the normalized layout, which gives
+    the order lines the columns of the wide orders table, so that queries written against
+    that table keep working.
+    """
+    columns = ",\n".join("    %s AS %s" % (source, quote_identifier(column)) for column, source in ORDERS_VIEW_COLUMNS)
+    return ("CREATE OR REPLACE VIEW %s AS\nSELECT\n%s\nFROM %s h\n"
+            "JOIN %s l ON l.order_id = h.id\nJOIN %s c ON c.id = h.customer_id\nJOIN %s p ON p.id = l.product_id;\n") % (
+        qualified_name('orders', schema_name), columns, qualified_name('order_headers', schema_name),
+        qualified_name('order_lines', schema_name), qualified_name('customers', schema_name),
+        qualified_name('products', schema_name))
+
+def load_stages(tables):
+    """
+    Groups tables into stages that can be loaded concurrently: every table comes after the
+    tables its foreign keys reference (those among `tables`). Keeps the order of `tables`
+    within a stage.
+    """
+    stage_of = {}
+    def stage(table_name):
+        if table_name not in stage_of:
+            references = [foreign_key.ref_table for foreign_key in TABLE_SCHEMAS[table_name].foreign_keys
+                          if foreign_key.ref_table in tables and foreign_key.ref_table != table_name]
+            stage_of[table_name] = 1 + max(map(stage, references), default=-1)
+        return stage_of[table_name]
+    stages = [[] for _ in range(1 + max(map(stage, tables), default=-1))]
+    for table_name in tables:
+        stages[stage_of[table_name]].append(table_name)
+    return stages
+
+def base_type(sql_type):
+    """
+    Returns the SQL type without its modifiers, e.g. 'numeric' for 'numeric(10,2)'.
+    """
+    return sql_type.split("(")[0].strip().lower()
+
+def pandas_dtype(column):
+    """
+    Returns the pandas dtype a column is parsed as; None for dates and numerics, which are
+    converted separately.
+    """
+    sql_type = base_type(column.sql_type)
+    if sql_type in ('integer', 'bigint', 'smallint'):
+        return 'Int64'
+    if sql_type in ('real', 'double precision'):
+        return 'float64'
+    if sql_type == 'boolean':
+        return 'boolean'
+    if sql_type in ('date', 'numeric'):
+        return None
+    return 'string'
+
+def pandas_dtypes(table_name, columns=None):
+    """
+    Returns {column: pandas dtype} for the non-date columns of a table (or of the given columns).
+    """
+    schema = TABLE_SCHEMAS[table_name]
+    dtypes = {}
+    for name in columns or schema.column_names:
+        dtype = pandas_dtype(schema.column(name))
+        if dtype:
+            dtypes[name] = dtype
+    return dtypes
+
+def date_columns(table_name, columns=None):
+    """
+    Returns {column: source date format} for the date columns of a table; the format is
+    None for ISO dates.
+    """
+    schema = TABLE_SCHEMAS[table_name]
+    return {name: schema.column(name).date_format for name in columns or schema.column_names
+            if base_type(schema.column(name).sql_type) == 'date'}
+
+def numeric_columns(table_name, columns=None):
+    """
+    Returns the numeric columns of a table (or of the given columns), which are read as strings
+    and converted to decimal.Decimal values.
+    """
+    schema = TABLE_SCHEMAS[table_name]
+    return [name for name in columns or schema.column_names if base_type(schema.column(name).sql_type) == 'numeric']
+
+def arrow_column_types(table_name, columns=None):
+    """
+    Returns {column: pyarrow type} for reading a table's source file with the Arrow CSV reader.
+    Dates in other formats than ISO are read as timestamps with their format as parser, and
+    numerics as strings. Requires pyarrow.
+    """
+    schema = TABLE_SCHEMAS[table_name]
+    types = {}
+    for name in columns or schema.column_names:
+        column = schema.column(name)
+        sql_type = base_type(column.sql_type)
+        if sql_type in ('integer', 'bigint', 'smallint'):
+            types[name] = pa.int64()
+        elif sql_type in ('real', 'double precision'):
+            types[name] = pa.float64()
+        elif sql_type == 'boolean':
+            types[name] = pa.bool_()
+        elif sql_type == 'date':
+            types[name] = pa.timestamp('s') if column.date_format else pa.date32()
+        else:
+            types[name] = pa.string()
+    return types
+
+def iso_date_converter(date_format):
+    """
+    Returns a function converting a source date string in date_format to an ISO date string.
+    Empty strings are passed through.
+    """
+    def convert(value):
+        return datetime.datetime.strptime(value, date_format).date().isoformat() if value else value
+    return convert
+
+def value_converters(table_name, columns):
+    """
+    Returns, per column, a function that rewrites a raw CSV value into a form the server parses
+    regardless of its DateStyle, or None when the value is sent as is.
+    """
+    formats = date_columns(table_name, columns) if table_name in TABLE_SCHEMAS else {}
+    return [iso_date_converter(formats[name]) if formats.get(name) else None for name in columns]
+
+def main():
+    parser = argparse.ArgumentParser(description="Print the DDL generated from the schema registry.")
+    parser.add_argument("--sql", action="store_true", help="Print the db_create_tables.sql script.")
+    parser.add_argument("--schema", default=None, help="Schema to qualify the table names with.")
+    parser.add_argument("--layout", choices=sorted(LAYOUT_TABLES), default='wide',
+                        help="Layout of the sample tables to print when no tables are given.")
+    parser.add_argument("tables", nargs="*", help="Tables to print.")
+    args = parser.parse_args()
+
+    if args.sql:
+        print("-- SQL script to create tables for a prototype e-commerce PostgreSQL database")
+        print("-- Generated by infra/scripts/data_scripts/schema_registry.py; edit the registry, not this file.")
+    for table_name in args.tables or LAYOUT_TABLES[args.layout]:
+        print()
+        print("-- Create the %s table" % table_name)
+        print(create_table_sql(table_name, args.schema), end="")
+        for statement in create_indexes_sql(table_name, args.schema):
+            print(statement, end="")
+    if not args.tables and args.layout == 'normalized':
+        print()
+        print("-- Create the orders view, with the columns of the wide orders table")
+        print(orders_view_sql(args.schema), end="")
+
+if __name__ == "__main__":
+    main()
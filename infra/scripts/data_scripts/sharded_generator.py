@@ -0,0 +1,241 @@
+"""
+Sharded, deterministic multi-process generation of synthetic table data.
+
+The rows of a table are split into shards of a fixed number of rows. Every shard has its own
+random stream, derived from the seed and the shard number only (NumPy SeedSequence spawn keys),
+and is written to its own part file by a process pool; the parts are then concatenated in shard
+order. The output therefore depends on the seed and the shard and batch sizes, never on the
+number of workers: the same seed gives a byte-identical file on 1 or 64 cores, and throughput grows
+with the cores given.
+
+Table generators are registered in SHARD_GENERATORS as functions
+    generate(context, rows, first_row, seed_sequence, batch_rows)
+yielding DataFrames with the columns of the table; context holds the data a table is generated
+from (e.g. the customers and products the orders pick from, and their weights with skew) and is
+built once by load_context(seed, skew), then sent to each worker. A table whose shards depend on
+one another also registers prepare(context, shards, seed), which adds what each shard needs to
+know of the shards before it to the context.
+
+Registered tables:
+- orders, order_headers and order_lines (order_generator.py), from the sample customers and products.
+- customers, and the Customer, Location, CustomerAccount and CustomerTradeName tables of the
+  Generate_* notebooks (customer_generator.py). --rows is the number of customers, also for
+  CustomerAccount and CustomerTradeName, whose files have as many rows as those customers have
+  accounts and trade names; prepare numbers them across the shards. With the same seed, the
+  tables describe the same customers, and match the files of scale_generator.py.
+
+Example:
+    python sharded_generator.py orders --rows 100000000 --workers 16 --output orders.csv.zst
+    python sharded_generator.py Customer --rows 10000000 --workers 16 --output Customer.csv
+"""
+import argparse
+import functools
+import logging
+import os
+import shutil
+import sys
+import time
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from batch_pipeline import write_csv_batches
+from compressed_io import compression_of
+from customer_generator import (
+    CUSTOMER_TABLES, NAMES_PATH, generate_customer_batches, shard_row_counts, table_columns
+)
+from order_generator import (
+    ORDER_COLUMNS, ORDER_TABLE_COLUMNS, SAMPLE_DATA_DIR, generate_order_batches, order_table_batches, read_table_csv,
+    skewed_order_weights
+)
+
+logger = logging.getLogger(__name__)
+
+# Rows per shard. Part of the output's identity: changing it changes the generated rows.
+DEFAULT_SHARD_ROWS = 1000000
+
+# Rows per DataFrame batch within a shard; bounds the memory of each worker. Also part of the
+# output's identity, since each batch draws its values in one pass.
+DEFAULT_BATCH_ROWS = 100000
+
+# A table that can be generated in shards: its columns, a function load_context(seed, skew)
+# loading its context, the batch generator of one shard, and optionally a function
+# prepare(context, shards, seed) completing the context once the shards are planned.
+ShardGenerator = namedtuple("ShardGenerator", ["columns", "load_context", "generate", "prepare"], defaults=(None,))
+
+# One shard of a table: its number, first row (0-based) and row count
+Shard = namedtuple("Shard", ["index", "first_row", "rows"])
+
+def load_orders_context(seed=None, skew=False, customers_path=None, products_path=None):
+    customers = read_table_csv(customers_path or os.path.join(SAMPLE_DATA_DIR, "customers.csv"), 'customers')
+    products = read_table_csv(products_path or os.path.join(SAMPLE_DATA_DIR, "products.csv"), 'products')
+    return {
+        'customers': customers,
+        'products': products,
+        'weights': skewed_order_weights(customers, products, seed) if skew else {},
+    }
+
+def generate_orders_shard(context, rows, first_row, seed_sequence, batch_rows):
+    return generate_order_batches(context['customers'], context['products'], rows, batch_rows,
+                                  seed=seed_sequence, first_order_id=first_row + 1, **context['weights'])
+
+def generate_order_table_shard(table_name, context, rows, first_row, seed_sequence, batch_rows):
+    """
+    Generates the orders of a shard as rows of order_headers or order_lines. With the same seed
+    both tables describe the same orders, so they can be generated separately.
+    """
+    batches = generate_orders_shard(context, rows, first_row, seed_sequence, batch_rows)
+    return order_table_batches(batches, table_name)
+
+def load_customers_context(seed=None, skew=False):
+    return {'names': pd.read_csv(NAMES_PATH)}
+
+def prepare_customers_context(context, shards, seed):
+    """
+    Adds the first account and trade name number of every shard, by its first row, to the
+    context: the shards before it are counted, drawing only their structure.
+    """
+    first_numbers = {}
+    accounts = trade_names = 0
+    for shard in shards:
+        first_numbers[shard.first_row] = (accounts + 1, trade_names + 1)
+        shard_accounts, shard_trade_names = shard_row_counts(shard_seed(seed, shard.index), shard.rows)
+        accounts += shard_accounts
+        trade_names += shard_trade_names
+    return dict(context, first_numbers=first_numbers)
+
+def generate_customer_table_shard(table_name, context, rows, first_row, seed_sequence, batch_rows):
+    """
+    Generates the rows of one of the CUSTOMER_TABLES for a shard of customers.
+    """
+    first_account_number, first_trade_name_number = context['first_numbers'][first_row]
+    for batch in generate_customer_batches(context['names'], rows, first_row + 1, seed_sequence, first_account_number,
+                                           first_trade_name_number, batch_rows):
+        yield batch[table_name]
+
+SHARD_GENERATORS = {
+    'orders': ShardGenerator(ORDER_COLUMNS, load_orders_context, generate_orders_shard),
+    'order_headers': ShardGenerator(ORDER_TABLE_COLUMNS['order_headers'], load_orders_context,
+                                    functools.partial(generate_order_table_shard, 'order_headers')),
+    'order_lines': ShardGenerator(ORDER_TABLE_COLUMNS['order_lines'], load_orders_context,
+                                  functools.partial(generate_order_table_shard, 'order_lines')),
+}
+SHARD_GENERATORS.update(
+    (table_name, ShardGenerator(table_columns(table_name), load_customers_context,
+                                functools.partial(generate_customer_table_shard, table_name), prepare_customers_context))
+    for table_name in CUSTOMER_TABLES
+)
+
+def plan_shards(total_rows, shard_rows=DEFAULT_SHARD_ROWS):
+    """
+    Splits total_rows rows into shards of shard_rows rows (the last one may be smaller).
+    """
+    return [Shard(index, first_row, min(shard_rows, total_rows - first_row))
+            for index, first_row in enumerate(range(0, total_rows, shard_rows))]
+
+def shard_seed(seed, shard_index):
+    """
+    Returns the seed sequence of one shard: independent of every other shard's, and the same
+    for a given seed and shard number no matter which process generates it.
+    """
+    return np.random.SeedSequence(seed, spawn_key=(shard_index,))
+
+def part_path(output_path, shard_index):
+    return "%s.part-%05d" % (output_path, shard_index)
+
+# Context of the table generated by this worker process, set once by init_worker
+_worker_context = None
+
+def init_worker(context):
+    global _worker_context
+    _worker_context = context
+
+def write_shard(table_name, shard, seed, output_path, batch_rows, compression=None):
+    """
+    Generates one shard and writes it to its part file; shard 0 also writes the CSV header.
+    Returns (rows written, seconds).
+    """
+    start = time.perf_counter()
+    generator = SHARD_GENERATORS[table_name]
+    batches = generator.generate(_worker_context, shard.rows, shard.first_row, shard_seed(seed, shard.index), batch_rows)
+    rows = write_csv_batches(batches, part_path(output_path, shard.index), table_name, generator.columns,
+                             header=shard.index == 0, compression=compression)
+    return rows, time.perf_counter() - start
+
+def concatenate_parts(output_path, shard_count):
+    """
+    Concatenates the part files into output_path in shard order and removes them.
+    Concatenated gzip members and zstd frames form a valid compressed file.
+    """
+    partial_path = output_path + ".partial"
+    with open(partial_path, "wb") as target:
+        for index in range(shard_count):
+            with open(part_path(output_path, index), "rb") as source:
+                shutil.copyfileobj(source, target, 1024 * 1024)
+    os.replace(partial_path, output_path)
+    for index in range(shard_count):
+        os.remove(part_path(output_path, index))
+
+def generate_table(table_name, total_rows, output_path, seed=42, workers=None, shard_rows=DEFAULT_SHARD_ROWS,
+                   batch_rows=DEFAULT_BATCH_ROWS, compression=None, context=None, skew=False):
+    """
+    Generates total_rows rows of a table (for the customer tables, the rows of total_rows
+    customers) into a CSV file (compressed as its extension says, or as compression), running
+    the shards on up to `workers` processes (default: all cores).
+    With skew, values are drawn from skewed instead of uniform distributions.
+    Returns the wall time in seconds.
+    """
+    generator = SHARD_GENERATORS[table_name]
+    context = generator.load_context(seed, skew) if context is None else context
+    # The part files are compressed like the output, whose extension they do not have
+    compression = compression or compression_of(output_path)
+    shards = plan_shards(total_rows, shard_rows) or [Shard(0, 0, 0)]
+    workers = max(1, min(workers or os.cpu_count(), len(shards)))
+    start = time.perf_counter()
+    if generator.prepare:
+        context = generator.prepare(context, shards, seed)
+    if workers == 1:
+        init_worker(context)
+        rows = sum(write_shard(table_name, shard, seed, output_path, batch_rows, compression)[0] for shard in shards)
+    else:
+        with ProcessPoolExecutor(max_workers=workers, initializer=init_worker, initargs=(context,)) as executor:
+            futures = [executor.submit(write_shard, table_name, shard, seed, output_path, batch_rows, compression)
+                       for shard in shards]
+            rows = sum(future.result()[0] for future in futures)
+    concatenate_parts(output_path, len(shards))
+    seconds = time.perf_counter() - start
+    logger.info("Generated %d %s rows in %d shards on %d workers in %.2f s (%.0f rows/s).", rows, table_name,
+                len(shards), workers, seconds, rows / seconds if seconds > 0 else 0)
+    return seconds
+
+def main():
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(levelname)s - %(message)s',
+        handlers=[logging.StreamHandler(sys.stdout)]
+    )
+    parser = argparse.ArgumentParser(description="Generate synthetic table data in deterministic shards on a process pool.")
+    parser.add_argument("table", choices=sorted(SHARD_GENERATORS), help="Table to generate.")
+    parser.add_argument("--rows", type=int, required=True,
+                        help="Number of rows to generate; for the customer tables, the number of customers.")
+    parser.add_argument("--output", required=True, help="CSV file to write (.csv, .csv.gz or .csv.zst).")
+    parser.add_argument("--seed", type=int, default=42, help="Seed of the generated data.")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="Number of worker processes.")
+    parser.add_argument("--shard-rows", type=int, default=DEFAULT_SHARD_ROWS,
+                        help="Rows per shard. The output depends on it, so keep it fixed to reproduce a dataset.")
+    parser.add_argument("--batch-rows", type=int, default=DEFAULT_BATCH_ROWS, help="Rows per batch within a shard. The output depends on it as well.")
+    parser.add_argument("--skew", action="store_true", help="Draw skewed instead of uniform distributions "
+                                                            "(e.g. hot products and frequent customers).")
+    args = parser.parse_args()
+
+    if args.rows < 0 or args.workers < 1 or args.shard_rows < 1 or args.batch_rows < 1:
+        logger.error("--rows must not be negative; --workers, --shard-rows and --batch-rows must be at least 1")
+        sys.exit(1)
+
+    generate_table(args.table, args.rows, args.output, args.seed, args.workers, args.shard_rows, args.batch_rows,
+                   skew=args.skew)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,32 @@
+"""
+Tests of the CSV formatting of batch_pipeline without pyarrow. Run with pytest from this directory.
+"""
+import decimal
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import batch_pipeline
+
+@pytest.fixture
+def no_pyarrow(monkeypatch):
+    monkeypatch.setattr(batch_pipeline, "pa", None)
+
+def test_nulls_and_empty_strings(no_pyarrow):
+    # Integer columns with NULLs are floats in a batch; empty strings must stay distinct from NULLs
+    df = pd.DataFrame({"id": [1.0, 2.0], "customer_age": [33.0, np.nan], "customer_first_name": ["", None]})
+    assert batch_pipeline.csv_bytes(df, "orders", list(df.columns)) == b'1,33,""\n2,,\n'
+
+def test_header_dates_decimals_and_quoting(no_pyarrow):
+    df = pd.DataFrame({
+        "order_date": pd.to_datetime(["2024-01-02", None]),
+        "unit_price": [decimal.Decimal("1.50"), None],
+        "brand": ['a "b", c', "x\ny"],
+    })
+    assert batch_pipeline.csv_bytes(df, "orders", list(df.columns), header=True) == (
+        b'order_date,unit_price,brand\n2024-01-02,1.50,"a ""b"", c"\n,,"x\ny"\n')
+
+def test_empty_batch_header(no_pyarrow):
+    df = pd.DataFrame(columns=["id", "order_date"])
+    assert batch_pipeline.csv_bytes(df, "orders", ["id", "order_date"], header=True) == b"id,order_date\n"
@@ -0,0 +1,181 @@
+"""
+Verification of the query plans of the customer order lookups.
+
+Runs EXPLAIN (ANALYZE, BUFFERS) on the reference queries of get_orders.py and chatbot_query.sql
+and on the lookups by customer id and email, logs the scans, execution time and shared buffers
+of each plan, and fails if any of them reads a table with a sequential scan. The queries run
+against the orders table of the wide layout and the orders view of the normalized one alike.
+
+The tables are analyzed first, so that the planner sees the loaded data. On tables as small as
+the sample data a sequential scan is cheaper than any index and the planner rightly picks it;
+there, --disable-seqscan checks that an index path exists at all (with enable_seqscan off the
+planner still falls back to a sequential scan when it has no other path).
+
+Example:
+    python verify_query_plans.py --dsn "host=localhost dbname=postgres user=postgres"
+"""
+import argparse
+import json
+import logging
+import sys
+
+import psycopg2
+from psycopg2 import sql
+
+from schema_registry import LAYOUT_TABLES
+
+logger = logging.getLogger(__name__)
+
+# Lookups that must be served by indexes, by name: the get_orders.py query, the chatbot_query.sql
+# queries and the lookups of a customer's orders by id and of a customer by email
+LOOKUP_QUERIES = {
+    'get_orders': """
+        SELECT customer_first_name, customer_last_name, customer_age, customer_email, customer_phone, order_date,
+               product_id, product_name, quantity, unit_price, total, category, brand, product_description
+        FROM orders
+        WHERE customer_first_name = %(first_name)s AND customer_last_name = %(last_name)s
+        ORDER BY order_date
+        LIMIT 3
+    """,
+    'chatbot_by_first_name': "SELECT * FROM orders WHERE customer_first_name = %(first_name)s",
+    'chatbot_by_name_limit': """
+        SELECT * FROM orders
+        WHERE customer_first_name = %(first_name)s AND customer_last_name = %(last_name)s
+        ORDER BY order_date
+        LIMIT 5
+    """,
+    'orders_by_customer_id': """
+        SELECT * FROM orders
+        WHERE customer_id = %(customer_id)s
+        ORDER BY order_date
+        LIMIT 3
+    """,
+    'customer_by_email': "SELECT * FROM customers WHERE email = %(email)s",
+}
+
+# Customer the queries look up: Mikaela Lee of the sample data
+QUERY_PARAMETERS = {'first_name': 'Mikaela', 'last_name': 'Lee', 'customer_id': 7, 'email': 'Mikaela@example.com'}
+
+def plan_nodes(node):
+    """
+    Yields a plan node of EXPLAIN (FORMAT JSON) and all nodes below it.
+    """
+    yield node
+    for child in node.get('Plans', []):
+        yield from plan_nodes(child)
+
+def describe_scan(node):
+    """
+    Describes a scan node, e.g. 'Index Only Scan using customers_name_idx on customers'.
+    """
+    description = node['Node Type']
+    if 'Index Name' in node:
+        description += " using %s" % node['Index Name']
+    if 'Relation Name' in node:
+        description += " on %s" % node['Relation Name']
+    return description
+
+def explain(cursor, query, parameters):
+    """
+    Runs a query under EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) and returns its plan.
+    """
+    cursor.execute("EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) " + query, parameters)
+    plan = cursor.fetchone()[0]
+    # psycopg2 parses json columns, but not every server returns the plan as json
+    return (json.loads(plan) if isinstance(plan, str) else plan)[0]
+
+def check_plan(name, plan):
+    """
+    Summarizes the plan of a query as a dict: its execution time, shared buffers hit and read,
+    scans and the tables it reads with a sequential scan.
+    """
+    top = plan['Plan']
+    scans = [node for node in plan_nodes(top)
+             if node['Node Type'].endswith('Scan') and ('Relation Name' in node or 'Index Name' in node)]
+    return {
+        'query': name,
+        'execution_ms': plan.get('Execution Time'),
+        'shared_hit_blocks': top.get('Shared Hit Blocks', 0),
+        'shared_read_blocks': top.get('Shared Read Blocks', 0),
+        'rows': top.get('Actual Rows'),
+        'scans': [describe_scan(node) for node in scans],
+        'sequential_scans': [node['Relation Name'] for node in scans if node['Node Type'] == 'Seq Scan'],
+    }
+
+def analyze_tables(cursor):
+    """
+    Analyzes the sample tables of either layout that exist on the search path.
+    """
+    for table_name in dict.fromkeys(name for names in LAYOUT_TABLES.values() for name in names):
+        cursor.execute("SELECT c.relkind FROM pg_class c WHERE c.oid = to_regclass(%s)", (table_name,))
+        row = cursor.fetchone()
+        if row is not None and row[0] == 'r':
+            cursor.execute(sql.SQL("ANALYZE {}").format(sql.Identifier(table_name)))
+
+def verify_query_plans(cursor, queries=None, parameters=QUERY_PARAMETERS, disable_seqscan=False):
+    """
+    Explains the lookup queries (all of LOOKUP_QUERIES by default) and returns the summary of
+    each plan (see check_plan). Fails no query itself: callers check 'sequential_scans'.
+    """
+    if disable_seqscan:
+        cursor.execute("SET LOCAL enable_seqscan = off")
+    results = []
+    for name in queries or LOOKUP_QUERIES:
+        result = check_plan(name, explain(cursor, LOOKUP_QUERIES[name], parameters))
+        logger.info("%s: %.3f ms, %d rows, shared buffers hit %d read %d; %s", name, result['execution_ms'],
+                    result['rows'], result['shared_hit_blocks'], result['shared_read_blocks'],
+                    "; ".join(result['scans']))
+        results.append(result)
+    return results
+
+def main():
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(levelname)s - %(message)s',
+        handlers=[logging.StreamHandler(sys.stdout)]
+    )
+    parser = argparse.ArgumentParser(description="Check that the customer order lookups do not fall back to "
+                                                 "sequential scans.")
+    parser.add_argument("--dsn", default="host=localhost dbname=postgres",
+                        help="libpq connection string of the database.")
+    parser.add_argument("--schema", default="public", help="Schema of the sample tables.")
+    parser.add_argument("--queries", nargs="+", choices=list(LOOKUP_QUERIES), help="Queries to check (default: all).")
+    parser.add_argument("--first-name", default=QUERY_PARAMETERS['first_name'], help="First name looked up.")
+    parser.add_argument("--last-name", default=QUERY_PARAMETERS['last_name'], help="Last name looked up.")
+    parser.add_argument("--customer-id", type=int, default=QUERY_PARAMETERS['customer_id'], help="Customer id looked up.")
+    parser.add_argument("--email", default=QUERY_PARAMETERS['email'], help="Email looked up.")
+    parser.add_argument("--disable-seqscan", action="store_true",
+                        help="Plan with enable_seqscan off, to check that index paths exist on tables too small "
+                             "for the planner to use them.")
+    parser.add_argument("--skip-analyze", action="store_true", help="Do not analyze the tables first.")
+    parser.add_argument("--output", help="Also write the plan summaries to this JSON file.")
+    args = parser.parse_args()
+
+    parameters = {'first_name': args.first_name, 'last_name': args.last_name, 'customer_id': args.customer_id,
+                  'email': args.email}
+    conn = psycopg2.connect(args.dsn, options="-c search_path=%s" % args.schema)
+    try:
+        with conn.cursor() as cursor:
+            if not args.skip_analyze:
+                analyze_tables(cursor)
+                conn.commit()
+            results = verify_query_plans(cursor, args.queries, parameters, args.disable_seqscan)
+        # EXPLAIN ANALYZE runs the queries; they only read
+        conn.rollback()
+    finally:
+        conn.close()
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+        logger.info("Plan summaries written to %s", args.output)
+
+    failures = [result for result in results if result['sequential_scans']]
+    for result in failures:
+        logger.error("%s falls back to a sequential scan of %s", result['query'], ", ".join(result['sequential_scans']))
+    if failures:
+        sys.exit(1)
+    logger.info("All %d queries use index paths.", len(results))
+
+if __name__ == "__main__":
+    main()
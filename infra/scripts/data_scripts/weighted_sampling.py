@@ -0,0 +1,161 @@
+"""
+Alias-table sampling of skewed distributions for the synthetic data generators.
+
+An alias table (Vose's method) turns n weights into two arrays, a probability and an alias
+per slot. A draw picks a slot uniformly and keeps it or takes its alias with one comparison,
+so drawing costs O(1) per value whatever the weights, and a batch of draws is a handful of
+NumPy operations. np.random.Generator.choice(p=...) instead searches the cumulative weights
+for every draw.
+
+The weight helpers give the skews the order generator uses for load-testing:
+- zipf_weights: product popularity, a few hot products and a long tail.
+- purchase_frequency_weights: heavy and occasional buyers among the customers.
+- seasonal_date_weights: month and weekday seasonality of the order dates.
+
+Time draws against Generator.choice with:
+    python weighted_sampling.py --draws 100000000 --categories 1000000
+"""
+import argparse
+import logging
+import sys
+import time
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Relative order volume per month (January first): a spring bump and the holiday peak
+MONTH_WEIGHTS = [0.8, 0.75, 0.9, 1.0, 1.05, 1.0, 0.95, 1.0, 0.9, 1.0, 1.4, 1.7]
+
+# Relative order volume per weekday (Monday first)
+WEEKDAY_WEIGHTS = [0.95, 0.9, 0.9, 0.95, 1.05, 1.2, 1.15]
+
+# Draws per pass of AliasTable.sample; bounds its temporary arrays
+SAMPLE_CHUNK = 10000000
+
+class AliasTable:
+    """
+    Precomputed alias table over the indices 0..n-1 of a weight array, or over values
+    when given (any array or pandas array with one value per weight).
+    """
+    def __init__(self, weights, values=None):
+        weights = np.asarray(weights, dtype='float64')
+        if weights.ndim != 1 or weights.size == 0:
+            raise ValueError("Weights must be a non-empty 1-d array")
+        if not np.all(np.isfinite(weights)) or weights.min() < 0 or weights.sum() <= 0:
+            raise ValueError("Weights must be finite, non-negative and not all zero")
+        if values is not None and len(values) != len(weights):
+            raise ValueError("Expected %d values, not %d" % (len(weights), len(values)))
+        self.values = values
+        self.probability, self.alias = build_alias_table(weights)
+
+    def __len__(self):
+        return len(self.probability)
+
+    def sample_indices(self, rng, size):
+        """
+        Draws size indices with probability proportional to their weights.
+        """
+        indices = np.empty(size, dtype='int64')
+        for start in range(0, size, SAMPLE_CHUNK):
+            end = min(size, start + SAMPLE_CHUNK)
+            # One uniform value gives both the slot (integer part) and the coin (fraction)
+            scaled = rng.random(end - start) * len(self.probability)
+            slot = scaled.astype('int64')
+            np.minimum(slot, len(self.probability) - 1, out=slot)
+            indices[start:end] = np.where(scaled - slot < self.probability[slot], slot, self.alias[slot])
+        return indices
+
+    def sample(self, rng, size):
+        """
+        Draws size values (or indices, without values) with probability proportional to their weights.
+        """
+        indices = self.sample_indices(rng, size)
+        return indices if self.values is None else self.values.take(indices)
+
+def build_alias_table(weights):
+    """
+    Builds the probability and alias arrays of Vose's alias method. The pairing of under-
+    and over-full slots is sequential, so this runs in Python: about a second per million
+    weights, once per table.
+    """
+    count = len(weights)
+    scaled = (weights * (count / weights.sum())).tolist()
+    alias = list(range(count))
+    small = [index for index, value in enumerate(scaled) if value < 1.0]
+    large = [index for index, value in enumerate(scaled) if value >= 1.0]
+    while small and large:
+        less = small.pop()
+        more = large[-1]
+        alias[less] = more
+        scaled[more] -= 1.0 - scaled[less]
+        if scaled[more] < 1.0:
+            small.append(large.pop())
+    # What is left is full up to rounding errors
+    for index in small + large:
+        scaled[index] = 1.0
+    return np.array(scaled), np.array(alias, dtype='int64')
+
+def zipf_weights(count, exponent=1.1, rng=None):
+    """
+    Zipf-like popularity weights 1 / rank ** exponent for count items. The ranks are shuffled
+    with rng when given, so that the hot items are not simply the first ones.
+    """
+    weights = 1.0 / np.arange(1, count + 1, dtype='float64') ** exponent
+    return rng.permutation(weights) if rng is not None else weights
+
+def purchase_frequency_weights(count, rng, sigma=1.0):
+    """
+    Per-customer purchase frequencies drawn from a log-normal distribution: most customers
+    buy now and then and a few buy very often. Larger sigma means a heavier tail.
+    """
+    return rng.lognormal(0.0, sigma, count)
+
+def seasonal_date_weights(first_day, days, month_weights=MONTH_WEIGHTS, weekday_weights=WEEKDAY_WEIGHTS):
+    """
+    Weights of the days first_day .. first_day + days - 1 (first_day a numpy datetime64[D]),
+    as the product of the weights of their month and weekday.
+    """
+    dates = np.datetime64(first_day, 'D') + np.arange(days)
+    months = dates.astype('datetime64[M]').astype('int64') % 12
+    # 1970-01-01 was a Thursday
+    weekdays = (dates.astype('int64') + 3) % 7
+    return np.asarray(month_weights, dtype='float64')[months] * np.asarray(weekday_weights, dtype='float64')[weekdays]
+
+def main():
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(levelname)s - %(message)s',
+        handlers=[logging.StreamHandler(sys.stdout)]
+    )
+    parser = argparse.ArgumentParser(description="Time alias-table draws from a Zipf distribution.")
+    parser.add_argument("--draws", type=int, default=100000000, help="Number of values to draw.")
+    parser.add_argument("--categories", type=int, default=100000, help="Number of weighted categories.")
+    parser.add_argument("--exponent", type=float, default=1.1, help="Zipf exponent.")
+    parser.add_argument("--compare", action="store_true", help="Also time Generator.choice(p=...) on the same weights.")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(42)
+    weights = zipf_weights(args.categories, args.exponent)
+    start = time.perf_counter()
+    table = AliasTable(weights)
+    logger.info("Built the alias table of %d categories in %.2f s.", args.categories, time.perf_counter() - start)
+
+    start = time.perf_counter()
+    draws = table.sample(rng, args.draws)
+    seconds = time.perf_counter() - start
+    logger.info("Drew %d values in %.2f s (%.0f draws/s).", args.draws, seconds, args.draws / seconds if seconds > 0 else 0)
+    top = min(args.categories, 10)
+    observed = np.bincount(draws, minlength=args.categories)[:top] / args.draws
+    logger.info("Share of the top %d categories: observed %s, expected %s.", top,
+                np.round(observed, 4).tolist(), np.round(weights[:top] / weights.sum(), 4).tolist())
+
+    if args.compare:
+        start = time.perf_counter()
+        rng.choice(args.categories, size=args.draws, p=weights / weights.sum())
+        seconds = time.perf_counter() - start
+        logger.info("Generator.choice drew %d values in %.2f s (%.0f draws/s).", args.draws, seconds,
+                    args.draws / seconds if seconds > 0 else 0)
+
+if __name__ == "__main__":
+    main()
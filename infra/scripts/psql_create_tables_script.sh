@@ -22,6 +22,7 @@ publicIp=$(curl -s https://api.ipify.org)
 az postgres flexible-server firewall-rule create --resource-group $resourceGroup --name $postgres_server_name --rule-name "AllowScriptIp" --start-ip-address "$publicIp" --end-ip-address "$publicIp"
 
 curl --output "psql_create_tables_script.py" ${baseUrl}"infra/scripts/data_scripts/psql_create_tables_script.py"
+curl --output "schema_registry.py" ${baseUrl}"infra/scripts/data_scripts/schema_registry.py"
 
 # Download the requirement file
 curl --output "$requirementFile" "$requirementFileUrl"
@@ -22,6 +22,12 @@ publicIp=$(curl -s https://api.ipify.org)
 az postgres flexible-server firewall-rule create --resource-group $resourceGroup --name $postgres_server_name --rule-name "AllowScriptIp" --start-ip-address "$publicIp" --end-ip-address "$publicIp"
 
 curl --output "psql_load_tables_script.py" ${baseUrl}"infra/scripts/data_scripts/psql_load_tables_script.py"
+curl --output "bulk_load.py" ${baseUrl}"infra/scripts/data_scripts/bulk_load.py"
+curl --output "load_metrics.py" ${baseUrl}"infra/scripts/data_scripts/load_metrics.py"
+curl --output "http_source.py" ${baseUrl}"infra/scripts/data_scripts/http_source.py"
+curl --output "compressed_io.py" ${baseUrl}"infra/scripts/data_scripts/compressed_io.py"
+curl --output "binary_copy.py" ${baseUrl}"infra/scripts/data_scripts/binary_copy.py"
+curl --output "schema_registry.py" ${baseUrl}"infra/scripts/data_scripts/schema_registry.py"
 
 # Download the requirement file
 curl --output "$requirementFile" "$requirementFileUrl"